@@ -1,8 +1,45 @@
-from flask import request, Blueprint
+import threading
+from flask import request, Blueprint, current_app
 from app.models.result import Result
+from app.bots.supervisor import BotSupervisor, BotNotFoundError
+from app.bots.shardedsupervisor import create_supervisor
 
 api_bp = Blueprint("api", __name__, url_prefix="/")
 
+_supervisor_lock = threading.Lock()
+
+def get_supervisor() -> BotSupervisor:
+    """The supervisor hosting the app's bots (app.config['BOT_SUPERVISOR']), created from .env on first use."""
+    with _supervisor_lock:
+        if current_app.config.get('BOT_SUPERVISOR') is None:
+            current_app.config['BOT_SUPERVISOR'] = create_supervisor()
+
+        return current_app.config['BOT_SUPERVISOR']
+
+def get_bot_id() -> int:
+    """The bot_id of the request's JSON body."""
+    body = request.get_json(silent=True) or {}
+
+    if 'bot_id' not in body:
+        raise ValueError("bot_id is required")
+
+    return int(body['bot_id'])
+
+def bot_request(operation):
+    """Runs a supervisor operation and turns its outcome into an API response."""
+    try:
+        result = Result(data=operation(get_supervisor()))
+        return result.to_api_response()
+    except BotNotFoundError as e:
+        result = Result(status="failed", message=f"Bot {e} not found", code=404)
+        return result.to_api_response()
+    except ValueError as e:
+        result = Result(status="failed", message=f"Bad Request: {e}", code=400)
+        return result.to_api_response()
+    except Exception as e:
+        result = Result(status="failed", message=f"Internal Server Error: {e}", code=500)
+        return result.to_api_response()
+
 # Ping API
 @api_bp.route("/api/ping", methods=["GET"])
 def ping():
@@ -66,101 +103,89 @@ def get_optimized_parameters():
         result = Result(status="failed", message=f"Internal Server Error: {e}", code=500)
         return result.to_api_response()
 
+# Get the market data the bots share
+@api_bp.route("/api/market/<pair>", methods=["GET"])
+def get_market_data(pair):
+    """Get the latest ticker and candle of a pair from the market data of the bots."""
+    def read(supervisor):
+        if supervisor.market_data is None:
+            raise ValueError("The bots have no shared market data")
+
+        ohlc = supervisor.market_data.get_latest_ohlc(pair)
+        return {
+            "pair": pair,
+            "ticker": supervisor.market_data.get_latest_ticker(pair),
+            "ohlc": None if ohlc is None else {key: value for key, value in vars(ohlc).items() if key not in ['classname', 'ohlc_data']},
+        }
+
+    return bot_request(read)
+
 # Add a trading bot
 @api_bp.route("/api/bots/add", methods=["POST"])
 def add_bot():
-    """Add a Bot."""
-    try:
-        result = Result()
-        # TODO: Implement logic
-        return result.to_api_response()
-    except Exception as e:
-        result = Result(status="failed", message=f"Internal Server Error: {e}", code=500)
-        return result.to_api_response()
+    """
+    Add a Bot.
+
+    Body: {"config_path": ".env", "settings": {"name": ..., "pair": ...}, "start": false}. The bot is
+    configured from config_path, with settings overriding its bot configuration.
+    """
+    body = request.get_json(silent=True) or {}
+
+    def add(supervisor):
+        bot_id = supervisor.create_bot(body.get('config_path', '.env'), body.get('settings'))
+
+        if body.get('start', False):
+            return supervisor.start(bot_id)
+
+        return supervisor.get(bot_id)
+
+    return bot_request(add)
+
+# List the trading bots
+@api_bp.route("/api/bots", methods=["GET"])
+def list_bots():
+    """List the Trading Bots."""
+    return bot_request(lambda supervisor: {"bots": supervisor.list()})
 
 # Start a trading bot
 @api_bp.route("/api/bots/start", methods=["POST"])
 def start_bot():
     """Start a Trading Bot."""
-    try:
-        result = Result()
-        # TODO: Implement logic
-        return result.to_api_response()
-    except Exception as e:
-        result = Result(status="failed", message=f"Internal Server Error: {e}", code=500)
-        return result.to_api_response()
+    return bot_request(lambda supervisor: supervisor.start(get_bot_id()))
 
 # Pause a trading bot
 @api_bp.route("/api/bots/pause", methods=["POST"])
 def pause_bot():
     """Pause a Trading Bot."""
-    try:
-        result = Result()
-        # TODO: Implement logic
-        return result.to_api_response()
-    except Exception as e:
-        result = Result(status="failed", message=f"Internal Server Error: {e}", code=500)
-        return result.to_api_response()
+    return bot_request(lambda supervisor: supervisor.pause(get_bot_id()))
 
 # Restart a trading bot
 @api_bp.route("/api/bots/restart", methods=["POST"])
 def restart_bot():
     """Restart a Trading Bot."""
-    try:
-        result = Result()
-        # TODO: Implement logic
-        return result.to_api_response()
-    except Exception as e:
-        result = Result(status="failed", message=f"Internal Server Error: {e}", code=500)
-        return result.to_api_response()
+    return bot_request(lambda supervisor: supervisor.restart(get_bot_id()))
 
 # Stop a trading bot
 @api_bp.route("/api/bots/stop", methods=["POST"])
 def stop_bot():
     """Stop a Trading Bot."""
-    try:
-        result = Result()
-        # TODO: Implement logic
-        return result.to_api_response()
-    except Exception as e:
-        result = Result(status="failed", message=f"Internal Server Error: {e}", code=500)
-        return result.to_api_response()
+    return bot_request(lambda supervisor: supervisor.stop(get_bot_id()))
 
 # Update a trading bot
 @api_bp.route("/api/bots/update", methods=["PUT"])
 def update_bot():
-    """Update a Trading Bot."""
-    try:
-        result = Result()
-        # TODO: Implement logic
-        return result.to_api_response()
-    except Exception as e:
-        result = Result(status="failed", message=f"Internal Server Error: {e}", code=500)
-        return result.to_api_response()
+    """Update a Trading Bot. Body: {"bot_id": ..., "settings": {...}} (see Bot.UPDATABLE_SETTINGS)."""
+    body = request.get_json(silent=True) or {}
+    return bot_request(lambda supervisor: supervisor.update(get_bot_id(), body.get('settings', {})))
 
 # Get a trading bot
 @api_bp.route("/api/bots/<int:bot_id>", methods=["GET"])
 def get_bot(bot_id):
     """Get a Trading Bot."""
-    try:
-        result = Result()
-
-        # TODO: Implement logic
-        result.data = {"bot_id": bot_id}
-
-        return result.to_api_response()
-    except Exception as e:
-        result = Result(status="failed", message=f"Internal Server Error: {e}", code=500)
-        return result.to_api_response()
+    return bot_request(lambda supervisor: supervisor.get(bot_id))
 
 # Remove a trading bot
 @api_bp.route("/api/bots/remove", methods=["DELETE"])
 def remove_bot():
     """Remove a Trading Bot."""
-    try:
-        result = Result()
-        # TODO: Implement logic
-        return result.to_api_response()
-    except Exception as e:
-        result = Result(status="failed", message=f"Internal Server Error: {e}", code=500)
-        return result.to_api_response()
+    return bot_request(lambda supervisor: supervisor.remove(get_bot_id()))
@@ -0,0 +1,193 @@
+import threading
+import time
+
+class HeldOrder():
+    """An open order as tracked by BalanceLedger, with the balance it holds."""
+    def __init__(self, txid: str, side: str, price: float, volume: float, hold: float):
+        self.classname = self.__class__.__name__
+        assert side in ['buy', 'sell']
+
+        self.txid = txid
+        self.side = side
+        self.price = float(price)
+        self.volume = float(volume)
+        self.filled = 0.0
+        self.hold = hold
+
+    def __repr__(self):
+        return f"{{{self.classname} txid: {self.txid}, side: {self.side}, price: {self.price}, volume: {self.volume}, filled: {self.filled}, hold: {self.hold}}}"
+
+class BalanceLedger():
+    """
+    The balances of a pair's base and quote assets, kept locally from the bot's own orders and
+    fills so they can be read without a request.
+
+    Placing an order holds what it may spend (the quote cost of a buy, the base volume of a sell),
+    a fill moves the base and quote balances, charges its fee in the quote asset and releases its
+    share of the hold, and a cancel releases the rest. Balances available for trading are the
+    balance less the holds, as for Kraken's extended balance.
+
+    fetch_balances returns the extended balance ({asset: {'balance', 'credit', 'credit_used',
+    'hold_trade'}}). The ledger is reconciled with it every reconcile_interval_in_sec, and earlier
+    once marked stale: on a fill of an order it does not track, when an available balance turns
+    negative, or by the owner (e.g. after placing orders whose fills it cannot observe). A
+    difference found on reconciling is counted as drift. Without fetch_balances (no API keys) the
+    ledger only holds the balances it was seeded with and the fills applied to it.
+    """
+    def __init__(self, base: str, quote: str, fetch_balances=None, balances: dict = None, reconcile_interval_in_sec: float = 300, drift_tolerance_pct: float = 0.001):
+        assert reconcile_interval_in_sec > 0
+        assert drift_tolerance_pct >= 0
+
+        self.classname = self.__class__.__name__
+        self.base = base
+        self.quote = quote
+        self.fetch_balances = fetch_balances
+        self.reconcile_interval_in_sec = reconcile_interval_in_sec
+        self.drift_tolerance_pct = drift_tolerance_pct
+        self.balances = {asset: float(balance) for asset, balance in (balances or {}).items()}
+        self.holds = {}
+        self.orders = {}
+        self.reconciled_at = None
+        self.reconcile_count = 0
+        self.drift_count = 0
+        self.fill_count = 0
+        self.stale = fetch_balances is not None
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return f"{{{self.classname} base: {self.base}, quote: {self.quote}, balances: {self.balances}, holds: {self.holds}, orders: {list(self.orders.keys())}, reconcile count: {self.reconcile_count}, drift count: {self.drift_count}}}"
+
+    def tracks(self, txid: str) -> bool:
+        return txid in self.orders
+
+    def get_available(self, asset: str) -> float:
+        """The balance of asset available for trading."""
+        return self.balances.get(asset, 0.0) - self.holds.get(asset, 0.0)
+
+    def get_balances(self) -> dict:
+        with self._lock:
+            return dict(self.balances)
+
+    def get_available_balances(self) -> dict:
+        with self._lock:
+            return {asset: self.get_available(asset) for asset in self.balances.keys() | self.holds.keys()}
+
+    def is_due(self) -> bool:
+        """Returns True if the ledger should be reconciled with the exchange."""
+        if self.fetch_balances is None:
+            return False
+
+        return self.stale or self.reconciled_at is None or time.monotonic() - self.reconciled_at >= self.reconcile_interval_in_sec
+
+    def mark_stale(self):
+        """Has the ledger reconciled on its next refresh."""
+        self.stale = self.fetch_balances is not None
+
+    def refresh(self) -> bool:
+        """Reconciles with the exchange if due. Returns True if it did."""
+        if not self.is_due():
+            return False
+
+        self.reconcile()
+        return True
+
+    def reconcile(self):
+        """Replaces the balances and holds with those of the exchange, counting a difference as drift."""
+        extended_balance = self.fetch_balances()
+        balances = {}
+        holds = {}
+
+        for asset, balance in extended_balance.items():
+            balances[asset] = float(balance['balance']) + float(balance.get('credit', 0)) - float(balance.get('credit_used', 0))
+            holds[asset] = float(balance.get('hold_trade', 0))
+
+        with self._lock:
+            if self.reconciled_at is not None:
+                drift = {}
+
+                for asset in set(balances) | set(self.balances):
+                    local = self.get_available(asset)
+                    remote = balances.get(asset, 0.0) - holds.get(asset, 0.0)
+
+                    if abs(local - remote) > self.drift_tolerance_pct * max(abs(local), abs(remote), 1e-8):
+                        drift[asset] = (local, remote)
+
+                if len(drift) > 0:
+                    self.drift_count += 1
+                    print(f"{self.classname}: local balances drifted from the exchange's ({{asset: (local, exchange)}}): {drift}")
+
+            self.balances = balances
+            self.holds = holds
+            self.reconciled_at = time.monotonic()
+            self.reconcile_count += 1
+            self.stale = False
+
+    def _add(self, balances: dict, asset: str, amount: float):
+        if asset is not None:
+            balances[asset] = balances.get(asset, 0.0) + amount
+
+    def place(self, txid: str, side: str, price: float, volume: float):
+        """Records an open order and holds what it may spend."""
+        with self._lock:
+            if txid in self.orders:
+                return
+
+            asset, hold = (self.quote, float(price) * float(volume)) if side == 'buy' else (self.base, float(volume))
+            self.orders[txid] = HeldOrder(txid, side, price, volume, hold)
+            self._add(self.holds, asset, hold)
+
+    def cancel(self, txid: str):
+        """Forgets an order, releasing what it still holds."""
+        with self._lock:
+            order = self.orders.pop(txid, None)
+
+            if order is not None:
+                self._add(self.holds, self.quote if order.side == 'buy' else self.base, -order.hold)
+
+    def replace(self, old_txid: str, new_txid: str, price: float):
+        """Moves an amended order to its new txid and price, adjusting the hold of a buy to the new price."""
+        with self._lock:
+            order = self.orders.pop(old_txid, None)
+
+            if order is None:
+                return
+
+            if order.side == 'buy':
+                hold = float(price) * (order.volume - order.filled)
+                self._add(self.holds, self.quote, hold - order.hold)
+                order.hold = hold
+
+            order.txid = new_txid
+            order.price = float(price)
+            self.orders[new_txid] = order
+
+    def apply_fill(self, fill: dict):
+        """
+        Applies a fill ({'order_txid', 'side', 'price', 'volume', 'fee'}, as KrakenOrderSocket reports them) to
+        the balances. A fill of an order the ledger does not track still moves the balances, but its hold is
+        unknown, so the ledger is marked stale.
+        """
+        side, price, volume, fee = fill['side'], float(fill['price']), float(fill['volume']), float(fill.get('fee') or 0)
+        direction = 1 if side == 'buy' else -1
+
+        with self._lock:
+            self._add(self.balances, self.base, direction * volume)
+            self._add(self.balances, self.quote, -direction * price * volume - fee)
+            self.fill_count += 1
+
+            order = self.orders.get(fill.get('order_txid'))
+
+            if order is None:
+                self.mark_stale()
+            else:
+                remaining = order.volume - order.filled
+                released = order.hold * min(1.0, volume / remaining) if remaining > 0 else order.hold
+                order.filled += volume
+                order.hold -= released
+                self._add(self.holds, self.quote if order.side == 'buy' else self.base, -released)
+
+                if order.filled >= order.volume:
+                    self.orders.pop(order.txid)
+
+            if self.get_available(self.base) < 0 or self.get_available(self.quote) < 0:
+                self.mark_stale()
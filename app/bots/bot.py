@@ -5,22 +5,39 @@ from app.helpers.json_util import CustomEncoder
 import time
 import uuid
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 # The following imports are needed for loading the objects from JSON
 from app.exchanges.cmc_api import CoinMarketCapAPI
 from app.exchanges.exchange import Exchange, KrakenExchange, BinanceExchange, BinanceUSExchange, CoinbaseExchange, RobinhoodCryptoExchange
 from app.exchanges.futuresexchange import FuturesExchange, KrakenFuturesExchange
+from app.exchanges.replayexchange import RecordingExchange, ReplayExchange
+from app.exchanges.router import SmartOrderRouter
+from app.exchanges.retry import RetryExecutor, CircuitBreaker
 from app.strategies.ohlc import OHLC
+from app.marketdata.ohlcpoller import OHLCPoller
 from app.strategies.order import Order, KrakenOrder
 from app.models.result import Result
 from app.strategies.strategy import Strategy, LSTMStrategy
 from app.riskmanager import RiskManager
 from app.positionmanager import PositionManager
+from app.repriceengine import RepriceEngine
+from app.balanceledger import BalanceLedger
+from app.bots.scheduler import CandleCloseScheduler
 from config import RequestConfig, BotConfig, CoinMarketCapAPIConfig, ExchangeConfig, StrategyConfig, RiskManagerConfig
 # Don't need to import class inherited from Bot
 
 class Bot():
     # Responsible for placing orders, executing strategy, managing risk through RiskManager, and monitoring orders and positions through PositionManager
+
+    # Settings that update() may change while the bot runs
+    UPDATABLE_SETTINGS = ['latency', 'max_error_count', 'error_latency', 'cancel_orders_upon_exit', 'reprice_tolerance_pct', 'reprice_max_chase_pct', 'reprice_min_interval_in_sec']
+
+    # Seconds from the start of a tick by which each of its concurrent requests must be done (see prefetch)
+    STAGE_DEADLINES_IN_SEC = {'ohlc': 15, 'balances': 15, 'signal_data': 60}
+    # Seconds between reconciliations of the BalanceLedger with the exchange's balances
+    BALANCE_RECONCILE_INTERVAL_IN_SEC = 300
     def __init__(self, bot_config: BotConfig={}, exchange: Exchange={}, strategy: Strategy={}, risk_manager: RiskManager={}):
         self.classname = self.__class__.__name__
         if type(bot_config) == dict and type(exchange) == dict and type(strategy) == dict and type(risk_manager) == dict:
@@ -41,6 +58,9 @@ class Bot():
         self.max_error_count = bot_config.max_error_count
         self.error_latency = bot_config.error_latency_in_sec
         self.cancel_orders_upon_exit = bot_config.cancel_orders_upon_exit
+        self.reprice_tolerance_pct = bot_config.reprice_tolerance_pct
+        self.reprice_max_chase_pct = bot_config.reprice_max_chase_pct
+        self.reprice_min_interval_in_sec = bot_config.reprice_min_interval_in_sec
 
         # Generate a unique UUID for this bot
         self.uuid = str(uuid.uuid4())
@@ -52,66 +72,39 @@ class Bot():
         # Perform validation on the configuration
         self.check_config()
 
-        # Fetch information related to the pair
-        for attempt in range(self.max_error_count):
-            try:
-                asset_info_response = self.exchange.get_tradable_asset_pairs(self.pair)
-                break
-            except Exception as e:
-                print(f"Error making API request (attempt {attempt + 1}/{self.max_error_count}): {e}")
-                
-                if attempt == self.max_error_count - 1:
-                    print(f"Failed to make API request after {self.max_error_count} attempts")
-                    raise e
-                else:
-                    time.sleep(self.error_latency)
-        
-        asset_info = asset_info_response.get('result')
+        # Open a pooled connection up front so the first requests skip the handshake
+        try:
+            self.exchange.warm_up()
+        except Exception as e:
+            print(f"Connection warm-up failed: {e}")
 
-        for key in asset_info.keys():
-            pair_key = key
+        # Fetch information related to the pair (from the on-disk registry cache unless it is stale)
+        pair_info = self.retry('public').call(self.exchange.pair_registry.get, self.pair, description='asset pair request')
+        fee_info = self.retry('private').call(self.exchange.pair_registry.get_fees, self.pair, description='fee schedule request')
         
-        pair_info = asset_info[pair_key]
+        self.pair_key = pair_info.key
+        self.base_asset = pair_info.base
 
         # Price precision
-        self.pair_decimals = pair_info['pair_decimals']
+        self.pair_decimals = pair_info.pair_decimals
 
         # Volume precision in base currency
-        self.lot_decimals = pair_info['lot_decimals']
+        self.lot_decimals = pair_info.lot_decimals
 
-        self.cost_decimals = pair_info['cost_decimals']
-        self.ordermin = float(pair_info['ordermin'])
-        self.costmin = float(pair_info['costmin'])
-        self.tick_size = pair_info['tick_size']
-        self.pair_status = pair_info['status']
+        self.cost_decimals = pair_info.cost_decimals
+        self.ordermin = pair_info.ordermin
+        self.costmin = pair_info.costmin
+        self.tick_size = pair_info.tick_size
+        self.pair_status = pair_info.status
 
-        # Fetch fee schedule and trade volume info
-        for attempt in range(self.max_error_count):
-            try:
-                trade_volume_fee_response = self.exchange.get_trade_volume(self.pair)
-                break
-            except Exception as e:
-                print(f"Error making API request (attempt {attempt + 1}/{self.max_error_count}): {e}")
-                
-                if attempt == self.max_error_count - 1:
-                    print(f"Failed to make API request after {self.max_error_count} attempts")
-                    raise e
-                else:
-                    time.sleep(self.error_latency)
-        
-        fee_info = trade_volume_fee_response.get('result')
+        # Fee schedule and trade volume info
         self.trade_volume = fee_info['volume']
-
-        for key in fee_info['fees'].keys():
-            pair_key = key
-        
-        if fee_info.get('fees_maker') is None:
-            self.fee_taker = self.fee_maker = float(fee_info['fees'][pair_key]['fee'])
-        else:
-            self.fee_taker = float(fee_info['fees'][pair_key]['fee'])
-            self.fee_maker = float(fee_info['fees_maker'][pair_key]['fee'])
+        self.fee_taker = fee_info['taker']
+        self.fee_maker = fee_info['maker']
         
         self.open_order_txids = []
+        self.position_entry_txids = []
+        self.position_order_txids = []
         self.open_orders = []
         self.closed_orders = []
         self.realized_gain = 0
@@ -121,9 +114,8 @@ class Bot():
         self.fee = 0
         self.account_balances = {}
 
-        # Fetch balances
-        if self.exchange.api_key != '' and self.exchange.api_sec != '':
-            self.fetch_balances()
+        # Load balances (from the exchange once, if there are API keys)
+        self.fetch_balances()
 
         if self.mode != 'test':
             if self.risk_manager.peak_balance > self.account_trade_balances[self.base_currency]:
@@ -132,7 +124,9 @@ class Bot():
     def __repr__(self):
         name_display = self.name if self.name else "''"
         realized = round(self.position_manager.realized_pnl, 4) if hasattr(self, 'position_manager') else 0
-        unrealized = round(self.get_unrealized_gain(), 4)
+        # The last fetched price, so printing the bot does not send a request
+        latest_ohlc = getattr(self, 'latest_ohlc', None)
+        unrealized = round(self.position_manager.calculate_pnl(latest_ohlc.close), 4) if hasattr(self, 'position_manager') and latest_ohlc is not None else 0
         return (
             f"{{{self.__class__.__name__} name: {name_display}, pair: {self.pair}, "
             f"mode: {self.mode}, strategy: {self.strategy.__class__.__name__}, "
@@ -154,288 +148,22 @@ class Bot():
         PositionManager → tracks position
         ↓
         PositionManager → monitors stop/TP
-        """
 
-        print(f"\n{'='*50}")
-        print(f"Bot '{self.name}' starting. Mode: {self.mode}")
-        print(f"Pair: {self.pair} | Strategy: {self.strategy.__class__.__name__} | Exchange: {self.exchange.__class__.__name__}")
-        print(f"Pulling every {self.latency}s")
-        print(f"{'='*50}\n")
+        Runs one tick() every latency seconds, max_iterations times (forever if None). The signal
+        of a strategy working on candles is only generated once per closed candle, just after the
+        close (see CandleCloseScheduler); the ticks in between only check the stop/TP. BotRuntime
+        runs the same stages driven by market data events instead.
+        """
+        self.print_header()
 
         try:
             iteration = 0
-            while True:
-                if max_iterations is not None and iteration >= max_iterations:
-                    break
-
-                # ── 1. Fetch latest price ──────────────────────────────────────
-                self.fetch_latest_ohlc()
-                print(f"\nCurrent price: {self.latest_ohlc.close}")
-                
-                # ── 2. Monitor open position stop/TP via PositionManager ───────
-                if self.position_manager.position is not None:
-                    unrealized = self.position_manager.calculate_pnl(self.latest_ohlc.close)
-                    print(f"Open position unrealized PnL: {round(unrealized, 4)} {self.base_currency}")
-
-                    if self.position_manager.check_exit_conditions(self.latest_ohlc.close):
-                        print(f"Position exit condition met at {self.latest_ohlc.close}. Closing.")
-                        pos = self.position_manager.position
-                        order_type = 'sell' if pos.side == 'long' else 'buy'
-                        quantity = pos.quantity
-                        self.place_exit_order(
-                            price=self.latest_ohlc.close,
-                            order_type=order_type,
-                            quantity=quantity,
-                        )
-                        pnl = self.position_manager.close_position(self.latest_ohlc.close)
-                        print(f"Position closed. PnL: {round(pnl, 4)} {self.base_currency}")
-                        print(f"Total realized PnL: {round(self.position_manager.realized_pnl, 4)} {self.base_currency}")
-                        time.sleep(self.latency)
-                        continue
-                
-                # ── 3. Generate signal ─────────────────────────────────────────
-                strategy_signal = self.strategy.generate_signal()
-                print(f"Signal: {strategy_signal}")
-
-                assert strategy_signal in ['BUY', 'SELL', 'HOLD']
-
-                if strategy_signal == 'HOLD':
-                    time.sleep(self.latency)
-                    continue
-
-                # Skip if we already have an open position in the same direction
-                if self.position_manager.position is not None:
-                    existing_side = self.position_manager.position.side
-                    if (strategy_signal == 'BUY' and existing_side == 'long') or \
-                       (strategy_signal == 'SELL' and existing_side == 'short'):
-                        print(f"  Already have a {existing_side} position. Skipping signal.")
-                        time.sleep(self.latency)
-                        continue
-
-                    # Opposite signal: close existing position first
-                    print(f"  Opposite signal received. Closing existing {existing_side} position.")
-                    pos = self.position_manager.position
-                    order_type = 'sell' if pos.side == 'long' else 'buy'
-                    quantity = pos.quantity
-                    self.place_exit_order(
-                        price=self.latest_ohlc.close,
-                        order_type=order_type,
-                        quantity=quantity,
-                    )
-                    pnl = self.position_manager.close_position(self.latest_ohlc.close)
-                    print(f"  Position closed. PnL: {round(pnl, 4)} {self.base_currency}")
-
-                
-                # ── 4. Fetch balance for sizing ────────────────────────────────
-                self.fetch_balances()
-                available_balance = self.account_trade_balances[self.base_currency]
-
-
-                # ── 5. RiskManager: calculate position size ────────────────────
-                side = 'long' if strategy_signal == 'BUY' else 'short'
-                
-                position_size, stop_loss = self.risk_manager.calculate_position_size(
-                    balance=available_balance,
-                    entry_price=self.latest_ohlc.close,
-                    side=side
-                )
-
-                if position_size <= 0:
-                    print(f"RiskManager returned zero position size. Skipping.")
-                    time.sleep(self.latency)
-                    continue
-
-                # Enforce exchange minimum volume / notional constraints where possible
-                notional = position_size * self.latest_ohlc.close
-                if position_size < self.ordermin or round(notional, self.pair_decimals) < self.costmin:
-                    print(
-                        f"Position size ({position_size}) and/or notional ({round(notional, self.pair_decimals)}) below exchange minimums "
-                        f"(ordermin={self.ordermin}, costmin={self.costmin}). Skipping."
-                    )
-                    time.sleep(self.latency)
-                    continue
-
-                take_profit = (abs(self.latest_ohlc.close - stop_loss) * self.strategy.risk_to_reward_ratio) + self.latest_ohlc.close
-
-
-                # ── 6. RiskManager: validate order ─────────────────────────────
-                # Construct order
-                order_type = strategy_signal.lower()
-
-                order_dict = {
-                    'ordertype': 'limit',
-                    'type': order_type,
-                    'side': side,
-                    'volume': position_size,
-                    'price': self.latest_ohlc.close,
-                    'stop_loss': stop_loss,
-                    'take_profit': take_profit
-                }
-
-                if not self.risk_manager.validate_order(order_dict, available_balance):
-                    # RiskManager rejected order (drawdown / position size / risk limit). Skipping.
-                    time.sleep(self.latency)
-                    continue
-
-
-                # ── 7. Execute order via Exchange ──────────────────────────────
-                # Uses conditional close (stop-loss-limit) for downside protection on buys.
-                print(f"Placing {strategy_signal} order | qty: {round(position_size, 6)} @ ~{self.latest_ohlc.close}")
-                for attempt in range(self.max_error_count):
-                    try:
-                        # Spot / crypto flow (any Exchange subclass)
-                        if isinstance(self.exchange, Exchange):
-                            if order_dict['type'] == 'buy':
-                                # Add a stop loss limit conditional close for downside protection
-                                open_position_order_response = self.exchange.add_order(
-                                    ordertype=order_dict['ordertype'],
-                                    type=order_dict['type'],
-                                    volume=order_dict['volume'],
-                                    pair=self.pair,
-                                    price=order_dict['price'],
-                                    oflags='post',
-                                    closeordertype='stop-loss-limit',
-                                    closeprice=order_dict['price'],  # trigger price
-                                    closeprice2=order_dict['stop_loss'],  # stop-loss limit
-                                )
-                            else:
-                                open_position_order_response = self.exchange.add_order(
-                                    ordertype=order_dict['ordertype'],
-                                    type=order_dict['type'],
-                                    volume=order_dict['volume'],
-                                    pair=self.pair,
-                                    price=order_dict['price'],
-                                    oflags='post',
-                                )
-                        # Basic futures flow (any FuturesExchange subclass)
-                        elif isinstance(self.exchange, FuturesExchange):
-                            # NOTE: This is a minimal starting implementation.
-                            # It assumes `self.pair` is an futures symbol understood by Robinhood
-                            # and treats BUY as opening / increasing exposure and SELL as reducing it.
-                            action = 'buy' if strategy_signal == 'BUY' else 'sell'
-                            # Quantity must be an int for most futures APIs
-                            quantity = max(1, int(round(position_size)))
-                            futures_type = getattr(self, "futures_type", "call")
-
-                            open_position_order_response = self.exchange.add_order(
-                                symbol=self.pair,
-                                quantity=quantity,
-                                futures_type=futures_type,
-                                price=self.latest_ohlc.close,
-                                action=action,
-                            )
-                        else:
-                            raise Exception("Invalid Exchange: Exchange is not spot / crypto or futures exchange")
-
-                        break
-                    except Exception as e:
-                        print(f"Error making API request (attempt {attempt + 1}/{self.max_error_count}): {e}")
-
-                        if attempt == self.max_error_count - 1:
-                            print(f"Failed to make API request after {self.max_error_count} attempts")
-                            raise e
-                        else:
-                            time.sleep(self.error_latency)
-                
-                # Normalize txid(s) and store them
-                raw_txids = open_position_order_response.get('result', {}).get('txid', [])
-                if isinstance(raw_txids, str):
-                    open_position_txids = [raw_txids]
-                else:
-                    open_position_txids = list(raw_txids or [])
-
-                self.open_order_txids.extend(open_position_txids)
-
-                # Track the open order objects for introspection / debugging
-                if open_position_txids:
-                    # TODO: Abstract KrakenOrder into Order class
-                    from app.strategies.order import KrakenOrder
-
-                    for txid in open_position_txids:
-                        self.open_orders.append(
-                            KrakenOrder(txid=txid, order_data=open_position_order_response.get('result', {}))
-                        )
-
-                # Confirm order exists on the exchange before placing a separate TP order
-                order_confirmed = False
-                if open_position_txids:
-                    txid_query = ",".join(open_position_txids)
-                    for attempt in range(self.max_error_count):
-                        try:
-                            order_info = self.exchange.get_orders_info(txid_query, trades=False)
-                            if order_info.get("result"):
-                                order_confirmed = True
-                            break
-                        except Exception as e:
-                            print(f"Error confirming open order (attempt {attempt + 1}/{self.max_error_count}): {e}")
-                            if attempt == self.max_error_count - 1:
-                                print("Proceeding without explicit confirmation of open order.")
-                            else:
-                                time.sleep(self.error_latency)
-
-                # Place a separate order for TP once the main order is acknowledged
-                if order_dict['type'] == 'buy':
-                    # Only Exchange-style spot orders currently support a separate TP order.
-                    if isinstance(self.exchange, Exchange):
-                        if not order_confirmed:
-                            print("Skipping separate TP order because base order could not be confirmed.")
-                        else:
-                            for attempt in range(self.max_error_count):
-                                try:
-                                    take_profit_type = 'sell'
-                                    take_profit_order_response = self.exchange.add_order(
-                                        ordertype="take-profit-limit",
-                                        type=take_profit_type,
-                                        volume=order_dict['volume'],
-                                        pair=self.pair,
-                                        price=order_dict['price'],  # trigger
-                                        price2=order_dict['take_profit'],  # TP limit
-                                        oflags='post',
-                                    )
-                                    break
-                                except Exception as e:
-                                    print(f"Error making TP API request (attempt {attempt + 1}/{self.max_error_count}): {e}")
-
-                                    if attempt == self.max_error_count - 1:
-                                        print(f"Failed to make TP order after {self.max_error_count} attempts")
-                                        raise e
-                                    else:
-                                        time.sleep(self.error_latency)
-
-                            take_profit_txid = take_profit_order_response.get('result', {}).get('txid', [])
-                            if isinstance(take_profit_txid, str):
-                                take_profit_txids = [take_profit_txid]
-                            else:
-                                take_profit_txids = list(take_profit_txid or [])
-
-                            if take_profit_txids:
-                                self.open_order_txids.extend(take_profit_txids)
-                
-                if len(self.open_order_txids) > 0:
-                    print(f"Order(s) placed. txids: {self.open_order_txids}")
-                else:
-                    print(f"Order submitted (test mode — no txid returned).")
-
-
-                # ── 8. PositionManager: open position ──────────────────────────
-                # Add position to PositionManager
-                self.position_manager.open_position(
-                    ticker=self.pair,
-                    side=side,
-                    entry_price=self.latest_ohlc.close,
-                    quantity=position_size,
-                    stop_loss=stop_loss,
-                    take_profit=take_profit
-                )
-
-                print("Position added")
-
-                print(f"{self.position_manager}")
-
-                time.sleep(self.latency)
-
-                # PositionManager monitors stop/TP
+            while max_iterations is None or iteration < max_iterations:
+                self.tick()
                 iteration += 1
+
+                if max_iterations is None or iteration < max_iterations:
+                    time.sleep(self.get_sleep_in_sec())
         except KeyboardInterrupt as e:
             print(f"Unexpected error: {e}")
             print("User ended execution of program.")
@@ -451,62 +179,646 @@ class Bot():
             print(f"Successfully exported bot.")
             raise e
         
+        self.print_summary()
+
+    def print_header(self):
+        print(f"\n{'='*50}")
+        print(f"Bot '{self.name}' starting. Mode: {self.mode}")
+        print(f"Pair: {self.pair} | Strategy: {self.strategy.__class__.__name__} | Exchange: {self.exchange.__class__.__name__}")
+        print(f"Pulling every {self.latency}s")
+        print(f"{'='*50}\n")
+
+    def print_summary(self):
         print(f"\nBot '{self.name}' finished.")
         print(f"Total realized PnL: {round(self.position_manager.realized_pnl, 4)} {self.base_currency}")
         print(f"Closed positions: {len(self.position_manager.closed_positions)}")
 
+    def tick(self):
+        """One pass through every stage of the pipeline."""
+        # ── 1. Fetch latest price (with the signal's data and the balances, if a signal is due) ──
+        self.fetch_tick_data(self.signal_pending())
+        print(f"\nCurrent price: {self.latest_ohlc.close}")
+
+        # Keep a resting entry at the touch
+        self.reprice_entry_orders()
+
+        # ── 2. Monitor open position stop/TP via PositionManager ───────
+        if self.monitor_position():
+            return
+
+        # Between candle closes the strategy's inputs have not changed
+        if not self.signal_due():
+            return
+
+        # ── 3. Generate signal ─────────────────────────────────────────
+        strategy_signal = self.generate_signal()
+
+        if strategy_signal == 'HOLD' or not self.close_opposite_position(strategy_signal):
+            return
+
+        # ── 4.-6. Size and validate the order ──────────────────────────
+        order_dict = self.prepare_entry(strategy_signal)
+
+        if order_dict is None:
+            return
+
+        # ── 7.-8. Execute order and open the position ──────────────────
+        self.execute_entry(order_dict, strategy_signal)
+
+    def get_signal_scheduler(self):
+        """Returns the CandleCloseScheduler of the strategy's signal, or None if the strategy generates it on every tick."""
+        if getattr(self, '_signal_scheduler', None) is None:
+            interval_in_sec = self.strategy.get_signal_interval_in_sec() if hasattr(self.strategy, 'get_signal_interval_in_sec') else None
+
+            if interval_in_sec is None:
+                return None
+
+            self._signal_scheduler = CandleCloseScheduler(interval_in_sec, getattr(self.exchange, 'clock', None))
+
+        return self._signal_scheduler
+
+    def signal_due(self) -> bool:
+        """Returns True if the signal should be generated now, at most once per closed candle of the strategy."""
+        scheduler = self.get_signal_scheduler()
+
+        return scheduler is None or scheduler.claim()
+
+    def signal_pending(self) -> bool:
+        """Returns True if signal_due() would now return True, without claiming the signal."""
+        scheduler = self.get_signal_scheduler()
+
+        return scheduler is None or scheduler.seconds_until_due() == 0
+
+    def prefetch(self, fetches: dict) -> dict:
+        """
+        Calls the independent fetches ({name: (function, deadline in seconds)}) concurrently and returns their results
+        by name, so they take as long as the slowest rather than the sum. Raises the first exception of a fetch, or a
+        TimeoutError for a fetch that misses its deadline.
+
+        Fetches run on the I/O executor set with set_io_executor (e.g. the pool a BotSupervisor shares between its
+        bots), else on a small pool of the bot's own.
+        """
+        executor = getattr(self, '_io_executor', None)
+
+        if executor is None:
+            if getattr(self, '_prefetch_executor', None) is None:
+                self._prefetch_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix=f"{self.classname}-{self.name}")
+
+            executor = self._prefetch_executor
+
+        started_at = time.monotonic()
+        futures = {name: executor.submit(function) for name, (function, _) in fetches.items()}
+        results = {}
+
+        try:
+            for name, (_, deadline_in_sec) in fetches.items():
+                try:
+                    results[name] = futures[name].result(timeout=max(0, started_at + deadline_in_sec - time.monotonic()))
+                except FutureTimeoutError:
+                    raise TimeoutError(f"{name} request missed its deadline of {deadline_in_sec}s")
+        except Exception:
+            # Fetches still queued are dropped, fetches in flight finish in the background
+            for future in futures.values():
+                future.cancel()
+
+            raise
+
+        return results
+
+    def fetch_tick_data(self, signal_pending: bool):
+        """
+        Fetches the latest OHLC and, if signal_pending, the data of the strategy's signal and the balances the
+        entry is sized with, all at once.
+        """
+        deadlines = self.STAGE_DEADLINES_IN_SEC
+        fetches = {'ohlc': (self.fetch_latest_ohlc, deadlines['ohlc'])}
+
+        if signal_pending:
+            signal_data_fetchers = self.strategy.get_signal_data_fetchers() if hasattr(self.strategy, 'get_signal_data_fetchers') else {}
+
+            for name, function in signal_data_fetchers.items():
+                fetches[f'signal_data:{name}'] = (function, deadlines['signal_data'])
+
+            fetches['balances'] = (self.fetch_balances, deadlines['balances'])
+
+        results = self.prefetch(fetches)
+
+        if signal_pending and hasattr(self.strategy, 'set_signal_data'):
+            signal_data = {name.split(':', 1)[1]: value for name, value in results.items() if name.startswith('signal_data:')}
+            # The strategy reads the price the bot has just fetched instead of fetching it again
+            signal_data['latest_ohlc'] = self.latest_ohlc
+            self.strategy.set_signal_data(signal_data)
+
+    def set_io_executor(self, executor):
+        """Has prefetch run its fetches on executor, shared with other bots, instead of a pool of the bot's own."""
+        self._io_executor = executor
+
+    def get_sleep_in_sec(self) -> float:
+        """Time until the next tick: latency seconds, or less to generate the signal just after the next candle close."""
+        scheduler = self.get_signal_scheduler()
+
+        if scheduler is None:
+            return self.latency
+
+        return min(self.latency, scheduler.seconds_until_due())
+
+    def monitor_position(self) -> bool:
+        """Closes the open position if its stop or take profit has been hit. Returns True if it was closed."""
+        if self.position_manager.position is None:
+            return False
+
+        unrealized = self.position_manager.calculate_pnl(self.latest_ohlc.close)
+        print(f"Open position unrealized PnL: {round(unrealized, 4)} {self.base_currency}")
+
+        if not self.position_manager.check_exit_conditions(self.latest_ohlc.close):
+            return False
+
+        print(f"Position exit condition met at {self.latest_ohlc.close}. Closing.")
+        pos = self.position_manager.position
+        order_type = 'sell' if pos.side == 'long' else 'buy'
+        quantity = pos.quantity
+        self.place_exit_order(
+            price=self.latest_ohlc.close,
+            order_type=order_type,
+            quantity=quantity,
+        )
+        pnl = self.position_manager.close_position(self.latest_ohlc.close)
+        print(f"Position closed. PnL: {round(pnl, 4)} {self.base_currency}")
+        print(f"Total realized PnL: {round(self.position_manager.realized_pnl, 4)} {self.base_currency}")
+        return True
+
+    def generate_signal(self) -> str:
+        strategy_signal = self.strategy.generate_signal()
+        print(f"Signal: {strategy_signal}")
+
+        assert strategy_signal in ['BUY', 'SELL', 'HOLD']
+
+        return strategy_signal
+
+    def close_opposite_position(self, strategy_signal: str) -> bool:
+        """Closes an open position against the signal. Returns False if a position in the signal's direction is already open."""
+        if self.position_manager.position is None:
+            return True
+
+        # Skip if we already have an open position in the same direction
+        existing_side = self.position_manager.position.side
+        if (strategy_signal == 'BUY' and existing_side == 'long') or \
+           (strategy_signal == 'SELL' and existing_side == 'short'):
+            print(f"  Already have a {existing_side} position. Skipping signal.")
+            return False
+
+        # Opposite signal: close existing position first
+        print(f"  Opposite signal received. Closing existing {existing_side} position.")
+        pos = self.position_manager.position
+        order_type = 'sell' if pos.side == 'long' else 'buy'
+        quantity = pos.quantity
+        self.place_exit_order(
+            price=self.latest_ohlc.close,
+            order_type=order_type,
+            quantity=quantity,
+        )
+        pnl = self.position_manager.close_position(self.latest_ohlc.close)
+        print(f"  Position closed. PnL: {round(pnl, 4)} {self.base_currency}")
+        return True
+
+    def prepare_entry(self, strategy_signal: str):
+        """Sizes the entry order for the signal and has the RiskManager validate it. Returns the order, or None to skip the signal."""
+        # ── 4. Fetch balance for sizing (from the BalanceLedger) ───────
+        self.fetch_balances()
+        available_balance = self.account_trade_balances[self.base_currency]
+
+
+        # ── 5. RiskManager: calculate position size ────────────────────
+        side = 'long' if strategy_signal == 'BUY' else 'short'
+        entry = self.size_entry_order(side, available_balance)
+
+        if entry is None:
+            return None
+
+        entry_price, position_size, stop_loss, take_profit = entry
+
+
+        # ── 6. RiskManager: validate order ─────────────────────────────
+        # Construct order
+        order_type = strategy_signal.lower()
+
+        order_dict = {
+            'ordertype': 'limit',
+            'type': order_type,
+            'side': side,
+            'volume': position_size,
+            'price': entry_price,
+            'stop_loss': stop_loss,
+            'take_profit': take_profit
+        }
+
+        if not self.risk_manager.validate_order(order_dict, available_balance):
+            # RiskManager rejected order (drawdown / position size / risk limit). Skipping.
+            return None
+
+        return order_dict
+
+    def execute_entry(self, order_dict: dict, strategy_signal: str):
+        """Places the entry order group and opens the position."""
+        side = order_dict['side']
+        entry_price = order_dict['price']
+        position_size = order_dict['volume']
+
+        # ── 7. Execute order via Exchange ──────────────────────────────
+        # Buys carry a stop-loss-limit conditional close for downside protection and a
+        # take-profit order, all sent as one order group.
+        print(f"Placing {strategy_signal} order | qty: {round(position_size, 6)} @ ~{entry_price}")
+
+        # Survives failed attempts, so a retry only places the orders that have no txid yet
+        order_results = []
+        self.retry('trading').call(self.place_entry_orders, order_dict, strategy_signal, position_size, order_results, description='entry order request')
+        
+        # Normalize txid(s) and store them
+        order_group_txids = [self.get_txids(order_result) for order_result in order_results]
+        open_position_txids = order_group_txids[0]
+
+        # The protective orders to cancel once the position is closed. The entry's conditional
+        # stop-loss close only gets a txid once the entry fills, so it is looked up on exit.
+        self.position_entry_txids = open_position_txids
+        self.position_order_txids = [txid for txids in order_group_txids[1:] for txid in txids]
+        self.open_order_txids.extend([txid for txids in order_group_txids for txid in txids])
+
+        # Track the open order objects for introspection / debugging
+        # TODO: Abstract KrakenOrder into Order class
+        from app.strategies.order import KrakenOrder
+
+        for order_result, txids in zip(order_results, order_group_txids):
+            for txid in txids:
+                self.open_orders.append(
+                    KrakenOrder(txid=txid, order_data=order_result)
+                )
+        
+        if len(self.open_order_txids) > 0:
+            print(f"Order(s) placed. txids: {self.open_order_txids}")
+        else:
+            print(f"Order submitted (test mode — no txid returned).")
+
+
+        # ── 8. PositionManager: open position ──────────────────────────
+        # Add position to PositionManager
+        self.position_manager.open_position(
+            ticker=self.pair,
+            side=side,
+            entry_price=entry_price,
+            quantity=position_size,
+            stop_loss=order_dict['stop_loss'],
+            take_profit=order_dict['take_profit']
+        )
+
+        # Replace the assumed entry price with actual fills as they arrive
+        self.track_entry_fills(open_position_txids)
+
+        if isinstance(self.exchange, Exchange):
+            self.assume_fill(order_dict['type'], entry_price, position_size, self.fee_maker)
+
+        # Kraken cannot edit orders with conditional close terms, so only entries without one are repriced
+        repricer = self.get_repricer()
+        if repricer is not None and order_dict['type'] == 'sell':
+            for txid in open_position_txids:
+                repricer.track(txid, self.pair, order_dict['type'], entry_price, position_size)
+
+        print("Position added")
+
+        print(f"{self.position_manager}")
+
+    def size_entry_order(self, side: str, balance: float):
+        """
+        Returns (entry price, position size, stop loss, take profit) of a new position, or None if
+        it would be below the exchange minimums.
+
+        The entry price is the touch of the live order book (best bid for longs, best ask for
+        shorts) or else the latest close, and the size, stop and take profit all follow from it.
+        With a live book, the size is capped to the volume that could be exited at market without
+        going past the stop.
+        """
+        entry_price = self.latest_ohlc.close
+
+        # Join the best bid (buys) or best ask (sells) so the post-only order rests at the touch
+        order_book = self.get_order_book()
+        if order_book is not None:
+            touch = order_book.best_bid() if side == 'long' else order_book.best_ask()
+
+            if touch is not None:
+                entry_price = touch[0]
+
+        position_size, stop_loss = self.risk_manager.calculate_position_size(
+            balance=balance,
+            entry_price=entry_price,
+            side=side
+        )
+
+        if order_book is not None and position_size > 0:
+            exit_liquidity = order_book.volume_through_price('bids' if side == 'long' else 'asks', stop_loss)
+
+            if exit_liquidity < position_size:
+                print(f"Capping position size {position_size} to the {exit_liquidity} the order book holds through the stop at {stop_loss}.")
+                position_size = exit_liquidity
+
+        if position_size <= 0:
+            print(f"RiskManager returned zero position size. Skipping.")
+            return None
+
+        # Round to the pair's lot and tick sizes so the exchange accepts the order
+        if isinstance(self.exchange, Exchange):
+            position_size = self.round_volume(position_size)
+            entry_price = self.round_price(entry_price)
+            stop_loss = self.round_price(stop_loss)
+
+        # Enforce exchange minimum volume / notional constraints where possible
+        notional = position_size * entry_price
+        if position_size < self.ordermin or round(notional, self.pair_decimals) < self.costmin:
+            print(
+                f"Position size ({position_size}) and/or notional ({round(notional, self.pair_decimals)}) below exchange minimums "
+                f"(ordermin={self.ordermin}, costmin={self.costmin}). Skipping."
+            )
+            return None
+
+        take_profit = (abs(entry_price - stop_loss) * self.strategy.risk_to_reward_ratio) + entry_price
+
+        if isinstance(self.exchange, Exchange):
+            take_profit = self.round_price(take_profit)
+
+        return entry_price, position_size, stop_loss, take_profit
+
     def place_exit_order(self, price: float, order_type: str, quantity: float):
         """
         Place a market exit order on the exchange to close an existing position.
         """
         print(f"Placing exit {order_type.upper()} order | qty: {round(quantity, 6)} @ ~{price}")
 
-        for attempt in range(self.max_error_count):
+        # Cancel the position's remaining stop-loss / take-profit orders so they cannot fill after the exit
+        if isinstance(self.exchange, Exchange):
+            self.cancel_protective_orders()
+
+        def send_exit_order():
+            # Spot / crypto flow (any Exchange subclass)
+            if isinstance(self.exchange, Exchange):
+                return self.exchange.add_order(
+                    ordertype='market',
+                    type=order_type,
+                    volume=self.round_volume(quantity),
+                    pair=self.pair,
+                    price=price,
+                )
+            # Basic futures flow (any FuturesExchange subclass)
+            elif isinstance(self.exchange, FuturesExchange):
+                action = order_type
+                qty_int = max(1, int(round(quantity)))
+                futures_type = getattr(self, "futures_type", "call")
+                return self.exchange.add_order(
+                    symbol=self.pair,
+                    quantity=qty_int,
+                    futures_type=futures_type,
+                    price=price,
+                    action=action,
+                )
+            else:
+                raise Exception("Invalid Exchange: Exchange is not spot / crypto or futures exchange")
+
+        exit_order_response = self.retry('trading').call(send_exit_order, description='exit order request')
+
+        txids = exit_order_response.get('result', {}).get('txid', [])
+
+        if isinstance(self.exchange, Exchange):
+            self.hold_orders([{'type': order_type, 'price': price, 'volume': quantity}], [exit_order_response.get('result', {})])
+            self.assume_fill(order_type, price, quantity, self.fee_taker)
+
+        if isinstance(txids, list):
+            self.open_order_txids.extend(txids)
+        elif txids:
+            self.open_order_txids.append(txids)
+
+        if txids:
+            print(f"Exit order placed. txids: {txids}")
+        else:
+            print("Exit order submitted (test mode — no txid returned).")
+
+    def place_entry_orders(self, order_dict: dict, strategy_signal: str, position_size: float, order_results: list) -> list:
+        """
+        Places the entry order of a new position with its protective orders and returns their results.
+
+        Buys carry a stop-loss-limit conditional close for downside protection and a take-profit
+        order, all sent as one order group. Results are recorded in order_results, so calling this
+        again with the same list after an error only places the orders that have no txid yet.
+        """
+        # Spot / crypto flow (any Exchange subclass)
+        if isinstance(self.exchange, Exchange):
+            entry_order = {
+                'ordertype': order_dict['ordertype'],
+                'type': order_dict['type'],
+                'volume': order_dict['volume'],
+                'price': order_dict['price'],
+                'oflags': 'post',
+            }
+            orders = [entry_order]
+
+            if order_dict['type'] == 'buy':
+                entry_order['closeordertype'] = 'stop-loss-limit'
+                entry_order['closeprice'] = order_dict['price']  # trigger price
+                entry_order['closeprice2'] = order_dict['stop_loss']  # stop-loss limit
+
+                orders.append({
+                    'ordertype': 'take-profit-limit',
+                    'type': 'sell',
+                    'volume': order_dict['volume'],
+                    'price': order_dict['price'],  # trigger
+                    'price2': order_dict['take_profit'],  # TP limit
+                    'oflags': 'post',
+                })
+
+            return self.place_order_group(orders, order_results)
+        # Basic futures flow (any FuturesExchange subclass)
+        elif isinstance(self.exchange, FuturesExchange):
+            # NOTE: This is a minimal starting implementation.
+            # It assumes `self.pair` is an futures symbol understood by Robinhood
+            # and treats BUY as opening / increasing exposure and SELL as reducing it.
+            action = 'buy' if strategy_signal == 'BUY' else 'sell'
+            # Quantity must be an int for most futures APIs
+            quantity = max(1, int(round(position_size)))
+            futures_type = getattr(self, "futures_type", "call")
+
+            open_position_order_response = self.exchange.add_order(
+                symbol=self.pair,
+                quantity=quantity,
+                futures_type=futures_type,
+                price=self.latest_ohlc.close,
+                action=action,
+            )
+            order_results[:] = [open_position_order_response.get('result', {})]
+            return order_results
+        else:
+            raise Exception("Invalid Exchange: Exchange is not spot / crypto or futures exchange")
+
+    def place_order_group(self, orders: list, order_results: list = None) -> list:
+        """
+        Places orders on the bot's pair and returns the result of each order, shaped like the result of add_order.
+
+        orders are dicts of add_order arguments without pair. Several orders are sent as one
+        add_order_batch request when the exchange supports it, and otherwise one add_order at a
+        time, stopping early if an order is not acknowledged with a txid.
+
+        To retry a group after an error, pass the same order_results list again: results are
+        recorded in it as the orders are placed, and orders that already have a txid are not
+        placed a second time.
+        """
+        order_entry = self.get_order_entry()
+
+        if order_results is None:
+            order_results = []
+
+        if len(orders) > 1 and len(order_results) == 0 and order_entry is self.exchange:
             try:
-                # Spot / crypto flow (any Exchange subclass)
-                if isinstance(self.exchange, Exchange):
-                    exit_order_response = self.exchange.add_order(
-                        ordertype='market',
-                        type=order_type,
-                        volume=quantity,
-                        pair=self.pair,
-                        price=price,
-                    )
-                # Basic futures flow (any FuturesExchange subclass)
-                elif isinstance(self.exchange, FuturesExchange):
-                    action = order_type
-                    qty_int = max(1, int(round(quantity)))
-                    futures_type = getattr(self, "futures_type", "call")
-                    exit_order_response = self.exchange.add_order(
-                        symbol=self.pair,
-                        quantity=qty_int,
-                        futures_type=futures_type,
-                        price=price,
-                        action=action,
-                    )
-                else:
-                    raise Exception("Invalid Exchange: Exchange is not spot / crypto or futures exchange")
-
-                txids = exit_order_response.get('result', {}).get('txid', [])
-                if isinstance(txids, list):
-                    self.open_order_txids.extend(txids)
-                elif txids:
-                    self.open_order_txids.append(txids)
-
-                if txids:
-                    print(f"Exit order placed. txids: {txids}")
-                else:
-                    print("Exit order submitted (test mode — no txid returned).")
+                batch = [self.exchange.to_batch_order(**order) for order in orders]
+            except NotImplementedError:
+                batch = None
+            
+            if batch is not None:
+                response = self.exchange.add_order_batch(batch, self.pair)
+                order_results.extend(response.get('result', {}).get('orders', []))
+
+                for order_result in order_results:
+                    if order_result.get('error'):
+                        print(f"Order in batch rejected: {order_result['error']}")
+                
+                self.hold_orders(orders, order_results)
+                return order_results
+
+        for i, order in enumerate(orders):
+            if i < len(order_results) and len(self.get_txids(order_results[i])) > 0:
+                # Placed by an earlier attempt
+                continue
+
+            if i > 0 and len(self.get_txids(order_results[i - 1])) == 0:
+                print(f"Skipping {order['ordertype']} order because the previous order could not be confirmed.")
                 break
+
+            response = order_entry.add_order(pair=self.pair, **order)
+            del order_results[i:]
+            order_results.append(response.get('result', {}))
+        
+        self.hold_orders(orders, order_results)
+        return order_results
+    
+    def cancel_order_group(self, txids: list):
+        """Cancels orders, as one cancel_order_batch request when the exchange supports it."""
+        if len(txids) == 0:
+            return
+
+        if len(txids) > 1:
+            try:
+                response = self.exchange.cancel_order_batch(txids)
+                self.release_orders(txids)
+                return response
+            except NotImplementedError:
+                pass
+        
+        for txid in txids:
+            self.exchange.cancel_order(txid)
+            self.release_orders([txid])
+    
+    def cancel_protective_orders(self):
+        """
+        Cancels the open position's take-profit order and, once the entry has filled, its conditional
+        stop-loss close. Best effort: each order is cancelled on its own, so one that has already
+        filled or been cancelled does not keep the others open.
+        """
+        txids = list(getattr(self, 'position_order_txids', []))
+        entry_txids = getattr(self, 'position_entry_txids', [])
+
+        try:
+            txids += self.get_conditional_close_txids(entry_txids)
+        except Exception as e:
+            print(f"Error looking up the conditional close orders of {entry_txids}: {e}")
+
+        for txid in txids:
+            try:
+                self.exchange.cancel_order(txid)
+                self.release_orders([txid])
             except Exception as e:
-                print(f"Error placing exit order (attempt {attempt + 1}/{self.max_error_count}): {e}")
+                print(f"Error cancelling position order {txid}: {e}")
 
-                if attempt == self.max_error_count - 1:
-                    print(f"Failed to place exit order after {self.max_error_count} attempts")
-                    raise e
-                else:
-                    time.sleep(self.error_latency)
+        repricer = self.get_repricer()
+        if repricer is not None:
+            for txid in entry_txids:
+                repricer.forget(txid)
+
+        self.position_entry_txids = []
+        self.position_order_txids = []
 
+    def get_repricer(self):
+        """Returns the RepriceEngine of the bot's resting entries, or None if repricing is disabled."""
+        if getattr(self, 'reprice_tolerance_pct', None) is None or not isinstance(self.exchange, Exchange):
+            return None
+
+        if getattr(self, '_repricer', None) is None:
+            self._repricer = RepriceEngine(self.exchange, self.reprice_tolerance_pct, self.reprice_max_chase_pct, self.reprice_min_interval_in_sec)
+
+        return self._repricer
+
+    def reprice_entry_orders(self):
+        """Amends the resting entry to the touch once the market has moved away from it (see RepriceEngine)."""
+        repricer = self.get_repricer()
+
+        if repricer is None or len(repricer) == 0:
+            return
+
+        # The live order book is free to read; otherwise the top of the book costs a public request
+        order_book = self.get_order_book()
+        if order_book is not None:
+            best_bid, best_ask = order_book.best_bid(), order_book.best_ask()
+            best_bid, best_ask = best_bid[0] if best_bid else None, best_ask[0] if best_ask else None
+        else:
+            try:
+                quote = self.retry('public').call(self.exchange.get_quote, self.pair, description='quote request')
+            except NotImplementedError:
+                return
+
+            best_bid, best_ask = quote['bid'], quote['ask']
+
+        for old_txid, new_txid in repricer.reprice(self.pair, best_bid, best_ask).items():
+            self.get_balance_ledger().replace(old_txid, new_txid, repricer.orders[new_txid].price)
+
+            # Editing can give the order a new txid
+            for txids in [self.position_entry_txids, self.open_order_txids, getattr(self, 'entry_order_txids', [])]:
+                if old_txid in txids:
+                    txids[txids.index(old_txid)] = new_txid
+
+            position = self.position_manager.position
+            if position is not None and position.filled_quantity == 0:
+                position.entry_price = repricer.orders[new_txid].price
+
+    def get_conditional_close_txids(self, entry_txids: list) -> list:
+        """Returns the txids of open orders created by the conditional close of entry_txids, which Kraken reports as their refid."""
+        if len(entry_txids) == 0:
+            return []
+
+        open_orders = self.exchange.get_open_orders().get('result', {}).get('open', {})
+
+        return [txid for txid, order in open_orders.items() if order.get('refid') in entry_txids]
+
+    @staticmethod
+    def get_txids(order_result: dict) -> list:
+        """Returns the txids of an order result, which may hold a single txid or a list of them."""
+        txids = order_result.get('txid', [])
+
+        if isinstance(txids, str):
+            return [txids]
+        
+        return list(txids or [])
+    
+    def round_price(self, price: float) -> float:
+        """Rounds price to the pair's tick size."""
+        return self.exchange.pair_registry.get(self.pair).price_quantizer.round(price)
+    
+    def round_volume(self, volume: float) -> float:
+        """Rounds volume down to the pair's lot size."""
+        return self.exchange.pair_registry.get(self.pair).lot_quantizer.floor(volume)
+    
     def get_runtime(self):
         return time.time() - self.start_time
     
@@ -518,112 +830,209 @@ class Bot():
         assert self.max_error_count >= 1
         assert self.error_latency > 0
     
+    def retry(self, endpoint: str = 'private') -> RetryExecutor:
+        """
+        Retry executor for a class of exchange endpoints ('public', 'private' or 'trading').
+
+        Makes up to max_error_count attempts with jittered exponential backoff starting at
+        error_latency, and fails fast while the exchange's circuit for the endpoint is open.
+        """
+        if hasattr(self.exchange, 'retry_executor'):
+            return self.exchange.retry_executor(endpoint, self.max_error_count, self.error_latency)
+
+        # Futures exchanges keep a breaker per bot
+        if getattr(self, '_circuit_breakers', None) is None:
+            self._circuit_breakers = {}
+
+        circuit_breaker = self._circuit_breakers.setdefault(endpoint, CircuitBreaker())
+
+        return RetryExecutor(circuit_breaker, self.max_error_count, self.error_latency)
+    
     def get_account_asset_balance(self, pair: str = 'ZUSD') -> float:
         """Retrieves the cash balance of the asset (i.e. pair or currency), net of pending withdrawals."""
-        for attempt in range(self.max_error_count):
-            try:
-                account_balances_response = self.exchange.get_account_balance()
-
-                account_balances = account_balances_response.get('result')
+        account_balances_response = self.retry('private').call(self.exchange.get_account_balance, description='balance request')
 
-                return float(account_balances.get(pair, 0))
-            except Exception as e:
-                print(f"Error making API request (attempt {attempt + 1}/{self.max_error_count}): {e}")
+        account_balances = account_balances_response.get('result')
 
-                if attempt == self.max_error_count - 1:
-                    print(f"Failed to make API request after {self.max_error_count} attempts")
-                    raise e
-                else:
-                    time.sleep(self.error_latency)
+        return float(account_balances.get(pair, 0))
     
     def get_available_trade_balance(self) -> dict:
         """Retrieves the balance(s) available for trading."""
-        for attempt in range(self.max_error_count):
-            try:
-                extended_balances_response = self.exchange.get_extended_balance()
+        extended_balances_response = self.retry('private').call(self.exchange.get_extended_balance, description='extended balance request')
 
-                extended_balance = extended_balances_response.get('result')
+        extended_balance = extended_balances_response.get('result')
 
-                available_balances = {}
+        available_balances = {}
 
-                for asset in extended_balance.keys():
-                    available_balances[asset] = float(extended_balance[asset]['balance']) + float(extended_balance[asset].get('credit', 0)) - float(extended_balance[asset].get('credit_used', 0)) - float(extended_balance[asset]['hold_trade'])
-                
-                return available_balances
-            except Exception as e:
-                print(f"Error making API request (attempt {attempt + 1}/{self.max_error_count}): {e}")
-                
-                if attempt == self.max_error_count - 1:
-                    print(f"Failed to make API request after {self.max_error_count} attempts")
-                    raise e
-                else:
-                    time.sleep(self.error_latency)
+        for asset in extended_balance.keys():
+            available_balances[asset] = float(extended_balance[asset]['balance']) + float(extended_balance[asset].get('credit', 0)) - float(extended_balance[asset].get('credit_used', 0)) - float(extended_balance[asset]['hold_trade'])
+        
+        return available_balances
     
     def fetch_balances(self):
-        """Fetches latest account balances and account balances available for trading."""
-        for attempt in range(self.max_error_count):
-            try:
-                account_balances_response = self.exchange.get_account_balance()
-                break
-            except Exception as e:
-                print(f"Error making API request (attempt {attempt + 1}/{self.max_error_count}): {e}")
-                
-                if attempt == self.max_error_count - 1:
-                    print(f"Failed to make API request after {self.max_error_count} attempts")
-                    raise e
-                else:
-                    print("Fetching balances: ERROR WAIT")
-                    time.sleep(self.error_latency)
+        """
+        Sets the account balances and the balances available for trading from the BalanceLedger, which only sends a
+        request when it is due to reconcile with the exchange.
+        """
+        ledger = self.get_balance_ledger()
+        ledger.refresh()
+
+        self.account_balances = ledger.get_balances()
+        self.account_trade_balances = ledger.get_available_balances()
+
+    def fetch_extended_balance(self) -> dict:
+        extended_balances_response = self.retry('private').call(self.exchange.get_extended_balance, description='extended balance request')
+
+        return extended_balances_response.get('result')
+
+    def get_balance_ledger(self) -> BalanceLedger:
+        """
+        Returns the BalanceLedger of the bot's pair. Without API keys it starts from the stated portfolio balance,
+        risk_manager.peak_balance, and orders are assumed to fill when placed (see assume_fill).
+        """
+        if getattr(self, '_balance_ledger', None) is None:
+            if self.exchange.api_key != '' and self.exchange.api_sec != '':
+                self._balance_ledger = BalanceLedger(getattr(self, 'base_asset', None), self.base_currency, self.fetch_extended_balance, reconcile_interval_in_sec=self.BALANCE_RECONCILE_INTERVAL_IN_SEC)
+            else:
+                self._balance_ledger = BalanceLedger(getattr(self, 'base_asset', None), self.base_currency, balances={self.base_currency: self.risk_manager.peak_balance})
+
+        return self._balance_ledger
+
+    def hold_orders(self, orders: list, order_results: list):
+        """
+        Records placed orders (add_order arguments and their results) in the BalanceLedger. Without an order socket
+        reporting their fills, the ledger reconciles on its next refresh instead.
+        """
+        ledger = self.get_balance_ledger()
+
+        # Without API keys the orders are settled by assume_fill
+        if ledger.fetch_balances is None:
+            return
+
+        for order, order_result in zip(orders, order_results):
+            for txid in self.get_txids(order_result):
+                ledger.place(txid, order['type'], order['price'], order['volume'])
+
+        if getattr(self, '_order_socket', None) is None:
+            ledger.mark_stale()
+
+    def release_orders(self, txids: list):
+        """Releases the balances cancelled orders held in the BalanceLedger."""
+        ledger = self.get_balance_ledger()
+
+        for txid in txids:
+            ledger.cancel(txid)
+
+        if getattr(self, '_order_socket', None) is None:
+            ledger.mark_stale()
+
+    def assume_fill(self, side: str, price: float, volume: float, fee_pct: float):
+        """Without API keys nothing reports fills, so an order is applied to the BalanceLedger as filled at price."""
+        ledger = self.get_balance_ledger()
+
+        if ledger.fetch_balances is None:
+            ledger.apply_fill({'side': side, 'price': price, 'volume': volume, 'fee': price * volume * fee_pct / 100})
+    
+    def set_market_data(self, market_data):
+        """
+        Attaches a streaming market data source (e.g. KrakenMarketDataFeed) to the bot and its strategy.
+        
+        The source must implement get_latest_ohlc(pair), returning an OHLC or None when it has no fresh data.
+        """
+        self._market_data = market_data
+
+        if hasattr(self.strategy, "set_market_data"):
+            self.strategy.set_market_data(market_data)
+    
+    def get_order_book(self):
+        """Returns the live local order book of the pair from the market data source, or None if there is none."""
+        market_data = getattr(self, "_market_data", None)
+
+        if market_data is None or not hasattr(market_data, "get_order_book"):
+            return None
+
+        return market_data.get_order_book(self.pair)
+    
+    def set_order_socket(self, order_socket):
+        """
+        Attaches an order socket (e.g. KrakenOrderSocket) used for order entry while it is connected.
+
+        Fills reported by the socket update the entry price of the open position.
+        """
+        self._order_socket = order_socket
+        self._fill_lock = threading.Lock()
+        self._unapplied_fills = []
+        order_socket.add_fill_listener(self.on_fill)
+    
+    def get_order_entry(self):
+        """Returns the order socket if one is attached and connected, otherwise the REST exchange."""
+        order_socket = getattr(self, "_order_socket", None)
+
+        if order_socket is not None and order_socket.is_connected():
+            return order_socket
         
-        self.account_balances = account_balances_response.get('result')
+        return self.exchange
+    
+    def track_entry_fills(self, txids: list):
+        """Applies fills of the given entry orders to the open position, including fills received before the position was opened."""
+        self.entry_order_txids = list(txids)
 
-        for asset in self.account_balances.keys():
-            self.account_balances[asset] = float(self.account_balances[asset])
+        if getattr(self, "_order_socket", None) is None:
+            return
         
-        self.account_trade_balances = self.get_available_trade_balance()
+        with self._fill_lock:
+            unapplied_fills = self._unapplied_fills
+            self._unapplied_fills = []
+
+            for fill in unapplied_fills:
+                if fill['order_txid'] in self.entry_order_txids:
+                    self._apply_entry_fill(fill)
+    
+    def on_fill(self, fill: dict):
+        """
+        Fill listener: applies fills of the bot's pair to the BalanceLedger, and entry fills to the open position, keeping
+        others until their order is tracked. The socket reports every fill of the API key, so fills of other pairs (e.g.
+        of other bots) are left to the ledger's reconciliation.
+        """
+        ledger = self.get_balance_ledger()
+
+        if not ledger.tracks(fill.get('order_txid')) and not self.is_pair(fill.get('pair')):
+            return
+
+        ledger.apply_fill(fill)
+
+        with self._fill_lock:
+            if self.position_manager.position is not None and fill['order_txid'] in getattr(self, "entry_order_txids", []):
+                self._apply_entry_fill(fill)
+            else:
+                self._unapplied_fills.append(fill)
+    
+    def is_pair(self, name: str) -> bool:
+        """Returns True if name (e.g. the wsname 'XBT/USD' fills are reported with) is a name of the bot's pair."""
+        if name is None:
+            return False
+
+        return name == self.pair or self.exchange.pair_registry.aliases.get(name) == self.pair_key
+
+    def _apply_entry_fill(self, fill: dict):
+        self.position_manager.apply_fill(fill['price'], fill['volume'])
+        print(f"Entry fill: {fill['volume']} @ {fill['price']}. Entry price now {round(self.position_manager.position.entry_price, self.pair_decimals)}")
     
     def fetch_latest_ohlc(self):
         """Fetches latest OHLC data."""
-        if hasattr(self, "ohlc_asset_key"):
-            for attempt in range(self.max_error_count):
-                try:
-                    ohlc_response = self.exchange.get_ohlc_data(self.pair)
-                    break
-                except Exception as e:
-                    print(f"Error making API request (attempt {attempt + 1}/{self.max_error_count}): {e}")
-
-                    if attempt == self.max_error_count - 1:
-                        print(f"Failed to make API request after {self.max_error_count} attempts")
-                        raise e
-                    else:
-                        time.sleep(self.error_latency)
-        
-            ohlc = ohlc_response.get('result')
-            self.latest_ohlc = OHLC(ohlc[self.ohlc_asset_key][-1])
-        else:
-            for attempt in range(self.max_error_count):
-                try:
-                    ohlc_response = self.exchange.get_ohlc_data(self.pair)
-                    break
-                except Exception as e:
-                    print(f"Error making API request (attempt {attempt + 1}/{self.max_error_count}): {e}")
-
-                    if attempt == self.max_error_count - 1:
-                        print(f"Failed to make API request after {self.max_error_count} attempts")
-                        raise e
-                    else:
-                        time.sleep(self.error_latency)
-            
-            ohlc = ohlc_response.get('result')
+        # Prefer the streaming market data source and fall back to REST if it has no fresh data
+        if getattr(self, "_market_data", None) is not None:
+            latest_ohlc = self._market_data.get_latest_ohlc(self.pair)
 
-            for key in ohlc.keys():
-                if key != 'last':
-                    pair_key = key
-                    break
-            
-            self.ohlc_asset_key = pair_key
-
-            self.latest_ohlc = OHLC(ohlc[pair_key][-1])
+            if latest_ohlc is not None:
+                self.latest_ohlc = latest_ohlc
+                return
+        
+        # Only the candles since the previous poll are fetched
+        if getattr(self, "_ohlc_poller", None) is None:
+            self._ohlc_poller = OHLCPoller(self.exchange)
+        
+        self.latest_ohlc = self.retry('public').call(self._ohlc_poller.get_latest_ohlc, self.pair, description='OHLC request')
     
     def get_realized_gain(self):
         return self.position_manager.realized_pnl
@@ -636,6 +1045,11 @@ class Bot():
         # First remove LSTM model from LSTMStrategy due to not being able to export LSTM model
         if self.strategy.classname == "LSTMStrategy" and hasattr(self.strategy, "model"):
             del self.strategy.model
+
+        if getattr(self, '_prefetch_executor', None) is not None:
+            self._prefetch_executor.shutdown(wait=False)
+            self._prefetch_executor = None
+
         self.to_json_file(f'app/bots/local/{self.name}.json')
 
     def _prepare_strategy_for_restart(self) -> None:
@@ -652,8 +1066,27 @@ class Bot():
     def pause(self):
         raise NotImplementedError("Not Implemented.")
     
-    def update(self):
-        raise NotImplementedError("Not Implemented.")
+    def update(self, settings: dict):
+        """Changes the given UPDATABLE_SETTINGS. Raises ValueError, leaving the bot unchanged, if a setting is unknown or invalid."""
+        unknown = [key for key in settings.keys() if key not in self.UPDATABLE_SETTINGS]
+        if len(unknown) > 0:
+            raise ValueError(f"Settings {unknown} cannot be updated. Updatable settings: {self.UPDATABLE_SETTINGS}")
+
+        previous = {key: getattr(self, key, None) for key in settings.keys()}
+
+        for key, value in settings.items():
+            setattr(self, key, value)
+
+        try:
+            self.check_config()
+        except AssertionError:
+            for key, value in previous.items():
+                setattr(self, key, value)
+
+            raise ValueError(f"Invalid settings: {settings}")
+
+        # Rebuilt from the new settings on next use
+        self._repricer = None
     
     def simulate_trading(self):
         raise NotImplementedError("Not Implemented.")
@@ -662,7 +1095,8 @@ class Bot():
         # Ensure the folder exists
         os.makedirs(os.path.dirname(filename), exist_ok=True)
 
-        data = vars(self)
+        # Like CustomEncoder, leaves out runtime-only attributes (pollers, schedulers, sockets)
+        data = {key: value for key, value in vars(self).items() if not key.startswith('_')}
         with open(filename, 'w') as f:
             json.dump(data, f, indent=4, cls=CustomEncoder)
 
@@ -0,0 +1,211 @@
+import asyncio
+
+class BotRuntime():
+    """
+    Runs a Bot on an asyncio event loop, waking on events instead of sleeping latency seconds.
+
+    Events:
+    - 'candle': a new candle started. Runs every stage: position, signal, sizing, order entry.
+    - 'price': the price crossed the open position's stop or take profit.
+    - 'fill': the order socket reported a fill.
+    - 'timer': a heartbeat every heartbeat_in_sec (the bot's latency by default), which also
+      detects new candles of market data sources that cannot push them.
+    - 'close': a candle of the strategy's interval closed (see Bot.get_signal_scheduler), timed
+      to fetch it as soon as the exchange has it.
+    - 'tick': run every stage now, e.g. on start.
+
+    'price', 'fill' and 'timer' only fetch the price and manage the open position, so nothing
+    asks the strategy or the account for data until there is a new candle. A strategy working on
+    longer candles than the market data only runs once per closed candle of its own. Events that
+    arrive while the pipeline runs are handled together by the next run.
+
+    Market data sources with add_listener (KrakenMarketDataFeed) push 'candle' and 'price'
+    events, and an attached order socket pushes 'fill' events. Control commands sent with
+    send() are 'pause', 'resume' and 'stop'.
+
+    The stages are the Bot's own (monitor_position, generate_signal, ...). Each is awaited on a
+    worker thread, one after the other, so the loop stays free to take events while the
+    exchange is called.
+    """
+    SIGNAL_EVENTS = {'candle', 'close', 'tick'}
+    COMMANDS = {'pause', 'resume', 'stop'}
+
+    def __init__(self, bot, heartbeat_in_sec: float = None):
+        self.classname = self.__class__.__name__
+        self.bot = bot
+        self.heartbeat_in_sec = heartbeat_in_sec if heartbeat_in_sec is not None else bot.latency
+        self.paused = False
+        self.runs = 0
+        self.event_counts = {}
+        self.last_candle_time = None
+        self._loop = None
+        self._queue = None
+
+        assert self.heartbeat_in_sec > 0
+
+    def __repr__(self):
+        return f"{{{self.classname} bot: {self.bot.name}, heartbeat_in_sec: {self.heartbeat_in_sec}, paused: {self.paused}, runs: {self.runs}, event_counts: {self.event_counts}}}"
+
+    def notify(self, event: str):
+        """Queues an event. Safe to call from any thread."""
+        loop = self._loop
+
+        if loop is None or loop.is_closed():
+            return
+
+        try:
+            loop.call_soon_threadsafe(self._queue.put_nowait, event)
+        except RuntimeError:
+            # The loop has just stopped
+            pass
+
+    def send(self, command: str):
+        """Sends a control command ('pause', 'resume' or 'stop'). Safe to call from any thread."""
+        assert command in self.COMMANDS
+        self.notify(command)
+
+    def on_market_data(self, channel: str, pair: str, data):
+        """Market data listener: turns updates of the bot's pair into 'candle' and 'price' events."""
+        if pair != self.bot.pair:
+            return
+
+        if channel == 'ohlc':
+            price = data.close
+
+            if self.last_candle_time is not None and data.time != self.last_candle_time:
+                self.notify('candle')
+        else:
+            price = float(data['last'])
+
+        if self.bot.position_manager.check_exit_conditions(price):
+            self.notify('price')
+
+    def on_fill(self, fill: dict):
+        self.notify('fill')
+
+    async def stage(self, function, *args):
+        """Awaits a blocking stage of the bot on a worker thread."""
+        return await asyncio.to_thread(function, *args)
+
+    async def handle(self, events: set):
+        """Runs the stages the events call for."""
+        # The signal's data and the balances are fetched along with the price when the events call for a signal
+        signal_pending = len(events & self.SIGNAL_EVENTS) > 0 and await self.stage(self.bot.signal_pending)
+        await self.stage(self.bot.fetch_tick_data, signal_pending)
+
+        # The heartbeat discovers new candles of sources that do not push them
+        if self.bot.latest_ohlc.time != self.last_candle_time:
+            self.last_candle_time = self.bot.latest_ohlc.time
+            events = events | {'candle'}
+
+        print(f"\nCurrent price: {self.bot.latest_ohlc.close} (events: {sorted(events)})")
+
+        await self.stage(self.bot.reprice_entry_orders)
+
+        if await self.stage(self.bot.monitor_position):
+            return
+
+        if len(events & self.SIGNAL_EVENTS) == 0 or not await self.stage(self.bot.signal_due):
+            return
+
+        strategy_signal = await self.stage(self.bot.generate_signal)
+
+        if strategy_signal == 'HOLD' or not await self.stage(self.bot.close_opposite_position, strategy_signal):
+            return
+
+        order_dict = await self.stage(self.bot.prepare_entry, strategy_signal)
+
+        if order_dict is None:
+            return
+
+        await self.stage(self.bot.execute_entry, order_dict, strategy_signal)
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_in_sec)
+            self.notify('timer')
+
+    async def candle_close_clock(self):
+        scheduler = self.bot.get_signal_scheduler()
+
+        if scheduler is None:
+            return
+
+        while True:
+            close = scheduler.next_due_close()
+            await asyncio.sleep(scheduler.seconds_until(close))
+            self.notify('close')
+
+    async def next_events(self) -> list:
+        """Waits for an event and returns it with every other event already queued, in order."""
+        events = [await self._queue.get()]
+
+        while not self._queue.empty():
+            events.append(self._queue.get_nowait())
+
+        for event in events:
+            self.event_counts[event] = self.event_counts.get(event, 0) + 1
+
+        return events
+
+    def attach(self):
+        market_data = getattr(self.bot, '_market_data', None)
+        if market_data is not None and hasattr(market_data, 'add_listener'):
+            market_data.add_listener(self.on_market_data)
+
+        order_socket = getattr(self.bot, '_order_socket', None)
+        if order_socket is not None:
+            order_socket.add_fill_listener(self.on_fill)
+
+    async def main(self, max_runs: int = None):
+        """Handles events until stopped or until the pipeline has run max_runs times."""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self.attach()
+        self.notify('tick')
+        timers = [asyncio.create_task(self.heartbeat()), asyncio.create_task(self.candle_close_clock())]
+
+        try:
+            while max_runs is None or self.runs < max_runs:
+                events = await self.next_events()
+
+                if 'stop' in events:
+                    break
+
+                for command in [event for event in events if event in ['pause', 'resume']]:
+                    self.paused = command == 'pause'
+                    print(f"{self.classname}: bot '{self.bot.name}' {command}d")
+
+                events = set(events) - self.COMMANDS
+                if self.paused or len(events) == 0:
+                    continue
+
+                await self.handle(events)
+                self.runs += 1
+        finally:
+            for timer in timers:
+                timer.cancel()
+            self._loop = None
+
+    def run(self, max_runs: int = None):
+        """Runs the bot until stopped, like Bot.run, exporting it on errors."""
+        self.bot.print_header()
+
+        try:
+            asyncio.run(self.main(max_runs))
+        except KeyboardInterrupt as e:
+            print(f"Unexpected error: {e}")
+            print("User ended execution of program.")
+            print(f"Exporting bot to database as {self.bot.name}.json...")
+            self.bot.stop()
+            print(f"Successfully exported bot.")
+
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            print(f"Bot: {self.bot}")
+            print(f"Exporting bot to database as {self.bot.name}.json...")
+            self.bot.stop()
+            print(f"Successfully exported bot.")
+            raise e
+
+        self.bot.print_summary()
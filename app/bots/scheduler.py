@@ -0,0 +1,68 @@
+import threading
+import time
+
+class CandleCloseScheduler():
+    """
+    Decides when a strategy working on interval_in_sec candles generates its signal: once per
+    closed candle, as soon as the closed candle can be fetched.
+
+    Times are on the exchange's clock when a clock is given (e.g. Exchange.clock, a ClockSync). A
+    candle closing at t is due once a request sent now reaches the exchange settle_in_sec after t,
+    that is at t + settle_in_sec - rtt / 2, with rtt the round trip measured by the clock.
+    """
+    def __init__(self, interval_in_sec: int, clock=None, settle_in_sec: float = 1.0):
+        assert interval_in_sec > 0
+        assert settle_in_sec >= 0
+
+        self.classname = self.__class__.__name__
+        self.interval_in_sec = interval_in_sec
+        self.clock = clock
+        self.settle_in_sec = settle_in_sec
+        self.last_close = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{{{self.classname} interval_in_sec: {self.interval_in_sec}, settle_in_sec: {self.settle_in_sec}, last_close: {self.last_close}}}"
+
+    def now(self) -> float:
+        return self.clock.now() if self.clock is not None else time.time()
+
+    def get_lead_in_sec(self) -> float:
+        """How long after a close it is due."""
+        rtt = getattr(self.clock, 'rtt', None) or 0
+        return self.settle_in_sec - rtt / 2
+
+    def latest_due_close(self, now: float = None) -> int:
+        """The close time of the newest candle that is due."""
+        now = now if now is not None else self.now()
+        return int((now - self.get_lead_in_sec()) // self.interval_in_sec * self.interval_in_sec)
+
+    def next_due_close(self, now: float = None) -> int:
+        """The close time of the next candle to become due."""
+        return self.latest_due_close(now) + self.interval_in_sec
+
+    def seconds_until(self, close: int, now: float = None) -> float:
+        """Seconds until the candle closing at close is due (0 if it already is)."""
+        now = now if now is not None else self.now()
+        return max(0.0, close + self.get_lead_in_sec() - now)
+
+    def seconds_until_due(self, now: float = None) -> float:
+        """Seconds until claim() next returns True."""
+        now = now if now is not None else self.now()
+        close = self.latest_due_close(now)
+
+        if self.last_close is None or close > self.last_close:
+            return 0.0
+
+        return self.seconds_until(close + self.interval_in_sec, now)
+
+    def claim(self, now: float = None) -> bool:
+        """Returns True once per closed candle, the first time it is called after the candle is due."""
+        close = self.latest_due_close(now)
+
+        with self._lock:
+            if self.last_close is not None and close <= self.last_close:
+                return False
+
+            self.last_close = close
+            return True
@@ -0,0 +1,253 @@
+import functools
+import multiprocessing
+import os
+import threading
+from config import BotConfig, ExchangeConfig, StrategyConfig
+from app.bots.supervisor import BotSupervisor, BotNotFoundError
+from app.exchanges.exchange import KrakenExchange
+from app.marketdata.marketdatabus import MarketDataBus
+from app.marketdata.snapshot import MarketSnapshotService
+from app.strategies.strategy import load_shared_model
+
+def serve_shard(connection, supervisor_factory):
+    """Runs in a shard process: hosts the BotSupervisor supervisor_factory() creates and carries out the coordinator's calls on it."""
+    supervisor = supervisor_factory()
+
+    try:
+        while True:
+            method, args = connection.recv()
+
+            try:
+                assert method in ShardedSupervisor.SHARD_METHODS
+                response = ('ok', getattr(supervisor, method)(*args))
+            except Exception as e:
+                response = ('error', e)
+
+            try:
+                connection.send(response)
+            except Exception:
+                # The exception could not be pickled
+                connection.send(('error', RuntimeError(str(response[1]))))
+
+            if method == 'close':
+                return
+    except EOFError:
+        # The coordinator is gone
+        supervisor.close()
+
+class ShardedSupervisor():
+    """
+    Hosts bots across shard_count processes, each running a BotSupervisor, so LSTM inference and
+    feature building (which hold the GIL) use as many cores as there are shards.
+
+    Bots are assigned to shards by pair: every bot of a pair runs in the same shard, which then
+    fetches the pair's market data once and alone trades it (so the pair's trading rate limit
+    is not split). A new pair goes to the shard whose running bots use the least CPU time per
+    second, as measured by BotSupervisor, with the fewest bots breaking ties.
+
+    Shards are forked (on platforms that support fork) after the models in model_uuids are
+    loaded, so their weights are shared copy-on-write rather than loaded by every shard.
+
+    From from_config, the coordinator and every shard use the same API key: each gets 1/(shards + 1)
+    of the key's rate limits, and all of them sign with nonces drawn from the key's NonceCounter,
+    which is created before the fork so the shards share it. As requests of several processes can
+    still reach Kraken out of order, the key needs a nonce window.
+
+    With a market_data_service, the coordinator fetches the market data of every pair once and
+    publishes it on market_data, a MarketDataBus the shards read from shared memory.
+
+    It offers the same operations as BotSupervisor, on ids that are unique across shards.
+    """
+    SHARD_METHODS = ['create_bot', 'get', 'list', 'start', 'pause', 'restart', 'stop', 'update', 'remove', 'close']
+
+    def __init__(self, supervisor_factory, shard_count: int = None, model_uuids: list = None, market_data: MarketDataBus = None, market_data_service=None):
+        self.classname = self.__class__.__name__
+        self.shard_count = shard_count if shard_count is not None else os.cpu_count()
+        self.model_uuids = list(model_uuids or [])
+        self.market_data = market_data
+        self.market_data_service = market_data_service
+        self.pair_shards = {}
+        # bot_id -> (shard index, pair, id of the bot in its shard)
+        self.bots = {}
+        self._next_id = 1
+        self._lock = threading.RLock()
+
+        assert self.shard_count > 0
+
+        for model_uuid in self.model_uuids:
+            load_shared_model(model_uuid)
+
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        self._connections = []
+        self._connection_locks = []
+        self._processes = []
+
+        for index in range(self.shard_count):
+            connection, shard_connection = context.Pipe()
+            process = context.Process(target=serve_shard, args=(shard_connection, supervisor_factory), name=f"{self.classname}-{index}", daemon=True)
+            process.start()
+            shard_connection.close()
+
+            self._connections.append(connection)
+            self._connection_locks.append(threading.Lock())
+            self._processes.append(process)
+
+    def __repr__(self):
+        return f"{{{self.classname} shard_count: {self.shard_count}, bots: {len(self.bots)}, pair_shards: {self.pair_shards}}}"
+
+    @classmethod
+    def from_config(cls, filepath: str = '.env'):
+        """
+        Creates exchange_config.shards shards for the exchange configured in filepath, reading market data the coordinator
+        publishes. The shards and the coordinator share the API key's rate limits.
+        """
+        exchange_config = ExchangeConfig(filepath)
+        strategy_config = StrategyConfig(filepath)
+
+        if exchange_config.exchange_name != 'Kraken':
+            raise NotImplementedError(f"Supervising bots on {exchange_config.exchange_name} is not implemented")
+
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            # Shards started otherwise would not share the API key's nonces
+            raise NotImplementedError("Sharding bots that share an API key needs the fork start method. Set SHARDS=1.")
+
+        model_uuids = [strategy_config.lstm_model_uuid] if strategy_config.strategy == 'LSTM' and strategy_config.lstm_model_uuid else []
+        # The coordinator's requests count as one more shard
+        rate_limit_share = 1 / (exchange_config.shards + 1)
+
+        exchange = KrakenExchange(exchange_config)
+        exchange.rate_limit_share = rate_limit_share
+        # Created before the shards are forked, so they inherit it
+        exchange.nonce_counter
+        market_data_service = MarketSnapshotService(exchange)
+        market_data = MarketDataBus()
+        market_data.attach_snapshot_service(market_data_service)
+
+        supervisor_factory = functools.partial(BotSupervisor.from_config, filepath, rate_limit_share, market_data)
+        return cls(supervisor_factory, exchange_config.shards, model_uuids, market_data, market_data_service)
+
+    def call(self, shard: int, method: str, *args):
+        """Calls method of the BotSupervisor of a shard and returns its result, raising its exceptions."""
+        with self._connection_locks[shard]:
+            self._connections[shard].send((method, args))
+            status, value = self._connections[shard].recv()
+
+        if status == 'error':
+            raise value
+
+        return value
+
+    def get_shard_loads(self) -> list:
+        """The CPU time per second the running bots of each shard use."""
+        return [sum(status['cpu_load'] for status in self.call(shard, 'list') if status['state'] == 'running') for shard in range(self.shard_count)]
+
+    def get_shard(self, pair: str) -> int:
+        """The shard bots of pair run in, choosing the least loaded one for a new pair."""
+        if pair in self.pair_shards:
+            return self.pair_shards[pair]
+
+        loads = self.get_shard_loads()
+        bot_counts = [len([bot for bot in self.bots.values() if bot[0] == shard]) for shard in range(self.shard_count)]
+        shard = min(range(self.shard_count), key=lambda index: (loads[index], bot_counts[index]))
+
+        self.pair_shards[pair] = shard
+        print(f"{self.classname}: assigned {pair} to shard {shard} (loads: {[round(load, 3) for load in loads]})")
+        return shard
+
+    def _get_bot(self, bot_id: int) -> tuple:
+        with self._lock:
+            if bot_id not in self.bots:
+                raise BotNotFoundError(bot_id)
+
+            return self.bots[bot_id]
+
+    def _call_bot(self, method: str, bot_id: int, *args) -> dict:
+        shard, pair, shard_bot_id = self._get_bot(bot_id)
+        return self._to_status(bot_id, shard, self.call(shard, method, shard_bot_id, *args))
+
+    def _to_status(self, bot_id: int, shard: int, status: dict) -> dict:
+        return {**status, 'bot_id': bot_id, 'shard': shard, 'pid': self._processes[shard].pid}
+
+    def create_bot(self, filepath: str = '.env', settings: dict = None) -> int:
+        """Creates a bot like BotSupervisor.create_bot in the shard of its pair. Returns its id."""
+        pair = (settings or {}).get('pair') or BotConfig(filepath).pair
+
+        with self._lock:
+            shard = self.get_shard(pair)
+
+            if self.market_data_service is not None:
+                self.market_data_service.subscribe(pair)
+                self.market_data_service.start()
+
+            shard_bot_id = self.call(shard, 'create_bot', filepath, settings)
+            bot_id = self._next_id
+            self._next_id += 1
+            self.bots[bot_id] = (shard, pair, shard_bot_id)
+
+        return bot_id
+
+    def get(self, bot_id: int) -> dict:
+        return self._call_bot('get', bot_id)
+
+    def list(self) -> list:
+        with self._lock:
+            bots = dict(self.bots)
+
+        statuses = {}
+        for shard in range(self.shard_count):
+            for status in self.call(shard, 'list'):
+                statuses[(shard, status['bot_id'])] = status
+
+        return [self._to_status(bot_id, shard, statuses[(shard, shard_bot_id)]) for bot_id, (shard, pair, shard_bot_id) in bots.items()]
+
+    def start(self, bot_id: int) -> dict:
+        return self._call_bot('start', bot_id)
+
+    def pause(self, bot_id: int) -> dict:
+        return self._call_bot('pause', bot_id)
+
+    def restart(self, bot_id: int) -> dict:
+        return self._call_bot('restart', bot_id)
+
+    def stop(self, bot_id: int) -> dict:
+        return self._call_bot('stop', bot_id)
+
+    def update(self, bot_id: int, settings: dict) -> dict:
+        return self._call_bot('update', bot_id, settings)
+
+    def remove(self, bot_id: int) -> dict:
+        """Removes a bot like BotSupervisor.remove. A pair without bots left may be assigned to another shard."""
+        status = self._call_bot('remove', bot_id)
+
+        with self._lock:
+            shard, pair, shard_bot_id = self.bots.pop(bot_id)
+
+            if not any(other[1] == pair for other in self.bots.values()):
+                self.pair_shards.pop(pair, None)
+
+                if self.market_data_service is not None:
+                    self.market_data_service.unsubscribe(pair)
+
+        return status
+
+    def close(self):
+        """Stops every running bot and the shards."""
+        for shard in range(self.shard_count):
+            if self._processes[shard].is_alive():
+                self.call(shard, 'close')
+
+        for process in self._processes:
+            process.join()
+
+        if self.market_data_service is not None:
+            self.market_data_service.stop()
+
+        if self.market_data is not None:
+            self.market_data.close()
+
+def create_supervisor(filepath: str = '.env'):
+    """Creates the supervisor configured in filepath: a ShardedSupervisor if exchange_config.shards is above 1, else a BotSupervisor."""
+    if ExchangeConfig(filepath).shards > 1:
+        return ShardedSupervisor.from_config(filepath)
+
+    return BotSupervisor.from_config(filepath)
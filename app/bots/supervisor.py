@@ -0,0 +1,289 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from constants import DEFAULT_POOL_SIZE
+from config import BotConfig, ExchangeConfig, StrategyConfig, RiskManagerConfig
+from app.bots.bot import Bot
+from app.exchanges.exchange import KrakenExchange
+from app.marketdata.snapshot import MarketSnapshotService
+from app.riskmanager import RiskManager
+from app.strategies.strategy import LSTMStrategy
+
+class BotNotFoundError(KeyError):
+    """No bot has the given id."""
+    pass
+
+class BotSupervisor():
+    """
+    Hosts many bots in one process.
+
+    The bots share the supervisor's exchange client (one pooled session and rate limiter), one
+    market data cache (market_data, e.g. the exchange's MarketSnapshotService) and the LSTM model
+    cache of LSTMStrategy, so every further bot costs a few objects rather than an interpreter.
+
+    Running bots do not get a thread each. A scheduler thread hands the tick() of each bot that is
+    due to a pool of max_workers threads, and the bot's next tick is due Bot.get_sleep_in_sec()
+    after it finishes, so a bot never has two ticks in flight. A bot whose ticks fail
+    max_error_count times in a row is stopped and exported. The CPU time of each bot's ticks is
+    measured, which ShardedSupervisor balances its processes by. The requests bots send
+    concurrently within a tick (see Bot.prefetch) share one I/O pool of io_workers threads
+    (4 * max_workers by default), rather than a pool per bot.
+
+    Bots are identified by the integer id add() returns. Their state is 'added', 'running',
+    'paused', 'stopped' or 'failed'.
+    """
+    def __init__(self, exchange, market_data=None, max_workers: int = DEFAULT_POOL_SIZE, io_workers: int = None):
+        self.classname = self.__class__.__name__
+        self.exchange = exchange
+        self.market_data = market_data
+        self.max_workers = max_workers
+        self.io_workers = io_workers if io_workers is not None else 4 * max_workers
+        self.bots = {}
+        self._next_id = 1
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=self.classname)
+        self._io_executor = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix=f"{self.classname}-io")
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return f"{{{self.classname} exchange: {self.exchange.classname}, bots: {len(self.bots)}, max_workers: {self.max_workers}}}"
+
+    @classmethod
+    def from_config(cls, filepath: str = '.env', rate_limit_share: float = 1.0, market_data=None):
+        """
+        Creates a supervisor for the exchange configured in filepath, with market_data (by default the exchange's shared
+        MarketSnapshotService) as market data. rate_limit_share is the share of the API key's rate limits it may use.
+        """
+        exchange_config = ExchangeConfig(filepath)
+
+        if exchange_config.exchange_name != 'Kraken':
+            raise NotImplementedError(f"Supervising bots on {exchange_config.exchange_name} is not implemented")
+
+        exchange = KrakenExchange(exchange_config)
+        exchange.rate_limit_share = rate_limit_share
+
+        return cls(exchange, market_data if market_data is not None else MarketSnapshotService.shared(exchange), exchange_config.pool_size)
+
+    def create_bot(self, filepath: str = '.env', settings: dict = None) -> int:
+        """
+        Creates a bot from the configuration in filepath on the supervisor's exchange and adds it.
+        settings override BotConfig values (e.g. {'name': 'xbt', 'pair': 'XBTUSD'}). Returns its id.
+        """
+        bot_config = BotConfig(filepath)
+        strategy_config = StrategyConfig(filepath)
+        risk_manager = RiskManager(RiskManagerConfig(filepath))
+
+        for key, value in (settings or {}).items():
+            if not hasattr(bot_config, key) or key == 'classname':
+                raise ValueError(f"Unknown bot setting {key}")
+
+            setattr(bot_config, key, value)
+
+        strategy_config.pair = bot_config.pair
+
+        if strategy_config.strategy != 'LSTM':
+            raise ValueError(f"Strategy {strategy_config.strategy} not valid")
+
+        strategy = LSTMStrategy(strategy_config, self.exchange)
+
+        return self.add(Bot(bot_config, self.exchange, strategy, risk_manager))
+
+    def add(self, bot: Bot) -> int:
+        """Adds bot without starting it and returns its id."""
+        if self.market_data is not None:
+            self.market_data.subscribe(bot.pair)
+            bot.set_market_data(self.market_data)
+
+        bot.set_io_executor(self._io_executor)
+
+        with self._lock:
+            bot_id = self._next_id
+            self._next_id += 1
+            self.bots[bot_id] = {'bot': bot, 'state': 'added', 'next_tick_at': 0, 'future': None, 'ticks': 0, 'errors': 0, 'last_error': None, 'added_at': time.monotonic(), 'cpu_time': 0.0}
+
+        print(f"{self.classname}: added bot {bot_id} '{bot.name}' on {bot.pair}")
+        return bot_id
+
+    def _get_entry(self, bot_id: int) -> dict:
+        with self._lock:
+            if bot_id not in self.bots:
+                raise BotNotFoundError(bot_id)
+
+            return self.bots[bot_id]
+
+    def get(self, bot_id: int) -> dict:
+        """Returns the status of a bot."""
+        entry = self._get_entry(bot_id)
+        bot = entry['bot']
+        position = bot.position_manager.position
+
+        return {
+            'bot_id': bot_id,
+            'name': bot.name,
+            'uuid': bot.uuid,
+            'pair': bot.pair,
+            'mode': bot.mode,
+            'state': entry['state'],
+            'ticks': entry['ticks'],
+            'errors': entry['errors'],
+            'last_error': entry['last_error'],
+            'position': None if position is None else {'side': position.side, 'entry_price': position.entry_price, 'quantity': position.quantity, 'stop_loss': position.stop_loss, 'take_profit': position.take_profit},
+            'realized_pnl': bot.position_manager.realized_pnl,
+            'cpu_time': entry['cpu_time'],
+            # Share of a core the bot's ticks have used since it was added
+            'cpu_load': entry['cpu_time'] / max(time.monotonic() - entry['added_at'], 1e-9),
+        }
+
+    def list(self) -> list:
+        with self._lock:
+            bot_ids = list(self.bots.keys())
+
+        return [self.get(bot_id) for bot_id in bot_ids]
+
+    def start(self, bot_id: int) -> dict:
+        """Starts (or resumes) ticking a bot."""
+        entry = self._get_entry(bot_id)
+
+        with self._lock:
+            entry['state'] = 'running'
+            entry['next_tick_at'] = 0
+            entry['errors'] = 0
+
+        self._start_scheduler()
+        self._wake_event.set()
+        return self.get(bot_id)
+
+    def pause(self, bot_id: int) -> dict:
+        """Stops scheduling ticks of a bot, keeping its position and orders. A tick in flight completes."""
+        entry = self._get_entry(bot_id)
+
+        with self._lock:
+            if entry['state'] != 'running':
+                raise ValueError(f"Bot {bot_id} is {entry['state']}, not running")
+
+            entry['state'] = 'paused'
+
+        return self.get(bot_id)
+
+    def restart(self, bot_id: int) -> dict:
+        """Reloads the state a stopped bot's export did not keep (e.g. its LSTM model) and starts it again."""
+        entry = self._get_entry(bot_id)
+        entry['bot']._prepare_strategy_for_restart()
+        return self.start(bot_id)
+
+    def stop(self, bot_id: int) -> dict:
+        """Stops a bot after its tick in flight and exports it, like Bot.stop."""
+        entry = self._get_entry(bot_id)
+
+        with self._lock:
+            entry['state'] = 'stopped'
+            future = entry['future']
+
+        if future is not None:
+            future.result()
+
+        entry['bot'].stop()
+        return self.get(bot_id)
+
+    def update(self, bot_id: int, settings: dict) -> dict:
+        """Changes settings of a bot (see Bot.UPDATABLE_SETTINGS)."""
+        self._get_entry(bot_id)['bot'].update(settings)
+        return self.get(bot_id)
+
+    def remove(self, bot_id: int) -> dict:
+        """Stops a running or paused bot and removes it."""
+        entry = self._get_entry(bot_id)
+
+        if entry['state'] in ['running', 'paused']:
+            self.stop(bot_id)
+
+        status = self.get(bot_id)
+
+        with self._lock:
+            del self.bots[bot_id]
+            pair_in_use = any(other['bot'].pair == entry['bot'].pair for other in self.bots.values())
+
+        if self.market_data is not None and not pair_in_use:
+            self.market_data.unsubscribe(entry['bot'].pair)
+
+        return status
+
+    def close(self):
+        """Stops every running bot and the scheduler."""
+        for bot_id in [bot_id for bot_id, entry in list(self.bots.items()) if entry['state'] in ['running', 'paused']]:
+            self.stop(bot_id)
+
+        self._stop_event.set()
+        self._wake_event.set()
+
+        # A scan in progress may still submit ticks
+        if self._thread is not None:
+            self._thread.join()
+
+        self._executor.shutdown(wait=True)
+        self._io_executor.shutdown(wait=False)
+
+    def _start_scheduler(self):
+        if self.market_data is not None and hasattr(self.market_data, 'start'):
+            self.market_data.start()
+
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            self._thread = threading.Thread(target=self._run, name=self.classname, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            # Cleared before the scan, so a tick finishing meanwhile still wakes the next wait
+            self._wake_event.clear()
+            now = time.monotonic()
+            next_tick_at = None
+
+            with self._lock:
+                for bot_id, entry in self.bots.items():
+                    if entry['state'] != 'running' or entry['future'] is not None:
+                        continue
+
+                    if entry['next_tick_at'] <= now:
+                        entry['future'] = self._executor.submit(self._tick, bot_id, entry)
+                    elif next_tick_at is None or entry['next_tick_at'] < next_tick_at:
+                        next_tick_at = entry['next_tick_at']
+
+            # Sleep until the next bot is due, or until a tick finishes or a bot is started
+            self._wake_event.wait(None if next_tick_at is None else max(0, next_tick_at - time.monotonic()))
+
+    def _tick(self, bot_id: int, entry: dict):
+        bot = entry['bot']
+        delay = bot.error_latency
+        # CPU time of this worker thread only, so ticks of other bots are not counted
+        cpu_started_at = time.thread_time()
+
+        try:
+            bot.tick()
+            entry['errors'] = 0
+            delay = bot.get_sleep_in_sec()
+        except Exception as e:
+            entry['errors'] += 1
+            entry['last_error'] = str(e)
+            print(f"{self.classname}: bot {bot_id} '{bot.name}' tick failed ({entry['errors']}/{bot.max_error_count}): {e}")
+
+            if entry['errors'] >= bot.max_error_count:
+                print(f"{self.classname}: stopping bot {bot_id} '{bot.name}' and exporting it.")
+                entry['state'] = 'failed'
+
+                try:
+                    bot.stop()
+                except Exception as e:
+                    print(f"{self.classname}: exporting bot {bot_id} failed: {e}")
+        finally:
+            with self._lock:
+                entry['cpu_time'] += time.thread_time() - cpu_started_at
+                entry['ticks'] += 1
+                entry['next_tick_at'] = time.monotonic() + delay
+                entry['future'] = None
+
+            self._wake_event.set()
@@ -5,6 +5,7 @@ class RequestType(Enum):
     BOT_LOAD = 1
     LSTM_TRAIN = 2
     LSTM_TRAIN_FETCH = 3
+    SERVE = 4
 
 class BotMode(Enum):
     TEST = 0
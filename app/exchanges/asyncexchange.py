@@ -0,0 +1,154 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from config import ExchangeConfig
+from app.exchanges.exchange import KrakenExchange
+
+class AsyncKrakenExchange():
+    """
+    Asyncio counterpart of KrakenExchange.
+
+    Every public and private KrakenExchange method has an awaitable twin with the same name and
+    arguments, so independent requests can be issued together, e.g.
+
+        ohlc, balances, extended_balances = await exchange.gather(
+            exchange.get_ohlc_data(pair),
+            exchange.get_account_balance(),
+            exchange.get_extended_balance(),
+        )
+
+    Requests run on a worker pool sized to the exchange's connection pool and reuse the pooled
+    keep-alive session of the wrapped KrakenExchange. Nonces come from KrakenExchange.get_nonce,
+    which is strictly increasing across threads. Concurrent private calls can still reach Kraken
+    out of order, so the API key needs a nonce window greater than 0.
+
+    The wrapped KrakenExchange is available as `sync` and can be handed to Bot unchanged.
+    """
+    def __init__(self, exchange_config: ExchangeConfig={}, exchange: KrakenExchange=None):
+        self.classname = self.__class__.__name__
+
+        if exchange is None:
+            exchange = KrakenExchange(exchange_config)
+        
+        self.exchange = exchange
+        self._executor = ThreadPoolExecutor(max_workers=exchange.pool_size, thread_name_prefix='AsyncKrakenExchange')
+    
+    def __repr__(self):
+        return f"{{{self.classname} exchange: {self.exchange}}}"
+    
+    @property
+    def sync(self) -> KrakenExchange:
+        """Blocking facade sharing this client's session, for code such as Bot that expects an Exchange."""
+        return self.exchange
+    
+    async def _call(self, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(method, *args, **kwargs))
+    
+    async def gather(self, *aws, return_exceptions=False):
+        """Awaits the given requests concurrently and returns their results in order."""
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+    
+    def run(self, *aws, return_exceptions=False):
+        """Runs the given requests concurrently from blocking code and returns their results in order."""
+        return asyncio.run(self.gather(*aws, return_exceptions=return_exceptions))
+    
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.exchange.close()
+    
+    async def warm_up(self):
+        return await self._call(self.exchange.warm_up)
+    
+    # Public requests
+    async def get_exchange_time(self):
+        return await self._call(self.exchange.get_exchange_time)
+    
+    async def get_exchange_status(self):
+        return await self._call(self.exchange.get_exchange_status)
+    
+    async def get_asset_info(self, *args, **kwargs):
+        """See KrakenExchange.get_asset_info."""
+        return await self._call(self.exchange.get_asset_info, *args, **kwargs)
+    
+    async def get_tradable_asset_pairs(self, *args, **kwargs):
+        """See KrakenExchange.get_tradable_asset_pairs."""
+        return await self._call(self.exchange.get_tradable_asset_pairs, *args, **kwargs)
+    
+    async def get_ticker_info(self, *args, **kwargs):
+        """See KrakenExchange.get_ticker_info."""
+        return await self._call(self.exchange.get_ticker_info, *args, **kwargs)
+    
+    async def get_ohlc_data(self, *args, **kwargs):
+        """See KrakenExchange.get_ohlc_data."""
+        return await self._call(self.exchange.get_ohlc_data, *args, **kwargs)
+    
+    async def get_order_book(self, *args, **kwargs):
+        """See KrakenExchange.get_order_book."""
+        return await self._call(self.exchange.get_order_book, *args, **kwargs)
+    
+    async def get_recent_trades(self, *args, **kwargs):
+        """See KrakenExchange.get_recent_trades."""
+        return await self._call(self.exchange.get_recent_trades, *args, **kwargs)
+    
+    async def get_recent_spreads(self, *args, **kwargs):
+        """See KrakenExchange.get_recent_spreads."""
+        return await self._call(self.exchange.get_recent_spreads, *args, **kwargs)
+    
+    # Authenticated requests
+    async def add_order(self, *args, **kwargs):
+        """See KrakenExchange.add_order."""
+        return await self._call(self.exchange.add_order, *args, **kwargs)
+    
+    async def add_order_batch(self, *args, **kwargs):
+        """See KrakenExchange.add_order_batch."""
+        return await self._call(self.exchange.add_order_batch, *args, **kwargs)
+    
+    async def edit_order(self, *args, **kwargs):
+        """See KrakenExchange.edit_order."""
+        return await self._call(self.exchange.edit_order, *args, **kwargs)
+    
+    async def cancel_order(self, *args, **kwargs):
+        """See KrakenExchange.cancel_order."""
+        return await self._call(self.exchange.cancel_order, *args, **kwargs)
+    
+    async def cancel_order_batch(self, *args, **kwargs):
+        """See KrakenExchange.cancel_order_batch."""
+        return await self._call(self.exchange.cancel_order_batch, *args, **kwargs)
+    
+    async def get_account_balance(self):
+        return await self._call(self.exchange.get_account_balance)
+    
+    async def get_extended_balance(self):
+        return await self._call(self.exchange.get_extended_balance)
+    
+    async def get_trade_balance(self, *args, **kwargs):
+        """See KrakenExchange.get_trade_balance."""
+        return await self._call(self.exchange.get_trade_balance, *args, **kwargs)
+    
+    async def get_open_orders(self, *args, **kwargs):
+        """See KrakenExchange.get_open_orders."""
+        return await self._call(self.exchange.get_open_orders, *args, **kwargs)
+    
+    async def get_closed_orders(self, *args, **kwargs):
+        """See KrakenExchange.get_closed_orders."""
+        return await self._call(self.exchange.get_closed_orders, *args, **kwargs)
+    
+    async def get_orders_info(self, *args, **kwargs):
+        """See KrakenExchange.get_orders_info."""
+        return await self._call(self.exchange.get_orders_info, *args, **kwargs)
+    
+    async def get_trades_info(self, *args, **kwargs):
+        """See KrakenExchange.get_trades_info."""
+        return await self._call(self.exchange.get_trades_info, *args, **kwargs)
+    
+    async def get_trades_history(self, *args, **kwargs):
+        """See KrakenExchange.get_trades_history."""
+        return await self._call(self.exchange.get_trades_history, *args, **kwargs)
+    
+    async def get_trade_volume(self, *args, **kwargs):
+        """See KrakenExchange.get_trade_volume."""
+        return await self._call(self.exchange.get_trade_volume, *args, **kwargs)
+    
+    async def get_websockets_token(self):
+        return await self._call(self.exchange.get_websockets_token)
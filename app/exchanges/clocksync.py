@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import deque
+
+class ClockSync():
+    """
+    Estimates the offset between the local clock and an exchange's clock, so signed requests can
+    be timestamped locally instead of asking the server for its time first.
+
+    Every sample measures the round trip around one fetch_server_time() call and assumes the server
+    read its clock halfway through it (as NTP does): offset = server_time - (sent + received) / 2.
+    The error of a sample is at most half its round trip, so the offset is taken from the sample
+    with the smallest round trip among the last window samples.
+
+    fetch_server_time must return the server's UNIX time in seconds, or None if the exchange has no
+    time source, in which case now() is simply the local time.
+    """
+    def __init__(self, fetch_server_time, sample_interval_in_sec: float = 60, window: int = 8):
+        self.fetch_server_time = fetch_server_time
+        self.sample_interval_in_sec = sample_interval_in_sec
+
+        # (round trip, offset) of the most recent samples
+        self.samples = deque(maxlen=window)
+        self.offset = 0
+        self.rtt = None
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return f"{{ClockSync offset: {round(self.offset, 4)}, rtt: {self.rtt}, samples: {len(self.samples)}}}"
+
+    def now(self) -> float:
+        """Returns the estimated server time in seconds."""
+        return time.time() + self.offset
+
+    def now_ms(self) -> int:
+        return int(1000 * self.now())
+
+    def sample(self) -> bool:
+        """Takes one sample and updates the offset estimate. Returns False if the server time could not be fetched."""
+        sent = time.time()
+        server_time = self.fetch_server_time()
+        received = time.time()
+
+        if server_time is None:
+            return False
+
+        rtt = received - sent
+
+        with self._lock:
+            self.samples.append((rtt, server_time - (sent + received) / 2))
+            self.rtt, self.offset = min(self.samples)
+
+        return True
+
+    def start(self):
+        """Takes a first sample right away, then keeps sampling in the background. Safe to call repeatedly."""
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            self._thread = threading.Thread(target=self._run, name='ClockSync', daemon=True)
+
+        try:
+            if not self.sample():
+                # No time source: nothing to keep in sync
+                return
+        except Exception as e:
+            print(f"Clock sync failed, using local time: {e}")
+
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.sample_interval_in_sec):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Clock sync failed: {e}")
@@ -1,10 +1,17 @@
-import requests
 import inspect
-from constants import CLASS_NAMES
+import threading
+from constants import CLASS_NAMES, DEFAULT_REQUEST_TIMEOUT_IN_SEC
+from app.exchanges.session import create_session
+from app.exchanges.ratelimiter import FixedWindowCounter
+from app.shared import get_shared
 
 class CoinMarketCapAPI():
+    # Guards the lazy creation of the per-instance session
+    _session_lock = threading.Lock()
+
     def __init__(self, api_key={}):
         self.classname = self.__class__.__name__
+        self.timeout = DEFAULT_REQUEST_TIMEOUT_IN_SEC
         if type(api_key) == dict:
             # Reloading
             print(f"Reloading {self.classname}...")
@@ -25,8 +32,24 @@ class CoinMarketCapAPI():
         
         return f"{{{self.classname} api_key: {api_key_display}, base_api: {self.base_api}}}"
 
+    @property
+    def session(self):
+        """Keep-alive connection pool reused across requests. Created on first use so reloaded instances get one as well."""
+        if getattr(self, '_session', None) is None:
+            with self._session_lock:
+                if getattr(self, '_session', None) is None:
+                    self._session = create_session()
+        
+        return self._session
+
+    @property
+    def rate_limiter(self):
+        """Per-minute call budget shared by all clients using the same API key (30 calls/min on the Basic plan)."""
+        return get_shared(('CoinMarketCapAPI', self.api_key), lambda: FixedWindowCounter(30, 60))
+
     def get_fear_and_greed_latest(self):
-        response = requests.get(url=f"{self.base_api}/fear-and-greed/latest", headers=self.headers)
+        self.rate_limiter.acquire()
+        response = self.session.get(url=f"{self.base_api}/fear-and-greed/latest", headers=self.headers, timeout=self.timeout)
         result = response.json()
         self.handle_response_errors(result)
         return result
@@ -40,7 +63,8 @@ class CoinMarketCapAPI():
         if start != -1:
             params["start"] = start
 
-        response = requests.get(url=f"{self.base_api}/fear-and-greed/historical", params=params, headers=self.headers)
+        self.rate_limiter.acquire()
+        response = self.session.get(url=f"{self.base_api}/fear-and-greed/historical", params=params, headers=self.headers, timeout=self.timeout)
         result = response.json()
         self.handle_response_errors(result)
         return result
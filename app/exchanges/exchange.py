@@ -7,15 +7,119 @@ import base64
 import time
 import json
 import inspect
-from constants import CLASS_NAMES
+import threading
+from constants import CLASS_NAMES, DEFAULT_POOL_SIZE, DEFAULT_REQUEST_TIMEOUT_IN_SEC, DEFAULT_HEDGE_PERCENTILE
 import datetime
+import email.utils
 from typing import Any, Dict, Optional
 from cryptography.hazmat.primitives.asymmetric import ed25519
 import robin_stocks.robinhood as rh
+from app.exchanges.session import create_session
+from app.exchanges.ratelimiter import RateLimiter, KrakenRateLimiter, TokenBucket
+from app.shared import get_shared
+from app.exchanges.retry import CircuitBreaker, RetryExecutor
+from app.exchanges.hedging import HedgedRequester
+from app.exchanges.pairregistry import PairRegistry
+from app.exchanges.clocksync import ClockSync
+from app.exchanges.nonce import NonceCounter
+from app.marketdata.candles import CandleBatch
+from app.helpers.json_util import loads
 
 class Exchange():
+    # Guards the lazy creation of the per-instance session
+    _session_lock = threading.Lock()
+
     def __init__(self):
         self.classname = self.__class__.__name__
+        self.pool_size = DEFAULT_POOL_SIZE
+        self.timeout = DEFAULT_REQUEST_TIMEOUT_IN_SEC
+        self.hedge_public_requests = False
+        self.hedge_percentile = DEFAULT_HEDGE_PERCENTILE
+    
+    @property
+    def session(self):
+        """Keep-alive connection pool shared by every request (and thread) of this exchange. Created on first use so reloaded exchanges get one as well."""
+        if getattr(self, '_session', None) is None:
+            with self._session_lock:
+                if getattr(self, '_session', None) is None:
+                    self._session = create_session(getattr(self, 'pool_size', DEFAULT_POOL_SIZE))
+        
+        return self._session
+    
+    @property
+    def rate_limiter(self):
+        """Client-side rate-limit governor every request of this exchange goes through. Shared by all clients using the same API key."""
+        if getattr(self, '_rate_limiter', None) is None:
+            self._rate_limiter = self.create_rate_limiter()
+        
+        return self._rate_limiter
+    
+    def create_rate_limiter(self):
+        """Override to model the exchange's rate limits. Unlimited by default."""
+        return RateLimiter()
+    
+    @property
+    def hedger(self) -> HedgedRequester:
+        """Sends a backup for public requests slower than their latency percentile, within the 'public' rate-limit budget."""
+        if getattr(self, '_hedger', None) is None:
+            with self._session_lock:
+                if getattr(self, '_hedger', None) is None:
+                    self._hedger = HedgedRequester(self.rate_limiter, 'public', getattr(self, 'hedge_percentile', DEFAULT_HEDGE_PERCENTILE), max(2, getattr(self, 'pool_size', DEFAULT_POOL_SIZE)))
+        
+        return self._hedger
+    
+    def send_public_request(self, uri_path, send):
+        """Sends an idempotent public request with send(). Hedged by uri_path if hedge_public_requests is on."""
+        if getattr(self, 'hedge_public_requests', False):
+            return self.hedger.call(uri_path, send)
+        
+        return send()
+    
+    def circuit_breaker(self, endpoint: str = 'private') -> CircuitBreaker:
+        """
+        Circuit breaker for a class of endpoints ('public', 'private' or 'trading'), shared by every client of the exchange.
+        Private and trading circuits are per API key, so one account's failures do not stop the others.
+        """
+        account = getattr(self, 'api_key', '') if endpoint != 'public' else ''
+        return get_shared((self.classname, getattr(self, 'api_base_url', ''), account, 'circuit', endpoint), CircuitBreaker)
+    
+    def retry_executor(self, endpoint: str = 'private', max_attempts: int = 5, base_delay_in_sec: float = 1) -> RetryExecutor:
+        """Retries calls to a class of endpoints with jittered exponential backoff, failing fast while its circuit is open."""
+        return RetryExecutor(self.circuit_breaker(endpoint), max_attempts, base_delay_in_sec)
+    
+    @property
+    def clock(self):
+        """Estimate of the exchange's clock, shared by every client of the exchange. Kept in sync in the background once started."""
+        if getattr(self, '_clock', None) is None:
+            self._clock = get_shared((self.classname, getattr(self, 'api_base_url', ''), 'clock'), lambda: ClockSync(self.fetch_server_time))
+        
+        return self._clock
+    
+    def fetch_server_time(self):
+        """Returns the exchange's UNIX time in seconds, used to sync the clock. None if the exchange has no time source."""
+        return None
+    
+    @property
+    def pair_registry(self):
+        """Asset pair metadata and fee schedules, loaded once and cached on disk. Shared by every bot using this exchange."""
+        if getattr(self, '_pair_registry', None) is None:
+            self._pair_registry = PairRegistry(self)
+        
+        return self._pair_registry
+    
+    def warm_up(self):
+        """Opens a pooled connection ahead of the first real request. No-op by default."""
+        pass
+    
+    def close(self):
+        """Closes the pooled connections."""
+        if getattr(self, '_hedger', None) is not None:
+            self._hedger.close()
+            self._hedger = None
+        
+        if getattr(self, '_session', None) is not None:
+            self._session.close()
+            self._session = None
     
     def get_exchange_time(self):
         raise NotImplementedError("Not Implemented.")
@@ -34,6 +138,10 @@ class Exchange():
 
     def get_ohlc_data(self, pair, interval, since):
         raise NotImplementedError("Not Implemented.")
+
+    def get_ohlc_batch(self, pair, interval=1, since=0) -> CandleBatch:
+        """Returns get_ohlc_data (Kraken response format) as a columnar CandleBatch."""
+        return CandleBatch.from_kraken_response(self.get_ohlc_data(pair, interval=interval, since=since))
     
     def get_order_book(self, pair, count):
         raise NotImplementedError("Not Implemented.")
@@ -41,22 +149,37 @@ class Exchange():
     def get_recent_trades(self, pair, since, count):
         raise NotImplementedError("Not Implemented.")
     
+    def get_quote(self, pair):
+        """Returns the top of the book of pair as {'bid', 'bid_volume', 'ask', 'ask_volume'}."""
+        raise NotImplementedError("Not Implemented.")
+    
+    def get_fee_rate(self, pair, maker=False):
+        """Returns the account's maker or taker fee on pair as a fraction of the notional (e.g. 0.0026)."""
+        raise NotImplementedError("Not Implemented.")
+    
     def get_recent_spreads(self, pair, since):
         raise NotImplementedError("Not Implemented.")
     
     def add_order(self):
         raise NotImplementedError("Not Implemented.")
     
-    def add_order_batch(self):
+    def add_order_batch(self, orders, pair):
         raise NotImplementedError("Not Implemented.")
     
+    def to_batch_order(self, **order):
+        raise NotImplementedError("Not Implemented.")
+    
+    def supports_order(self, ordertype, **order) -> bool:
+        """Returns True if add_order can place the order (add_order arguments without pair) as given. Assumed for exchanges implementing add_order."""
+        return type(self).add_order is not Exchange.add_order
+    
     def edit_order(self):
         raise NotImplementedError("Not Implemented.")
     
     def cancel_order(self):
         raise NotImplementedError("Not Implemented.")
     
-    def cancel_order_batch(self):
+    def cancel_order_batch(self, orders):
         raise NotImplementedError("Not Implemented.")
     
     def get_account_balance(self):
@@ -134,6 +257,11 @@ class KrakenExchange(Exchange):
         self.api_key = exchange_config.api_key
         self.api_sec = exchange_config.api_sec
         self.mode = exchange_config.mode.lower()
+        self.pool_size = exchange_config.pool_size
+        self.timeout = exchange_config.request_timeout_in_sec
+        self.api_tier = exchange_config.api_tier
+        self.hedge_public_requests = exchange_config.hedge_public_requests
+        self.hedge_percentile = exchange_config.hedge_percentile
         self.api_base_url = 'https://api.kraken.com/0'
     
     def __repr__(self):
@@ -154,6 +282,8 @@ class KrakenExchange(Exchange):
         try:
             if len(response['error']) > 0:
                 for error_message in response['error']:
+                    # Rate-limit errors pause the client-side limiter before the error is raised
+                    self.rate_limiter.on_error(error_message)
                     assert error_message[0] != 'E'
 
                     # Warning message
@@ -164,10 +294,33 @@ class KrakenExchange(Exchange):
             print(f"response: {response}")
             raise e
     
+    def create_rate_limiter(self):
+        return get_shared(('KrakenExchange', self.api_key), lambda: KrakenRateLimiter(getattr(self, 'api_tier', 'starter'), getattr(self, 'rate_limit_share', 1.0)))
+    
+    @property
+    def nonce_counter(self) -> NonceCounter:
+        """Nonces of the API key, shared by every client using it."""
+        if getattr(self, '_nonce_counter', None) is None:
+            self._nonce_counter = get_shared(('KrakenExchange', self.api_key, 'nonce'), NonceCounter)
+        
+        return self._nonce_counter
+    
+    def warm_up(self):
+        """Establishes a pooled connection to Kraken so the first trading request does not pay the TCP+TLS handshake, and starts the clock sync."""
+        self.session.get(self.api_base_url + '/public/Time', timeout=self.timeout)
+
+        # The clock is shared by every client of this URL, so only the first call starts sampling
+        self.clock.start()
+    
+    def fetch_server_time(self):
+        # unixtime is truncated to whole seconds, so the server's clock is on average half a second ahead of it
+        return self.get_exchange_time()['result']['unixtime'] + 0.5
+    
     # Public requests
     def public_request(self, uri_path, query_parameters=None):
+        self.rate_limiter.acquire('public')
         url = self.api_base_url + uri_path
-        response = requests.get(url, params=query_parameters)
+        response = self.send_public_request(uri_path, lambda: self.session.get(url, params=query_parameters, timeout=self.timeout))
         return response
     
     def get_exchange_time(self):
@@ -238,6 +391,16 @@ class KrakenExchange(Exchange):
         self.handle_response_errors(result)
         return result
     
+    def get_quote(self, pair):
+        ticker = next(iter(self.get_ticker_info(pair)['result'].values()))
+        
+        # a and b are [price, whole lot volume, lot volume]
+        return {'bid': float(ticker['b'][0]), 'bid_volume': float(ticker['b'][2]), 'ask': float(ticker['a'][0]), 'ask_volume': float(ticker['a'][2])}
+    
+    def get_fee_rate(self, pair, maker=False):
+        # The registry holds fees in percent
+        return self.pair_registry.get_fees(pair)['maker' if maker else 'taker'] / 100
+    
     def get_ohlc_data(self, pair, interval=1, since=0):
         """Get the latest quote of a cryptocurrency. Note: the last entry in the OHLC array is for the current, not-yet-committed frame and will always be present, regardless of the value of since."""
         # https://docs.kraken.com/rest/#tag/Market-Data/operation/getOHLCData
@@ -253,7 +416,8 @@ class KrakenExchange(Exchange):
         
         response = self.public_request('/public/OHLC', query_parameters)
         
-        result = response.json()
+        # Up to 720 rows of string-encoded numbers: decode with the fast parser
+        result = loads(response.content)
         self.handle_response_errors(result)
         return result
     
@@ -288,7 +452,8 @@ class KrakenExchange(Exchange):
         
         response = self.public_request('/public/Trades', query_parameters)
 
-        result = response.json()
+        # Up to 1000 trades: decode with the fast parser
+        result = loads(response.content)
         self.handle_response_errors(result)
         return result
     
@@ -309,26 +474,47 @@ class KrakenExchange(Exchange):
         return result
     
     # Authenticated requests
-    def authenticated_request(self, uri_path: str, data={}):
-        """This method sends an authenticated request to the Kraken API."""
+    def authenticated_request(self, uri_path: str, data={}, json_body: bool = False):
+        """This method sends an authenticated request to the Kraken API. Batch endpoints take a JSON body (json_body=True) instead of form data."""
+        # Copy so concurrent calls never share (and overwrite the nonce of) the same payload dict
+        data = dict(data)
+
+        # Wait for rate-limit budget before taking a nonce so nonces stay in sending order
+        txids = data.get('orders') if uri_path == '/private/CancelOrderBatch' else [data.get('txid')]
+        self.rate_limiter.acquire_private(
+            uri_path.split('/')[-1],
+            pair=data.get('pair'),
+            txids=txids,
+            order_count=len(data.get('orders', []))
+        )
+
         data['nonce'] = self.get_nonce()
         
         headers = {}
         
         headers['API-Key'] = self.api_key
-        headers['API-Sign'] = self.get_signature('/0'+uri_path, data)
 
-        req = requests.post(
+        if json_body:
+            body = json.dumps(data)
+            headers['Content-Type'] = 'application/json'
+            headers['API-Sign'] = self.get_signature('/0'+uri_path, data, body)
+        else:
+            body = data
+            headers['API-Sign'] = self.get_signature('/0'+uri_path, data)
+
+        req = self.session.post(
             url=(self.api_base_url + uri_path),
             headers=headers,
-            data=data
+            data=body,
+            timeout=self.timeout
         )
 
         return req
     
-    def get_signature(self, urlpath: str, data) -> str:
+    def get_signature(self, urlpath: str, data, postdata: str = None) -> str:
 
-        postdata = urllib.parse.urlencode(data)
+        if postdata is None:
+            postdata = urllib.parse.urlencode(data)
         encoded = (str(data['nonce']) + postdata).encode()
         message = urlpath.encode() + hashlib.sha256(encoded).digest()
 
@@ -337,8 +523,12 @@ class KrakenExchange(Exchange):
         return sigdigest.decode()
     
     def get_nonce(self) -> str:
-        """Returns nonce value as a string from a UNIX timestamp in milliseconds."""
-        return str(int(1000*time.time()))
+        """
+        Returns nonce value as a string from a UNIX timestamp in milliseconds. Nonces are strictly increasing, even when requested from several threads or clients of the API key within the same millisecond.
+
+        The timestamp is the later of the local and the synced server clock, so a lagging local clock cannot produce nonces below those already used.
+        """
+        return str(self.nonce_counter.next(max(int(1000*time.time()), self.clock.now_ms())))
     
     def add_order(self, ordertype, type, volume, pair, userref=0, price='', price2='', trigger='', oflags='', timeinforce='GTC', starttm='', expiretm='', deadline='', validate='false', closeordertype='', closeprice='', closeprice2=''):
         """Add an order."""
@@ -394,6 +584,7 @@ class KrakenExchange(Exchange):
 
         result = response.json()
         self.handle_response_errors(result)
+        self.rate_limiter.record_orders(result['result'].get('txid', []), pair)
         return result
     
     def add_order_batch(self, orders, pair, deadline='', validate='false'):
@@ -405,18 +596,62 @@ class KrakenExchange(Exchange):
         payload = {
             "orders": orders,
             "pair": pair,
-            "validate": validate
+            "validate": validate in [True, 'true']
         }
 
         if deadline != '':
             payload["deadline"] = deadline
         
-        response = self.authenticated_request('/private/AddOrderBatch', payload)
+        response = self.authenticated_request('/private/AddOrderBatch', payload, json_body=True)
 
         result = response.json()
         self.handle_response_errors(result)
+        self.rate_limiter.record_orders([order['txid'] for order in result['result'].get('orders', []) if 'txid' in order], pair)
         return result
     
+    def to_batch_order(self, ordertype, type, volume, userref=0, price='', price2='', trigger='', oflags='', timeinforce='GTC', starttm='', expiretm='', closeordertype='', closeprice='', closeprice2=''):
+        """Converts add_order arguments (without pair) into an order of an add_order_batch request."""
+        order = {
+            "ordertype": ordertype,
+            "type": type,
+            "volume": str(volume)
+        }
+
+        if userref != 0:
+            order["userref"] = userref
+        
+        if price != '':
+            order["price"] = str(price)
+        
+        if price2 != '':
+            order["price2"] = str(price2)
+        
+        if trigger != '':
+            order["trigger"] = trigger
+        
+        if oflags != '':
+            order["oflags"] = oflags
+        
+        if timeinforce != 'GTC':
+            order["timeinforce"] = timeinforce
+        
+        if starttm != '':
+            order["starttm"] = starttm
+        
+        if expiretm != '':
+            order["expiretm"] = expiretm
+        
+        if closeordertype != '':
+            order["close"] = {"ordertype": closeordertype}
+
+            if closeprice != '':
+                order["close"]["price"] = str(closeprice)
+            
+            if closeprice2 != '':
+                order["close"]["price2"] = str(closeprice2)
+        
+        return order
+    
     def edit_order(self, txid, pair, userref=0, volume='', price='', price2='', oflags='', deadline='', validate='false'):
         """Edit an open order by its txid."""
         # https://docs.kraken.com/rest/#tag/Trading/operation/editOrder
@@ -451,6 +686,11 @@ class KrakenExchange(Exchange):
 
         result = response.json()
         self.handle_response_errors(result)
+
+        # Editing replaces the order with a new txid
+        if result['result'].get('txid'):
+            self.rate_limiter.record_orders([result['result']['txid']], pair)
+        
         return result
     
     def cancel_order(self, txid):
@@ -478,7 +718,7 @@ class KrakenExchange(Exchange):
             "orders": orders
         }
 
-        response = self.authenticated_request('/private/CancelOrderBatch', payload)
+        response = self.authenticated_request('/private/CancelOrderBatch', payload, json_body=True)
 
         result = response.json()
         self.handle_response_errors(result)
@@ -666,6 +906,8 @@ class BinanceExchange(Exchange):
         self.api_key = exchange_config.api_key
         self.api_sec = exchange_config.api_sec
         self.mode = exchange_config.mode.lower()
+        self.pool_size = exchange_config.pool_size
+        self.timeout = exchange_config.request_timeout_in_sec
         # TODO: Implement
         self.api_base_url = ''
 
@@ -684,6 +926,8 @@ class BinanceUSExchange(Exchange):
         self.api_key = exchange_config.api_key
         self.api_sec = exchange_config.api_sec
         self.mode = exchange_config.mode.lower()
+        self.pool_size = exchange_config.pool_size
+        self.timeout = exchange_config.request_timeout_in_sec
         # TODO: Implement
         self.api_base_url = ''
 
@@ -696,7 +940,15 @@ class CoinbaseExchange(Exchange):
         self.api_passphrase = api_passphrase
         self.api_base_url = 'https://api.exchange.coinbase.com'
     
+    def create_rate_limiter(self):
+        # https://docs.cdp.coinbase.com/exchange/docs/rest-rate-limits
+        return get_shared(('CoinbaseExchange', self.api_key), lambda: RateLimiter({
+            'public': get_shared(('CoinbaseExchange', 'public'), lambda: TokenBucket(10, 10)),
+            'private': TokenBucket(15, 15),
+        }))
+    
     def public_request(self, uri_path, query_parameters={}):
+        self.rate_limiter.acquire('public')
         url = self.api_base_url + uri_path
 
         if query_parameters != {}:
@@ -709,11 +961,14 @@ class CoinbaseExchange(Exchange):
                 
                 url += f"{key}={query_parameters[key]}"
         
-        response = requests.get(url)
+        response = self.send_public_request(uri_path, lambda: self.session.get(url, timeout=self.timeout))
         return response
     
     def authenticated_request(self, method, uri_path, data={}):
-        timestamp = self.get_exchange_time()['epoch']
+        # Only the first signed request waits for a server time sample
+        self.clock.start()
+        self.rate_limiter.acquire('private')
+        timestamp = f"{self.clock.now():.3f}"
 
         headers = {
             "CB-ACCESS-KEY": self.api_key,
@@ -728,27 +983,31 @@ class CoinbaseExchange(Exchange):
         }
 
         if method == "GET":
-            response = requests.get(
+            response = self.session.get(
                 url=f"{self.api_base_url}{uri_path}",
                 headers=headers,
+                timeout=self.timeout,
                 params=data
             )
         elif method == "POST":
-            response = requests.post(
+            response = self.session.post(
                 url=f"{self.api_base_url}{uri_path}",
                 headers=headers,
+                timeout=self.timeout,
                 data=data
             )
         elif method == "PUT":
-            response = requests.put(
+            response = self.session.put(
                 url=f"{self.api_base_url}{uri_path}",
                 headers=headers,
+                timeout=self.timeout,
                 data=data
             )
         elif method == "DELETE":
-            response = requests.delete(
+            response = self.session.delete(
                 url=f"{self.api_base_url}{uri_path}",
                 headers=headers,
+                timeout=self.timeout,
                 data=data
             )
         else:
@@ -756,6 +1015,14 @@ class CoinbaseExchange(Exchange):
         
         return response
 
+    def warm_up(self):
+        """Establishes a pooled connection to Coinbase ahead of the first real request, and starts the clock sync."""
+        self.session.get(f"{self.api_base_url}/time", timeout=self.timeout)
+        self.clock.start()
+    
+    def fetch_server_time(self):
+        return float(self.get_exchange_time()['epoch'])
+    
     def get_signature(self, timestamp, method, path, body=''):
         prehash_str = f"{timestamp}{method}{path}{body}"
         encoded_str = prehash_str.encode('utf-8')
@@ -806,11 +1073,67 @@ class CoinbaseExchange(Exchange):
         
         return response.json()
     
+    def get_product_book(self, product_id, level=1):
+        """Gets the order book of a product (level 1: best bid and ask)."""
+        # https://docs.cloud.coinbase.com/exchange/reference/exchangerestapi_getproductbook
+        response = self.public_request(f"/products/{product_id}/book", {"level": level})
+        return response.json()
+    
+    def get_quote(self, pair):
+        book = self.get_product_book(pair)
+        
+        # Levels are [price, size, num-orders]
+        return {'bid': float(book['bids'][0][0]), 'bid_volume': float(book['bids'][0][1]), 'ask': float(book['asks'][0][0]), 'ask_volume': float(book['asks'][0][1])}
+    
     def get_fees(self):
         """Gets fee rates and 30 days trailing volume."""
         response = self.authenticated_request('GET', '/fees')
         return response.json()
     
+    def get_fee_rate(self, pair, maker=False):
+        # Fees apply to every product alike, so one request serves all pairs
+        if getattr(self, '_fees', None) is None:
+            self._fees = self.get_fees()
+        
+        return float(self._fees['maker_fee_rate' if maker else 'taker_fee_rate'])
+    
+    def get_unsupported_order_args(self, ordertype, **order) -> list:
+        """Returns the KrakenExchange.add_order arguments of an order that Coinbase orders have no equivalent for (conditional closes, triggers, ...)."""
+        unsupported = [key for key, value in order.items() if key not in ['type', 'volume', 'price', 'oflags', 'timeinforce'] and value not in ['', None, 0]]
+        
+        if ordertype not in ['limit', 'market']:
+            unsupported.insert(0, 'ordertype')
+        
+        return unsupported
+    
+    def supports_order(self, ordertype, **order) -> bool:
+        return len(self.get_unsupported_order_args(ordertype, **order)) == 0
+    
+    def add_order(self, ordertype, type, volume, pair, price='', oflags='', timeinforce='GTC', **kwargs):
+        """
+        Places a limit or market order through create_order, taking and returning the same shape as KrakenExchange.add_order.
+        Raises NotImplementedError for arguments without a Coinbase equivalent rather than placing the order without them.
+        """
+        unsupported = self.get_unsupported_order_args(ordertype, **kwargs)
+        
+        if len(unsupported) > 0:
+            raise NotImplementedError(f"{self.classname} does not support {ordertype} orders with {unsupported}.")
+        
+        response = self.create_order(
+            type=ordertype,
+            side=type,
+            product_id=pair,
+            price=price if ordertype == 'limit' else '',
+            size=volume,
+            time_in_force=timeinforce if ordertype == 'limit' else '',
+            post_only='post' in oflags,
+        )
+        
+        if 'id' not in response:
+            raise Exception(f"Coinbase rejected the order: {response.get('message', response)}")
+        
+        return {'error': [], 'result': {'descr': {'order': f"{type} {volume} {pair} @ {ordertype} {price}"}, 'txid': [response['id']]}}
+    
     def create_order(self, type, side, product_id, profile_id='', stp='dc', stop='', stop_price='', price='', size='', funds='', time_in_force='GTC', cancel_after='', post_only=False, client_oid=''):
         """Creates an order."""
         payload = {
@@ -888,15 +1211,27 @@ class RobinhoodCryptoExchange(Exchange):
         self.api_key = exchange_config.api_key
         self.api_sec = exchange_config.api_sec
         self.mode = exchange_config.mode.lower()
+        self.pool_size = exchange_config.pool_size
+        self.timeout = exchange_config.request_timeout_in_sec
 
         private_bytes = base64.b64decode(exchange_config.api_sec)
         # Note that the cryptography library used here only accepts a 32 byte ed25519 private key
         self.private_key = ed25519.Ed25519PrivateKey.from_private_bytes(private_bytes[:32])
         self.api_base_url = "https://trading.robinhood.com"
     
-    @staticmethod
-    def _get_current_timestamp() -> int:
-        return int(datetime.datetime.now(tz=datetime.timezone.utc).timestamp())
+    def warm_up(self):
+        """Establishes a pooled connection to Robinhood ahead of the first real request, and starts the clock sync."""
+        self.session.head(self.api_base_url, timeout=self.timeout)
+        self.clock.start()
+
+    def fetch_server_time(self):
+        # Robinhood has no time endpoint, use the Date header (whole seconds, hence the half second)
+        response = self.session.head(self.api_base_url, timeout=self.timeout)
+        return email.utils.parsedate_to_datetime(response.headers['Date']).timestamp() + 0.5
+
+    def _get_current_timestamp(self) -> int:
+        self.clock.start()
+        return int(self.clock.now())
 
     @staticmethod
     def get_query_params(key: str, *args: Optional[str]) -> str:
@@ -909,7 +1244,12 @@ class RobinhoodCryptoExchange(Exchange):
 
         return "?" + "&".join(params)
 
+    def create_rate_limiter(self):
+        # 100 requests per minute with bursts of up to 300
+        return get_shared(('RobinhoodCryptoExchange', self.api_key), lambda: RateLimiter({'private': TokenBucket(300, 100 / 60)}))
+
     def make_api_request(self, method: str, path: str, body: str = "") -> Any:
+        self.rate_limiter.acquire('private')
         timestamp = self._get_current_timestamp()
         headers = self.get_authorization_header(method, path, body, timestamp)
         url = self.api_base_url + path
@@ -917,9 +1257,9 @@ class RobinhoodCryptoExchange(Exchange):
         try:
             response = {}
             if method == "GET":
-                response = requests.get(url, headers=headers, timeout=10)
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
             elif method == "POST":
-                response = requests.post(url, headers=headers, json=json.loads(body), timeout=10)
+                response = self.session.post(url, headers=headers, json=json.loads(body), timeout=self.timeout)
             return response.json()
         except requests.RequestException as e:
             print(f"Error making API request: {e}")
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from constants import DEFAULT_POOL_SIZE
+
+class LatencyTracker():
+    """
+    Thread-safe record of the latencies of the last window_size requests to one endpoint.
+
+    deadline() is the given percentile of those latencies, i.e. how long a request may take
+    before it is slower than usual. Until min_samples latencies are known it is initial_deadline_in_sec.
+    """
+    def __init__(self, percentile: float = 95, window_size: int = 200, min_samples: int = 20, initial_deadline_in_sec: float = 1.0):
+        assert 0 < percentile < 100
+        assert 1 <= min_samples <= window_size
+        assert initial_deadline_in_sec > 0
+
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_deadline_in_sec = initial_deadline_in_sec
+        self.latencies = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{{LatencyTracker percentile: {self.percentile}, samples: {len(self.latencies)}, deadline: {round(self.deadline(), 4)}}}"
+
+    def record(self, latency_in_sec: float):
+        with self._lock:
+            self.latencies.append(latency_in_sec)
+
+    def deadline(self) -> float:
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return self.initial_deadline_in_sec
+
+            latencies = sorted(self.latencies)
+
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return latencies[index]
+
+class HedgedRequester():
+    """
+    Sends idempotent requests with a backup request for the slow ones.
+
+    A request that has not answered within the percentile deadline of its endpoint is sent a
+    second time, and whichever answers first is returned; the other one is left to finish in the
+    background and its answer is dropped. The backup request only goes out if the rate limiter
+    has a token for it right now, so hedging never delays other requests or exceeds the limit.
+    Only use it for requests that are safe to send twice, such as public market data GETs.
+    """
+    def __init__(self, rate_limiter, bucket: str = 'public', percentile: float = 95, max_workers: int = DEFAULT_POOL_SIZE):
+        assert max_workers >= 2
+
+        self.rate_limiter = rate_limiter
+        self.bucket = bucket
+        self.percentile = percentile
+        self.trackers = {}
+        self.hedged_count = 0
+        self.skipped_count = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='HedgedRequester')
+
+    def __repr__(self):
+        return f"{{HedgedRequester bucket: {self.bucket}, percentile: {self.percentile}, hedged: {self.hedged_count}, skipped: {self.skipped_count}}}"
+
+    def get_tracker(self, key) -> LatencyTracker:
+        with self._lock:
+            if key not in self.trackers:
+                self.trackers[key] = LatencyTracker(self.percentile)
+
+            return self.trackers[key]
+
+    def _timed(self, tracker: LatencyTracker, send):
+        start = time.monotonic()
+        response = send()
+        # Every answer counts, including the ones that lose the race, so the deadline follows the endpoint's real latency
+        tracker.record(time.monotonic() - start)
+        return response
+
+    def call(self, key, send):
+        """Returns send(), hedged with a second send() if the first has not answered within the deadline for key (e.g. the URI path)."""
+        tracker = self.get_tracker(key)
+        primary = self._executor.submit(self._timed, tracker, send)
+        done, _ = wait([primary], timeout=tracker.deadline())
+
+        if primary in done:
+            return primary.result()
+
+        pending = {primary}
+
+        if self.rate_limiter.try_acquire(self.bucket):
+            self.hedged_count += 1
+            pending.add(self._executor.submit(self._timed, tracker, send))
+        else:
+            self.skipped_count += 1
+
+        # The first successful answer wins. If both fail, the last error is raised.
+        error = None
+        while len(pending) > 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+
+                error = future.exception()
+
+        raise error
+
+    def close(self):
+        self._executor.shutdown(wait=False)
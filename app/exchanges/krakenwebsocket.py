@@ -0,0 +1,488 @@
+import itertools
+import json
+import threading
+import time
+from websockets.sync.client import connect
+from websockets.exceptions import ConnectionClosed
+from app.exchanges.exchange import Exchange
+from app.strategies.ohlc import OHLC
+from app.marketdata.orderbook import OrderBook
+
+class KrakenWebSocket():
+    """
+    Background connection to Kraken's WebSockets API (v1) with automatic reconnects.
+
+    The connection runs on a daemon thread. Subclasses send their subscriptions in on_open, which
+    runs after every (re)connect, and handle decoded messages in on_message. A connection that
+    stays silent for longer than heartbeat_timeout_in_sec (Kraken sends a heartbeat every second)
+    is treated as dead and re-established with exponential backoff.
+    """
+    def __init__(self, url: str, heartbeat_timeout_in_sec: float = 10, reconnect_delay_in_sec: float = 1, max_reconnect_delay_in_sec: float = 30):
+        self.classname = self.__class__.__name__
+        self.url = url
+        self.heartbeat_timeout_in_sec = heartbeat_timeout_in_sec
+        self.reconnect_delay_in_sec = reconnect_delay_in_sec
+        self.max_reconnect_delay_in_sec = max_reconnect_delay_in_sec
+        self.reconnect_count = 0
+        self.last_message_time = 0
+
+        # pair -> wsname (e.g. 'XBTUSD' -> 'XBT/USD')
+        self.wsnames = {}
+
+        self._ws = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._connected = threading.Event()
+        self._send_lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{{{self.classname} url: {self.url}, connected: {self.is_connected()}, reconnect_count: {self.reconnect_count}}}"
+
+    def start(self):
+        """Starts the connection thread. Returns immediately."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=self.classname, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Closes the connection and stops reconnecting."""
+        self._stopped.set()
+
+        if self._ws is not None:
+            self._ws.close()
+
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def wait_until_connected(self, timeout: float = None) -> bool:
+        return self._connected.wait(timeout)
+
+    def is_connected(self) -> bool:
+        return self._connected.is_set()
+
+    def send(self, message: dict) -> bool:
+        """Sends a message over the open connection (also while on_open runs). Returns False if there is none."""
+        ws = self._ws
+
+        if ws is None:
+            return False
+
+        try:
+            with self._send_lock:
+                ws.send(json.dumps(message))
+            return True
+        except ConnectionClosed:
+            return False
+
+    def resolve_wsname(self, exchange: Exchange, pair: str) -> str:
+        """Returns the WebSocket name of pair (e.g. 'XBTUSD' -> 'XBT/USD') from the exchange's pair registry."""
+        wsname = self.wsnames.get(pair)
+
+        if wsname is None:
+            wsname = exchange.pair_registry.get(pair).wsname
+            self.wsnames[pair] = wsname
+
+        return wsname
+
+    def on_open(self):
+        """Called after every successful (re)connect."""
+        pass
+
+    def on_message(self, message):
+        """Called with every decoded message."""
+        raise NotImplementedError
+
+    def _run(self):
+        delay = self.reconnect_delay_in_sec
+
+        while not self._stopped.is_set():
+            try:
+                with connect(self.url, open_timeout=self.heartbeat_timeout_in_sec) as ws:
+                    self._ws = ws
+
+                    # Only connected once on_open has subscribed (and the order socket has its token)
+                    self.on_open()
+                    self._connected.set()
+                    delay = self.reconnect_delay_in_sec
+
+                    while not self._stopped.is_set():
+                        raw_message = ws.recv(timeout=self.heartbeat_timeout_in_sec)
+                        self.last_message_time = time.time()
+                        self._dispatch(raw_message)
+            except (OSError, TimeoutError, ConnectionClosed) as e:
+                if not self._stopped.is_set():
+                    print(f"{self.classname}: connection to {self.url} lost ({e}). Reconnecting in {delay}s...")
+            except Exception as e:
+                # on_open failed: start over on a fresh connection rather than letting the thread die
+                if not self._stopped.is_set():
+                    print(f"{self.classname}: setting up the connection to {self.url} failed ({e.__class__.__name__}: {e}). Reconnecting in {delay}s...")
+            finally:
+                self._connected.clear()
+                self._ws = None
+
+            if self._stopped.wait(delay):
+                break
+
+            self.reconnect_count += 1
+            delay = min(delay * 2, self.max_reconnect_delay_in_sec)
+
+    def _dispatch(self, raw_message):
+        # A malformed or unexpected message is logged and skipped, it must not take the connection down
+        try:
+            self.on_message(json.loads(raw_message))
+        except Exception as e:
+            print(f"{self.classname}: could not handle message {raw_message[:200]!r} ({e.__class__.__name__}: {e})")
+
+class KrakenMarketDataFeed(KrakenWebSocket):
+    """
+    Keeps the latest OHLC candle and ticker of each subscribed pair in memory from Kraken's public
+    ohlc and ticker channels, so callers stop polling /public/OHLC for the last row.
+
+    After every reconnect the latest candle of each pair is backfilled over REST, so the state is
+    never older than the outage. Readers get None when the feed has no fresh data, in which case
+    they should fall back to REST.
+
+    Pairs subscribed with subscribe_book also get a local OrderBook of book_depth levels, seeded
+    from /public/Depth and updated from the book channel. A book that fails Kraken's checksum is
+    seeded again and resubscribed.
+
+    Listeners registered with add_listener(callback) are called as callback(channel, pair, data)
+    for every 'ohlc' (data is an OHLC) and 'ticker' (data is a dict) update.
+    """
+    def __init__(self, exchange: Exchange, interval: int = 1, url: str = 'wss://ws.kraken.com', max_age_in_sec: float = 10, book_depth: int = 10, **kwargs):
+        super().__init__(url, **kwargs)
+        self.exchange = exchange
+        self.interval = interval
+        self.max_age_in_sec = max_age_in_sec
+        self.book_depth = book_depth
+        self.checksum_failures = 0
+        self._books = {}
+
+        self._pairs_by_wsname = {}
+        self._candles = {}
+        self._tickers = {}
+        self._update_times = {}
+        self._listeners = []
+        self._state_lock = threading.Lock()
+
+    def subscribe(self, pair: str, wsname: str = None):
+        """Subscribes to the ohlc and ticker channels of pair. wsname is looked up over REST if not provided."""
+        if wsname is None:
+            wsname = self.resolve_wsname(self.exchange, pair)
+
+        with self._state_lock:
+            self.wsnames[pair] = wsname
+            self._pairs_by_wsname[wsname] = pair
+
+        self._send_subscriptions([wsname])
+
+    def subscribe_book(self, pair: str, wsname: str = None):
+        """Keeps a local order book of pair. Also subscribes to its ohlc and ticker channels."""
+        if pair not in self.wsnames:
+            self.subscribe(pair, wsname)
+
+        price_decimals = self.exchange.pair_registry.get(pair).pair_decimals
+        book = OrderBook(pair, self.book_depth, price_decimals=price_decimals)
+
+        with self._state_lock:
+            self._books[pair] = book
+
+        self._seed_book(pair)
+        self._send_book_subscriptions([self.wsnames[pair]])
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def is_live(self, pair: str) -> bool:
+        """True if the feed is connected and has received an update for pair within max_age_in_sec."""
+        return self.is_connected() and time.time() - self._update_times.get(pair, 0) <= self.max_age_in_sec
+
+    def get_latest_ohlc(self, pair: str):
+        """Returns the latest (possibly not yet closed) candle of pair, or None if the feed has no fresh data for it."""
+        if not self.is_live(pair):
+            return None
+
+        return self._candles.get(pair)
+
+    def get_latest_ticker(self, pair: str):
+        """Returns {'bid', 'ask', 'last'} of pair, or None if the feed has no fresh data for it."""
+        if not self.is_live(pair):
+            return None
+
+        return self._tickers.get(pair)
+
+    def get_order_book(self, pair: str):
+        """Returns a copy of the local order book of pair, or None if it is not live or failed its checksum."""
+        book = self._books.get(pair)
+
+        if book is None or not self.is_connected() or time.time() - self._update_times.get(pair, 0) > self.max_age_in_sec:
+            return None
+
+        with self._state_lock:
+            if not book.is_valid:
+                return None
+
+            return book.copy()
+
+    def on_open(self):
+        self._send_subscriptions(list(self._pairs_by_wsname.keys()))
+        self._send_book_subscriptions([self.wsnames[pair] for pair in self._books.keys()])
+        self.backfill()
+
+    def backfill(self):
+        """Fetches the latest candle of every subscribed pair over REST to cover any gap while disconnected."""
+        for pair in list(self.wsnames.keys()):
+            try:
+                since = int(self._candles[pair].time) if pair in self._candles else 0
+                ohlc = self.exchange.get_ohlc_data(pair, interval=self.interval, since=since).get('result')
+
+                for key in ohlc.keys():
+                    if key != 'last' and len(ohlc[key]) > 0:
+                        self._update(pair, 'ohlc', OHLC(ohlc[key][-1]))
+                        break
+            except Exception as e:
+                print(f"{self.classname}: REST backfill for {pair} failed: {e}")
+
+    def on_message(self, message):
+        # Events (heartbeat, systemStatus, subscriptionStatus) are dicts, channel data are lists
+        if isinstance(message, dict):
+            if message.get('event') == 'subscriptionStatus' and message.get('status') == 'error':
+                print(f"{self.classname}: subscription error: {message.get('errorMessage')}")
+            return
+
+        channel_name = message[-2]
+        pair = self._pairs_by_wsname.get(message[-1])
+
+        if pair is None:
+            return
+
+        if channel_name.startswith('ohlc'):
+            # [time, etime, open, high, low, close, vwap, volume, count] -> REST row layout
+            row = message[1]
+            begin = int(float(row[1])) - self.interval * 60
+            self._update(pair, 'ohlc', OHLC([begin] + row[2:]))
+        elif channel_name.startswith('book'):
+            self._on_book(pair, message[1:-2])
+        elif channel_name == 'ticker':
+            ticker = message[1]
+            self._update(pair, 'ticker', {
+                'bid': float(ticker['b'][0]),
+                'ask': float(ticker['a'][0]),
+                'last': float(ticker['c'][0]),
+            })
+
+    def _on_book(self, pair, payloads):
+        book = self._books.get(pair)
+
+        if book is None:
+            return
+
+        with self._state_lock:
+            for payload in payloads:
+                if 'as' in payload or 'bs' in payload:
+                    book.load_snapshot(payload.get('bs', []), payload.get('as', []))
+                else:
+                    book.apply(payload.get('b'), payload.get('a'))
+
+            checksum = next((payload['c'] for payload in payloads if 'c' in payload), None)
+            is_valid = checksum is None or book.verify_checksum(checksum)
+            self._update_times[pair] = time.time()
+
+        if not is_valid:
+            self.checksum_failures += 1
+            print(f"{self.classname}: {pair} order book failed its checksum, resyncing")
+            self._seed_book(pair)
+            wsname = self.wsnames[pair]
+            self.send({"event": "unsubscribe", "pair": [wsname], "subscription": {"name": "book", "depth": self.book_depth}})
+            self._send_book_subscriptions([wsname])
+
+    def _seed_book(self, pair):
+        try:
+            depth = self.exchange.get_order_book(pair, count=self.book_depth)
+
+            with self._state_lock:
+                self._books[pair].load_depth(depth)
+        except Exception as e:
+            print(f"{self.classname}: REST order book for {pair} failed: {e}")
+
+    def _send_book_subscriptions(self, wsnames):
+        if len(wsnames) == 0:
+            return
+
+        self.send({"event": "subscribe", "pair": wsnames, "subscription": {"name": "book", "depth": self.book_depth}})
+
+    def _update(self, pair, channel, data):
+        with self._state_lock:
+            if channel == 'ohlc':
+                self._candles[pair] = data
+            else:
+                self._tickers[pair] = data
+
+            self._update_times[pair] = time.time()
+
+        for callback in self._listeners:
+            try:
+                callback(channel, pair, data)
+            except Exception as e:
+                print(f"{self.classname}: listener error: {e}")
+
+    def _send_subscriptions(self, wsnames):
+        if len(wsnames) == 0:
+            return
+
+        self.send({"event": "subscribe", "pair": wsnames, "subscription": {"name": "ohlc", "interval": self.interval}})
+        self.send({"event": "subscribe", "pair": wsnames, "subscription": {"name": "ticker"}})
+
+class KrakenOrderSocket(KrakenWebSocket):
+    """
+    Order entry and fill stream over Kraken's authenticated WebSockets API.
+
+    add_order and cancel_order send the request over the open connection and block until Kraken
+    acknowledges it, which saves the HTTP round trip and the follow-up order confirmation. Their
+    return values have the same shape as the KrakenExchange REST responses.
+
+    Fills from the ownTrades channel are delivered to listeners registered with
+    add_fill_listener(callback) as dicts with the keys trade_id, order_txid, pair, side, price,
+    volume, fee and time.
+
+    The session token comes from KrakenExchange.get_websockets_token and is renewed on every
+    reconnect. If it cannot be fetched, the socket reconnects with backoff and requests fail
+    with ConnectionError in the meantime.
+    """
+    def __init__(self, exchange: Exchange, url: str = 'wss://ws-auth.kraken.com', ack_timeout_in_sec: float = 5, **kwargs):
+        super().__init__(url, **kwargs)
+        self.exchange = exchange
+        self.ack_timeout_in_sec = ack_timeout_in_sec
+
+        self._token = None
+        self._reqids = itertools.count(1)
+        self._pending_requests = {}
+        self._pending_lock = threading.Lock()
+        self._fill_listeners = []
+
+    def add_fill_listener(self, callback):
+        self._fill_listeners.append(callback)
+
+    def on_open(self):
+        self._token = self.exchange.get_websockets_token()['result']['token']
+        self.send({"event": "subscribe", "subscription": {"name": "ownTrades", "token": self._token, "snapshot": False}})
+
+    def add_order(self, ordertype, type, volume, pair, userref=0, price='', price2='', oflags='', validate='false', closeordertype='', closeprice='', closeprice2=''):
+        """Add an order. Same arguments as KrakenExchange.add_order."""
+        # https://docs.kraken.com/websockets/#message-addOrder
+        if self.exchange.mode == 'test':
+            validate = True
+
+        message = {
+            "event": "addOrder",
+            "ordertype": ordertype,
+            "type": type,
+            "volume": str(volume),
+            "pair": self.resolve_wsname(self.exchange, pair)
+        }
+
+        if userref != 0:
+            message["userref"] = str(userref)
+
+        if price != '':
+            message["price"] = str(price)
+
+        if price2 != '':
+            message["price2"] = str(price2)
+
+        if oflags != '':
+            message["oflags"] = oflags
+
+        if validate in [True, 'true']:
+            message["validate"] = "true"
+
+        if closeordertype != '':
+            message["close[ordertype]"] = closeordertype
+
+        if closeprice != '':
+            message["close[price]"] = str(closeprice)
+
+        if closeprice2 != '':
+            message["close[price2]"] = str(closeprice2)
+
+        status = self._request(message)
+
+        return {
+            "error": [],
+            "result": {
+                "descr": {"order": status.get('descr', '')},
+                "txid": [status['txid']] if status.get('txid') else []
+            }
+        }
+
+    def cancel_order(self, txid):
+        """Cancel one or more open orders (txid may be a txid or a list of txids)."""
+        # https://docs.kraken.com/websockets/#message-cancelOrder
+        txids = txid if isinstance(txid, list) else [txid]
+        self._request({"event": "cancelOrder", "txid": txids})
+
+        return {"error": [], "result": {"count": len(txids)}}
+
+    def _request(self, message: dict) -> dict:
+        reqid = next(self._reqids)
+        message["token"] = self._token
+        message["reqid"] = reqid
+        waiter = [threading.Event(), None]
+
+        with self._pending_lock:
+            self._pending_requests[reqid] = waiter
+
+        try:
+            if not self.is_connected() or not self.send(message):
+                raise ConnectionError(f"{self.classname}: not connected")
+
+            if not waiter[0].wait(self.ack_timeout_in_sec):
+                raise TimeoutError(f"{self.classname}: no acknowledgement for {message['event']} within {self.ack_timeout_in_sec}s")
+        finally:
+            with self._pending_lock:
+                self._pending_requests.pop(reqid, None)
+
+        status = waiter[1]
+
+        if status.get('status') != 'ok':
+            raise Exception(f"{self.classname}: {message['event']} failed: {status.get('errorMessage')}")
+
+        return status
+
+    def on_message(self, message):
+        if isinstance(message, dict):
+            if message.get('event') in ['addOrderStatus', 'cancelOrderStatus']:
+                with self._pending_lock:
+                    waiter = self._pending_requests.get(message.get('reqid'))
+
+                if waiter is not None:
+                    waiter[1] = message
+                    waiter[0].set()
+            elif message.get('event') == 'subscriptionStatus' and message.get('status') == 'error':
+                print(f"{self.classname}: subscription error: {message.get('errorMessage')}")
+            return
+
+        if message[-2] != 'ownTrades':
+            return
+
+        for trades in message[0]:
+            for trade_id, trade in trades.items():
+                fill = {
+                    'trade_id': trade_id,
+                    'order_txid': trade['ordertxid'],
+                    'pair': trade['pair'],
+                    'side': trade['type'],
+                    'price': float(trade['price']),
+                    'volume': float(trade['vol']),
+                    'fee': float(trade['fee']),
+                    'time': float(trade['time']),
+                }
+
+                for callback in self._fill_listeners:
+                    try:
+                        callback(fill)
+                    except Exception as e:
+                        print(f"{self.classname}: fill listener error: {e}")
@@ -0,0 +1,25 @@
+import multiprocessing
+
+class NonceCounter():
+    """
+    The last nonce signed with an API key. Every client of the key draws its nonces from the same
+    counter, so two clients never send the same nonce, even within the same millisecond.
+
+    The counter lives in shared memory, so processes forked after it is created (e.g. the shards
+    of a ShardedSupervisor) draw from it as well.
+    """
+    def __init__(self):
+        self._last = multiprocessing.Value('q', 0)
+
+    def __repr__(self):
+        return f"{{NonceCounter last: {self.last}}}"
+
+    @property
+    def last(self) -> int:
+        return self._last.value
+
+    def next(self, timestamp_ms: int) -> int:
+        """Returns a nonce of at least timestamp_ms and above every nonce returned before."""
+        with self._last.get_lock():
+            self._last.value = max(timestamp_ms, self._last.value + 1)
+            return self._last.value
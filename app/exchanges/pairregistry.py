@@ -0,0 +1,180 @@
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+class Quantizer():
+    """Rounds values to a pair's price or lot precision in O(1), with the scale and tick size precomputed."""
+    def __init__(self, decimals: int, tick_size: float = 0):
+        self.decimals = int(decimals)
+        self.scale = 10 ** self.decimals
+        self.tick_size = float(tick_size or 0)
+
+    def __repr__(self):
+        return f"{{Quantizer decimals: {self.decimals}, tick_size: {self.tick_size}}}"
+
+    def round(self, value: float) -> float:
+        """Rounds to the nearest tick (or decimal place if the pair has no tick size)."""
+        if self.tick_size > 0:
+            value = round(value / self.tick_size) * self.tick_size
+
+        return round(value, self.decimals)
+
+    def floor(self, value: float) -> float:
+        """Rounds down, e.g. so an order volume never exceeds the budget it was sized from."""
+        # The epsilon absorbs float error such as 0.29 * 100 = 28.999999999999996
+        return math.floor(value * self.scale + 1e-9) / self.scale
+
+    def format(self, value: float) -> str:
+        return f"{self.round(value):.{self.decimals}f}"
+
+class PairInfo():
+    """Trading rules of one asset pair as returned by Kraken's /public/AssetPairs."""
+    def __init__(self, key: str, info: dict):
+        self.key = key
+        self.altname = info.get('altname', key)
+        self.wsname = info.get('wsname')
+        self.base = info.get('base')
+        self.quote = info.get('quote')
+        self.pair_decimals = info['pair_decimals']
+        self.lot_decimals = info['lot_decimals']
+        self.cost_decimals = info['cost_decimals']
+        self.ordermin = float(info['ordermin'])
+        self.costmin = float(info.get('costmin', 0))
+        self.tick_size = info.get('tick_size')
+        self.status = info.get('status')
+
+        self.price_quantizer = Quantizer(self.pair_decimals, self.tick_size)
+        self.lot_quantizer = Quantizer(self.lot_decimals)
+
+    def __repr__(self):
+        return f"{{PairInfo key: {self.key}, altname: {self.altname}, wsname: {self.wsname}, pair_decimals: {self.pair_decimals}, lot_decimals: {self.lot_decimals}, ordermin: {self.ordermin}, costmin: {self.costmin}}}"
+
+class PairRegistry():
+    """
+    Asset pair metadata for an exchange, loaded once for all pairs and cached on disk.
+
+    Pairs can be looked up by REST key (XXBTZUSD), altname (XBTUSD) or wsname (XBT/USD). The
+    account's fee schedule per pair (from get_trade_volume) is cached alongside, keyed by a hash of
+    the API key so accounts sharing the cache never see each other's fees. Both caches expire after
+    ttl_in_sec, so bots normally start without any network round trip.
+
+    Expects the Kraken response format for get_tradable_asset_pairs and get_trade_volume.
+    """
+    def __init__(self, exchange, cache_path: str = None, ttl_in_sec: float = 24 * 60 * 60):
+        self.exchange = exchange
+        self.cache_path = cache_path if cache_path is not None else f"app/exchanges/local/{exchange.__class__.__name__}_asset_pairs.json"
+        self.ttl_in_sec = ttl_in_sec
+
+        # Raw AssetPairs info by REST key, plus name -> REST key for every known name
+        self.pairs_updated_at = 0
+        self.raw_pairs = {}
+        self.aliases = {}
+        self.fees = {}
+
+        self._pair_infos = {}
+        self._lock = threading.RLock()
+        self._load_cache()
+
+    def __repr__(self):
+        return f"{{PairRegistry exchange: {self.exchange.__class__.__name__}, pairs: {len(self.raw_pairs)}, cache_path: {self.cache_path}}}"
+
+    def get(self, pair: str) -> PairInfo:
+        """Returns the PairInfo of pair (any of its names). Fetches from the exchange only if the cache is stale or does not know pair."""
+        with self._lock:
+            if time.time() - self.pairs_updated_at > self.ttl_in_sec:
+                self.refresh()
+
+            key = self.aliases.get(pair)
+
+            if key is None:
+                # Unknown name (e.g. a new listing): ask for this pair specifically and remember the name
+                self._add_pairs(self.exchange.get_tradable_asset_pairs(pair).get('result'), alias=pair)
+                self._save_cache()
+                key = self.aliases[pair]
+
+            return self._pair_infos[key]
+
+    def get_fees(self, pair: str) -> dict:
+        """Returns {'taker', 'maker', 'volume'} for pair (fees in percent, 30 day USD volume), from cache if fresh."""
+        fee_key = self._fee_key(pair)
+
+        with self._lock:
+            fee = self.fees.get(fee_key)
+
+            if fee is None or time.time() - fee['updated_at'] > self.ttl_in_sec:
+                fee_info = self.exchange.get_trade_volume(pair).get('result')
+                kraken_key = next(iter(fee_info['fees'].keys()))
+                taker = float(fee_info['fees'][kraken_key]['fee'])
+
+                if fee_info.get('fees_maker') is None:
+                    maker = taker
+                else:
+                    maker = float(fee_info['fees_maker'][kraken_key]['fee'])
+
+                fee = {'taker': taker, 'maker': maker, 'volume': fee_info['volume'], 'updated_at': time.time()}
+                self.fees[fee_key] = fee
+                self._save_cache()
+
+            return fee
+
+    def refresh(self):
+        """Reloads every pair from the exchange and rewrites the disk cache."""
+        with self._lock:
+            self._add_pairs(self.exchange.get_tradable_asset_pairs('').get('result'))
+            self.pairs_updated_at = time.time()
+            self._save_cache()
+
+    def _fee_key(self, pair: str) -> str:
+        # Never store the API key itself in the cache
+        account = hashlib.sha256(str(getattr(self.exchange, 'api_key', '')).encode()).hexdigest()[:16]
+        return f"{account}:{pair}"
+
+    def _add_pairs(self, pairs: dict, alias: str = None):
+        for key, info in pairs.items():
+            self.raw_pairs[key] = info
+            self._pair_infos[key] = PairInfo(key, info)
+
+            for name in [key, info.get('altname'), info.get('wsname')]:
+                if name:
+                    self.aliases[name] = key
+
+        if alias is not None and len(pairs) > 0:
+            self.aliases[alias] = next(iter(pairs.keys()))
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        self._add_pairs(cache.get('pairs', {}))
+        self.aliases.update(cache.get('aliases', {}))
+        self.fees = cache.get('fees', {})
+        self.pairs_updated_at = cache.get('pairs_updated_at', 0)
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+
+        try:
+            folder = os.path.dirname(self.cache_path)
+
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+
+            # Write then rename so other processes never read a half-written cache
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({
+                    'pairs_updated_at': self.pairs_updated_at,
+                    'pairs': self.raw_pairs,
+                    'aliases': self.aliases,
+                    'fees': self.fees,
+                }, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"PairRegistry: could not write cache {self.cache_path}: {e}")
@@ -0,0 +1,343 @@
+import threading
+import time
+from app.shared import get_shared
+
+class TokenBucket():
+    """
+    Thread-safe token bucket holding up to capacity tokens that refill continuously at refill_rate tokens per second.
+
+    This is the mirror image of a decaying call counter (such as Kraken's): the counter is
+    capacity - tokens, every call adds its cost to it and it decays at refill_rate.
+    """
+    def __init__(self, capacity: float, refill_rate: float):
+        assert capacity > 0
+        assert refill_rate > 0
+
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{{TokenBucket capacity: {self.capacity}, refill_rate: {self.refill_rate}, tokens: {round(self.available(), 2)}}}"
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+    def try_acquire(self, cost: float = 1) -> bool:
+        """Takes cost tokens if they are available right now. Never blocks."""
+        cost = min(cost, self.capacity)
+
+        with self._lock:
+            self._refill()
+
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return True
+
+            return False
+
+    def acquire(self, cost: float = 1, timeout: float = None) -> bool:
+        """Blocks until cost tokens are available and takes them. Returns False if that would take longer than timeout."""
+        cost = min(cost, self.capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                self._refill()
+
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return True
+
+                wait = (cost - self.tokens) / self.refill_rate
+
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+
+            time.sleep(wait)
+
+    def drain(self):
+        """Empties the bucket, e.g. after the server reported that the limit was exceeded."""
+        with self._lock:
+            self._refill()
+            self.tokens = 0
+
+class FixedWindowCounter():
+    """
+    Thread-safe counter allowing up to limit units of cost per fixed window of window_in_sec seconds.
+
+    Windows are aligned to the epoch (e.g. whole minutes), which is how Binance counts request weight.
+    """
+    def __init__(self, limit: float, window_in_sec: float):
+        assert limit > 0
+        assert window_in_sec > 0
+
+        self.limit = limit
+        self.window_in_sec = window_in_sec
+        self.window_start = 0
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{{FixedWindowCounter limit: {self.limit}, window_in_sec: {self.window_in_sec}, used: {self.used}}}"
+
+    def _roll(self) -> float:
+        now = time.time()
+        window_start = now - now % self.window_in_sec
+
+        if window_start != self.window_start:
+            self.window_start = window_start
+            self.used = 0
+
+        return now
+
+    def available(self) -> float:
+        with self._lock:
+            self._roll()
+            return self.limit - self.used
+
+    def try_acquire(self, cost: float = 1) -> bool:
+        cost = min(cost, self.limit)
+
+        with self._lock:
+            self._roll()
+
+            if self.used + cost <= self.limit:
+                self.used += cost
+                return True
+
+            return False
+
+    def acquire(self, cost: float = 1, timeout: float = None) -> bool:
+        cost = min(cost, self.limit)
+        deadline = None if timeout is None else time.time() + timeout
+
+        while True:
+            with self._lock:
+                now = self._roll()
+
+                if self.used + cost <= self.limit:
+                    self.used += cost
+                    return True
+
+                wait = self.window_start + self.window_in_sec - now
+
+            if deadline is not None and time.time() + wait > deadline:
+                return False
+
+            time.sleep(wait)
+
+    def drain(self):
+        with self._lock:
+            self._roll()
+            self.used = self.limit
+
+class RateLimiter():
+    """
+    Client-side rate-limit governor made of named buckets (e.g. 'public', 'private').
+
+    Every request calls acquire(bucket, cost) before it is sent, which blocks only as long as
+    needed to stay within the limit. Requests on buckets the limiter does not know are not limited.
+    """
+    def __init__(self, buckets: dict = None):
+        self.classname = self.__class__.__name__
+        self.buckets = buckets if buckets is not None else {}
+
+    def __repr__(self):
+        return f"{{{self.classname} buckets: {self.buckets}}}"
+
+    def acquire(self, bucket: str, cost: float = 1, timeout: float = None) -> bool:
+        if bucket not in self.buckets:
+            return True
+
+        return self.buckets[bucket].acquire(cost, timeout)
+
+    def try_acquire(self, bucket: str, cost: float = 1) -> bool:
+        if bucket not in self.buckets:
+            return True
+
+        return self.buckets[bucket].try_acquire(cost)
+
+    def drain(self, bucket: str):
+        if bucket in self.buckets:
+            self.buckets[bucket].drain()
+
+    def on_error(self, error_message: str):
+        """Called with every error the exchange returns. Override to drain the buckets of rate-limit errors."""
+        pass
+
+class KrakenRateLimiter(RateLimiter):
+    """
+    Models Kraken's spot REST rate limits for one API key.
+
+    - 'public': public endpoints are limited per IP to about one call per second.
+    - 'private': the per-key call counter. Every call adds 1 (2 for ledger and trade history
+      queries), the counter decays at the tier's rate and must stay below the tier's maximum.
+    - 'trading:<pair>': the per-pair matching engine counter. Adding an order costs 1, cancelling
+      or editing a young order costs a penalty that shrinks with the order's age.
+
+    Processes sharing an API key and IP (see ShardedSupervisor) each take a share of the public
+    and private limits. Each pair is traded by one process only, so its trading counter is not split.
+    """
+    # https://docs.kraken.com/api/docs/guides/spot-rest-ratelimits
+    # https://docs.kraken.com/api/docs/guides/spot-ratelimits
+    TIERS = {
+        'starter': {'max_counter': 15, 'decay': 0.33, 'trading_max_counter': 60, 'trading_decay': 1.0},
+        'intermediate': {'max_counter': 20, 'decay': 0.5, 'trading_max_counter': 125, 'trading_decay': 2.34},
+        'pro': {'max_counter': 20, 'decay': 1.0, 'trading_max_counter': 180, 'trading_decay': 3.75},
+    }
+
+    PRIVATE_COSTS = {
+        'Ledgers': 2,
+        'QueryLedgers': 2,
+        'TradesHistory': 2,
+    }
+
+    TRADING_ENDPOINTS = ['AddOrder', 'AddOrderBatch', 'EditOrder', 'CancelOrder', 'CancelOrderBatch']
+
+    # (maximum order age in seconds, penalty)
+    CANCEL_PENALTIES = [(5, 8), (10, 6), (15, 5), (45, 4), (90, 2), (300, 1)]
+    EDIT_PENALTIES = [(5, 6), (10, 5), (15, 4), (45, 2), (90, 1)]
+
+    # Orders older than this are cancelled and edited without penalty, so their times are dropped
+    MAX_PENALTY_AGE_IN_SEC = 300
+
+    def __init__(self, tier: str = 'starter', share: float = 1.0):
+        assert tier in self.TIERS
+        assert 0 < share <= 1
+        self.tier = tier
+        self.share = share
+        limits = self.TIERS[tier]
+
+        super().__init__({
+            'public': get_shared(('KrakenExchange', 'public'), lambda: TokenBucket(1, share)),
+            'private': TokenBucket(max(1, limits['max_counter'] * share), limits['decay'] * share),
+        })
+
+        # txid -> (pair, time placed), used to price cancels and edits
+        self.order_times = {}
+        self._orders_lock = threading.Lock()
+
+    def acquire_private(self, endpoint: str, pair: str = None, txids: list = None, order_count: int = 1):
+        """Waits for budget for a private call to endpoint (e.g. 'Balance', 'AddOrder')."""
+        if endpoint not in self.TRADING_ENDPOINTS:
+            return self.acquire('private', self.PRIVATE_COSTS.get(endpoint, 1))
+
+        if endpoint == 'AddOrder':
+            return self.acquire(self._trading_bucket(pair), 1)
+
+        if endpoint == 'AddOrderBatch':
+            return self.acquire(self._trading_bucket(pair), 1 + order_count / 2)
+
+        # Cancels and edits are charged to the pair of each order
+        penalties = self.EDIT_PENALTIES if endpoint == 'EditOrder' else self.CANCEL_PENALTIES
+        costs = {}
+
+        for txid in txids or []:
+            with self._orders_lock:
+                order_pair, placed_at = self.order_times.pop(txid, (pair, None))
+
+            costs[order_pair] = costs.get(order_pair, 0) + self.penalty(penalties, placed_at)
+
+        for order_pair, cost in costs.items():
+            self.acquire(self._trading_bucket(order_pair), cost)
+
+        return True
+
+    def record_orders(self, txids: list, pair: str):
+        """Remembers when orders were placed so cancels and edits are charged the right penalty."""
+        now = time.time()
+
+        with self._orders_lock:
+            # Filled orders are never cancelled, so forget every order past the penalty window
+            for txid, (_, placed_at) in list(self.order_times.items()):
+                if now - placed_at >= self.MAX_PENALTY_AGE_IN_SEC:
+                    del self.order_times[txid]
+
+            for txid in txids:
+                self.order_times[txid] = (pair, now)
+
+    def edit_cost(self, txid) -> float:
+        """The trading counter penalty of editing txid now, without charging it."""
+        with self._orders_lock:
+            _, placed_at = self.order_times.get(txid, (None, None))
+
+        return self.penalty(self.EDIT_PENALTIES, placed_at)
+
+    def trading_available(self, pair) -> float:
+        """The headroom left on the trading counter of pair."""
+        return self.buckets[self._trading_bucket(pair)].available()
+
+    def on_error(self, error_message: str):
+        """Drains the bucket whose limit the server reports as exceeded, so calls pause until its counter has decayed."""
+        if error_message.startswith('EAPI:Rate limit exceeded'):
+            self.drain('private')
+        elif error_message.startswith('EOrder:Rate limit exceeded'):
+            # The error does not name the pair: pause trading on all of them
+            for bucket in list(self.buckets.keys()):
+                if bucket.startswith('trading:'):
+                    self.drain(bucket)
+        elif error_message.startswith('EGeneral:Too many requests'):
+            self.drain('public')
+
+    @staticmethod
+    def penalty(penalties: list, placed_at) -> float:
+        if placed_at is None:
+            # Unknown age: assume the worst case
+            return penalties[0][1]
+
+        age = time.time() - placed_at
+
+        for max_age, penalty in penalties:
+            if age < max_age:
+                return penalty
+
+        return 0
+
+    def _trading_bucket(self, pair) -> str:
+        bucket = f"trading:{pair}"
+
+        if bucket not in self.buckets:
+            limits = self.TIERS[self.tier]
+            self.buckets.setdefault(bucket, TokenBucket(limits['trading_max_counter'], limits['trading_decay']))
+
+        return bucket
+
+class BinanceRateLimiter(RateLimiter):
+    """
+    Models Binance's REST limits: request weight per IP per minute ('weight') and orders per
+    account per 10 seconds ('orders'). Endpoints are charged their documented weight.
+    """
+    # https://developers.binance.com/docs/binance-spot-api-docs/rest-api/limits
+    ENDPOINT_WEIGHTS = {
+        '/api/v3/klines': 2,
+        '/api/v3/depth': 5,
+        '/api/v3/ticker/bookTicker': 2,
+        '/api/v3/ticker/price': 2,
+        '/api/v3/order': 1,
+        '/api/v3/account': 20,
+    }
+
+    def __init__(self, base_url: str = 'https://api.binance.com', api_key: str = '', weight_per_minute: int = 6000, orders_per_10_sec: int = 100):
+        super().__init__({
+            'weight': get_shared(('BinanceRateLimiter', base_url, 'weight'), lambda: FixedWindowCounter(weight_per_minute, 60)),
+            'orders': get_shared(('BinanceRateLimiter', base_url, api_key, 'orders'), lambda: FixedWindowCounter(orders_per_10_sec, 10)),
+        })
+
+    def acquire_endpoint(self, uri_path: str, is_order: bool = False):
+        """Waits for budget for a request to uri_path (e.g. '/api/v3/klines')."""
+        self.acquire('weight', self.ENDPOINT_WEIGHTS.get(uri_path, 1))
+
+        if is_order:
+            self.acquire('orders', 1)
+
+        return True
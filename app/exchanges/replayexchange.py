@@ -0,0 +1,342 @@
+import gzip
+import json
+import random
+import threading
+import time
+from collections import deque
+import app.exchanges.exchange as exchanges
+from app.exchanges.exchange import Exchange
+from app.exchanges.pairregistry import PairRegistry
+
+def open_log(path: str, mode: str):
+    """Opens a request log, gzip-compressed if path ends with '.gz'."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+
+    return open(path, mode, encoding='utf-8')
+
+def request_key(method: str, args, kwargs) -> str:
+    return json.dumps([method, list(args), kwargs], sort_keys=True, default=str)
+
+class ExchangeProxy(Exchange):
+    """Exchange whose API methods all go through self.call(method, args, kwargs)."""
+    @property
+    def pair_registry(self):
+        """Pair registry without a disk cache, so pair lookups are recorded and replayed like every other call."""
+        if getattr(self, '_pair_registry', None) is None:
+            self._pair_registry = PairRegistry(self, cache_path='')
+
+        return self._pair_registry
+
+    def call(self, method: str, args: tuple, kwargs: dict):
+        raise NotImplementedError("Not Implemented.")
+
+    # Public requests
+    def get_exchange_time(self, *args, **kwargs):
+        return self.call('get_exchange_time', args, kwargs)
+
+    def get_exchange_status(self, *args, **kwargs):
+        return self.call('get_exchange_status', args, kwargs)
+
+    def get_asset_info(self, *args, **kwargs):
+        return self.call('get_asset_info', args, kwargs)
+
+    def get_tradable_asset_pairs(self, *args, **kwargs):
+        return self.call('get_tradable_asset_pairs', args, kwargs)
+
+    def get_ticker_info(self, *args, **kwargs):
+        return self.call('get_ticker_info', args, kwargs)
+
+    def get_ohlc_data(self, *args, **kwargs):
+        return self.call('get_ohlc_data', args, kwargs)
+
+    def get_order_book(self, *args, **kwargs):
+        return self.call('get_order_book', args, kwargs)
+
+    def get_recent_trades(self, *args, **kwargs):
+        return self.call('get_recent_trades', args, kwargs)
+
+    def get_recent_spreads(self, *args, **kwargs):
+        return self.call('get_recent_spreads', args, kwargs)
+
+    def get_quote(self, *args, **kwargs):
+        return self.call('get_quote', args, kwargs)
+
+    # Authenticated requests
+    def add_order(self, *args, **kwargs):
+        return self.call('add_order', args, kwargs)
+
+    def add_order_batch(self, *args, **kwargs):
+        return self.call('add_order_batch', args, kwargs)
+
+    def edit_order(self, *args, **kwargs):
+        return self.call('edit_order', args, kwargs)
+
+    def cancel_order(self, *args, **kwargs):
+        return self.call('cancel_order', args, kwargs)
+
+    def cancel_order_batch(self, *args, **kwargs):
+        return self.call('cancel_order_batch', args, kwargs)
+
+    def get_account_balance(self, *args, **kwargs):
+        return self.call('get_account_balance', args, kwargs)
+
+    def get_extended_balance(self, *args, **kwargs):
+        return self.call('get_extended_balance', args, kwargs)
+
+    def get_trade_balance(self, *args, **kwargs):
+        return self.call('get_trade_balance', args, kwargs)
+
+    def get_open_orders(self, *args, **kwargs):
+        return self.call('get_open_orders', args, kwargs)
+
+    def get_closed_orders(self, *args, **kwargs):
+        return self.call('get_closed_orders', args, kwargs)
+
+    def get_orders_info(self, *args, **kwargs):
+        return self.call('get_orders_info', args, kwargs)
+
+    def get_trades_info(self, *args, **kwargs):
+        return self.call('get_trades_info', args, kwargs)
+
+    def get_trades_history(self, *args, **kwargs):
+        return self.call('get_trades_history', args, kwargs)
+
+    def get_trade_volume(self, *args, **kwargs):
+        return self.call('get_trade_volume', args, kwargs)
+
+    def get_websockets_token(self, *args, **kwargs):
+        return self.call('get_websockets_token', args, kwargs)
+
+    def get_fee_rate(self, *args, **kwargs):
+        return self.call('get_fee_rate', args, kwargs)
+
+    # Coinbase requests
+    def get_currency(self, *args, **kwargs):
+        return self.call('get_currency', args, kwargs)
+
+    def get_trading_pairs(self, *args, **kwargs):
+        return self.call('get_trading_pairs', args, kwargs)
+
+    def get_product_info(self, *args, **kwargs):
+        return self.call('get_product_info', args, kwargs)
+
+    def get_product_candles(self, *args, **kwargs):
+        return self.call('get_product_candles', args, kwargs)
+
+    def get_product_book(self, *args, **kwargs):
+        return self.call('get_product_book', args, kwargs)
+
+    def get_fees(self, *args, **kwargs):
+        return self.call('get_fees', args, kwargs)
+
+    def create_order(self, *args, **kwargs):
+        return self.call('create_order', args, kwargs)
+
+    # Robinhood requests
+    def get_account(self, *args, **kwargs):
+        return self.call('get_account', args, kwargs)
+
+    def get_holdings(self, *args, **kwargs):
+        return self.call('get_holdings', args, kwargs)
+
+    def get_best_bid_ask(self, *args, **kwargs):
+        return self.call('get_best_bid_ask', args, kwargs)
+
+    def get_estimated_price(self, *args, **kwargs):
+        return self.call('get_estimated_price', args, kwargs)
+
+    def place_order(self, *args, **kwargs):
+        return self.call('place_order', args, kwargs)
+
+    def get_order(self, *args, **kwargs):
+        return self.call('get_order', args, kwargs)
+
+    def get_orders(self, *args, **kwargs):
+        return self.call('get_orders', args, kwargs)
+
+class RecordingExchange(ExchangeProxy):
+    """
+    Wraps any Exchange and appends every API call to a JSON-lines log (gzip-compressed if log_path
+    ends with '.gz'): the method, its arguments, the response or error, when the call started
+    relative to the first call and how long it took. ReplayExchange serves the log back.
+
+    Attributes the wrapper does not have (api_key, mode, ...) are read from the wrapped exchange.
+    """
+    def __init__(self, exchange: Exchange={}, log_path: str=''):
+        super().__init__()
+        self.classname = self.__class__.__name__
+        if type(exchange) == dict:
+            # Reloading
+            print(f"Reloading {self.classname}...")
+            return
+
+        self.exchange = exchange
+        self.log_path = log_path
+
+    def __getattr__(self, name):
+        # Only called for attributes the wrapper lacks
+        if name.startswith('_') or name == 'exchange':
+            raise AttributeError(name)
+
+        return getattr(self.exchange, name)
+
+    def __repr__(self):
+        return f"{{{self.classname} exchange: {self.exchange.classname}, log_path: {self.log_path}}}"
+
+    def warm_up(self):
+        self.exchange.warm_up()
+
+    def to_batch_order(self, **order):
+        # Formats an order locally, no API call to record
+        return self.exchange.to_batch_order(**order)
+
+    def supports_order(self, ordertype, **order) -> bool:
+        return self.exchange.supports_order(ordertype, **order)
+
+    def close(self):
+        self.exchange.close()
+
+        if getattr(self, '_log_file', None) is not None:
+            self._log_file.close()
+            self._log_file = None
+
+    def call(self, method: str, args: tuple, kwargs: dict):
+        started_at = time.time()
+        entry = {"method": method, "args": list(args), "kwargs": kwargs}
+
+        try:
+            response = getattr(self.exchange, method)(*args, **kwargs)
+            entry["response"] = response
+            return response
+        except Exception as e:
+            entry["error"] = f"{e.__class__.__name__}: {e}"
+            raise e
+        finally:
+            entry["elapsed"] = round(time.time() - started_at, 6)
+            self._write(entry, started_at)
+
+    def _write(self, entry: dict, started_at: float):
+        if getattr(self, '_log_lock', None) is None:
+            self._log_lock = threading.Lock()
+
+        with self._log_lock:
+            if getattr(self, '_log_file', None) is None:
+                self._log_file = open_log(self.log_path, 'a')
+                self._first_call_at = started_at
+                self._log_file.write(json.dumps({"header": {"exchange": self.exchange.classname, "mode": getattr(self.exchange, 'mode', 'test')}}) + '\n')
+
+            entry["t"] = round(started_at - self._first_call_at, 6)
+            self._log_file.write(json.dumps(entry, separators=(',', ':'), default=str) + '\n')
+            self._log_file.flush()
+
+class ReplayError(Exception):
+    """An error recorded in the log, or one injected by ReplayExchange."""
+    pass
+
+class ReplayExchange(ExchangeProxy):
+    """
+    Serves a RecordingExchange log back without network access.
+
+    Each call returns the next recorded response of the same method and arguments (or, failing
+    that, of the same method), repeating the last one once they run out, so replays can run for
+    longer than the recording. Every recorded response is served at most once before that.
+    Recorded errors are raised as ReplayError. Orders are batched like the recorded exchange
+    batches them, so replays take the same order path as the recording.
+
+    Latency is only simulated if asked for: the recorded duration of each call (replay_latency),
+    a fixed latency_in_sec, uniform jitter of up to +/- jitter_in_sec, and failures injected with
+    probability timeout_rate (raises TimeoutError after timeout_in_sec) and error_rate (raises
+    ReplayError). All randomness comes from seed, so runs are reproducible.
+    """
+    def __init__(self, log_path: str='', replay_latency: bool=False, latency_in_sec: float=0, jitter_in_sec: float=0, timeout_rate: float=0, timeout_in_sec: float=0, error_rate: float=0, seed: int=0):
+        super().__init__()
+        self.classname = self.__class__.__name__
+        self.log_path = log_path
+        self.replay_latency = replay_latency
+        self.latency_in_sec = latency_in_sec
+        self.jitter_in_sec = jitter_in_sec
+        self.timeout_rate = timeout_rate
+        self.timeout_in_sec = timeout_in_sec
+        self.error_rate = error_rate
+        self.seed = seed
+
+        # Non-empty keys so bots query balances, which the log answers
+        self.api_key = 'replay'
+        self.api_sec = 'replay'
+        self.mode = 'test'
+        self.call_count = 0
+        self.exchange_classname = 'Exchange'
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._by_request = {}
+        self._by_method = {}
+        self._load()
+
+    def __repr__(self):
+        return f"{{{self.classname} log_path: {self.log_path}, call_count: {self.call_count}}}"
+
+    def to_batch_order(self, **order):
+        exchange_class = getattr(exchanges, self.exchange_classname, Exchange)
+        return exchange_class.to_batch_order(self, **order)
+
+    def call(self, method: str, args: tuple, kwargs: dict):
+        with self._lock:
+            self.call_count += 1
+            entry = self._next(self._by_request.get(request_key(method, args, kwargs))) or self._next(self._by_method.get(method))
+            roll = self._random.random()
+            jitter = self._random.uniform(-self.jitter_in_sec, self.jitter_in_sec) if self.jitter_in_sec > 0 else 0
+
+        if entry is None:
+            raise ReplayError(f"{self.classname}: no recorded response for {method}")
+
+        if roll < self.timeout_rate:
+            time.sleep(self.timeout_in_sec)
+            raise TimeoutError(f"{self.classname}: injected timeout in {method}")
+
+        delay = self.latency_in_sec + jitter + (entry.get('elapsed', 0) if self.replay_latency else 0)
+
+        if delay > 0:
+            time.sleep(delay)
+
+        if roll < self.timeout_rate + self.error_rate:
+            raise ReplayError(f"{self.classname}: injected error in {method}")
+
+        if 'error' in entry:
+            raise ReplayError(entry['error'])
+
+        # Copy so callers can modify responses without changing later replays
+        return json.loads(json.dumps(entry.get('response')))
+
+    @staticmethod
+    def _next(entries):
+        if entries is None or len(entries) == 0:
+            return None
+
+        # Every entry is in both indexes: skip those already served through the other one
+        while len(entries) > 1 and entries[0]['served']:
+            entries.popleft()
+
+        entry = entries.popleft() if len(entries) > 1 else entries[0]
+        entry['served'] = True
+        return entry
+
+    def _load(self):
+        if self.log_path == '':
+            return
+
+        with open_log(self.log_path, 'r') as f:
+            for line in f:
+                entry = json.loads(line)
+
+                if 'header' in entry:
+                    self.mode = entry['header'].get('mode', self.mode)
+                    self.exchange_classname = entry['header'].get('exchange', self.exchange_classname)
+                    continue
+
+                entry['served'] = False
+
+                key = request_key(entry['method'], entry['args'], entry['kwargs'])
+                self._by_request.setdefault(key, deque()).append(entry)
+                self._by_method.setdefault(entry['method'], deque()).append(entry)
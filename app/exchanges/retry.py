@@ -0,0 +1,150 @@
+import random
+import threading
+import time
+from collections import deque
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the exchange while its circuit is open."""
+    pass
+
+class CircuitBreaker():
+    """
+    Thread-safe circuit breaker for one class of endpoints (e.g. 'public', 'private', 'trading').
+
+    The outcomes of the last window_size calls are kept in a deque. Once at least min_calls
+    have been recorded and the share of failures reaches failure_threshold, the circuit opens
+    and calls fail fast for reset_timeout_in_sec. After that a single trial call is let through
+    (half-open): if it succeeds the circuit closes again, otherwise it stays open for another
+    reset_timeout_in_sec.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold: float = 0.5, window_size: int = 20, min_calls: int = 5, reset_timeout_in_sec: float = 30):
+        assert 0 < failure_threshold <= 1
+        assert window_size >= 1
+        assert 1 <= min_calls <= window_size
+        assert reset_timeout_in_sec > 0
+
+        self.failure_threshold = failure_threshold
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.reset_timeout_in_sec = reset_timeout_in_sec
+        self.outcomes = deque(maxlen=window_size)
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{{CircuitBreaker state: {self.state}, failures: {self.failures}/{len(self.outcomes)}}}"
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+
+        if time.monotonic() - self.opened_at >= self.reset_timeout_in_sec:
+            return self.HALF_OPEN
+
+        return self.OPEN
+
+    def allow_request(self) -> bool:
+        """Whether a call may go out now. In the half-open state only one trial call is allowed at a time."""
+        with self._lock:
+            state = self._state()
+
+            if state == self.CLOSED:
+                return True
+
+            if state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+
+            return False
+
+    def _record(self, failed: bool):
+        # The deque drops the oldest outcome once full, so keep the failure count in step with it
+        if len(self.outcomes) == self.window_size and self.outcomes[0]:
+            self.failures -= 1
+
+        self.outcomes.append(failed)
+        self.failures += failed
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                # The trial call succeeded: start over with a clean window
+                self.opened_at = None
+                self.trial_in_flight = False
+                self.outcomes.clear()
+                self.failures = 0
+
+            self._record(False)
+
+    def record_failure(self):
+        with self._lock:
+            if self.opened_at is not None:
+                # The trial call failed (or a call made before the circuit opened did): stay open
+                self.opened_at = time.monotonic()
+                self.trial_in_flight = False
+                return
+
+            self._record(True)
+
+            if len(self.outcomes) >= self.min_calls and self.failures / len(self.outcomes) >= self.failure_threshold:
+                print(f"Opening circuit: {self.failures} of the last {len(self.outcomes)} calls failed")
+                self.opened_at = time.monotonic()
+
+class RetryExecutor():
+    """
+    Calls a function up to max_attempts times, backing off exponentially with full jitter between attempts.
+
+    The n-th retry waits a random time between 0 and min(max_delay_in_sec, base_delay_in_sec * 2**(n-1)),
+    so clients that failed together do not retry together. max_delay_in_sec defaults to 16 base delays.
+    Every outcome is reported to the circuit breaker, and no attempt is made while the circuit is open.
+    """
+    def __init__(self, circuit_breaker: CircuitBreaker = None, max_attempts: int = 5, base_delay_in_sec: float = 1, max_delay_in_sec: float = None):
+        assert max_attempts >= 1
+        assert base_delay_in_sec > 0
+
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.base_delay_in_sec = base_delay_in_sec
+        self.max_delay_in_sec = max_delay_in_sec if max_delay_in_sec is not None else base_delay_in_sec * 16
+
+        assert self.max_delay_in_sec >= base_delay_in_sec
+
+    def __repr__(self):
+        return f"{{RetryExecutor max_attempts: {self.max_attempts}, base_delay_in_sec: {self.base_delay_in_sec}, circuit_breaker: {self.circuit_breaker}}}"
+
+    def get_delay(self, attempt: int) -> float:
+        """Seconds to wait after the given (zero-based) failed attempt."""
+        return random.uniform(0, min(self.max_delay_in_sec, self.base_delay_in_sec * 2 ** attempt))
+
+    def call(self, function, *args, description: str = 'API request', **kwargs):
+        """Returns function(*args, **kwargs), retrying on any exception. Re-raises the last exception once out of attempts."""
+        for attempt in range(self.max_attempts):
+            if not self.circuit_breaker.allow_request():
+                raise CircuitOpenError(f"Not making {description}: circuit is {self.circuit_breaker.state}")
+
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                self.circuit_breaker.record_failure()
+                print(f"Error making {description} (attempt {attempt + 1}/{self.max_attempts}): {e}")
+
+                if attempt == self.max_attempts - 1:
+                    print(f"Failed to make {description} after {self.max_attempts} attempts")
+                    raise e
+
+                time.sleep(self.get_delay(attempt))
+                continue
+
+            self.circuit_breaker.record_success()
+            return result
@@ -0,0 +1,275 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import app.exchanges.exchange as exchanges
+from app.exchanges.exchange import Exchange
+from app.exchanges.hedging import LatencyTracker
+from app.exchanges.replayexchange import ExchangeProxy
+
+class SmartOrderRouter(ExchangeProxy):
+    """
+    Exchange that spreads orders over several venues (e.g. {'Kraken': KrakenExchange, 'Coinbase': CoinbaseExchange}).
+
+    For each order it quotes every venue concurrently and sends the order to the venue with the best
+    fee-adjusted price (ask * (1 + fee) for buys, bid * (1 - fee) for sells) that shows enough size at
+    the touch. Post-only orders are priced with the maker fee, others with the taker fee. Venues whose
+    quotes usually take longer than latency_budget_in_sec (by their percentile quote latency), that
+    miss the budget for this order or that cannot quote are skipped.
+
+    Only venues that can place an order as given (Exchange.supports_order) are considered, so an
+    order is never sent somewhere that would drop its conditional close. An order group
+    (add_order_batch) is routed by its first order and placed on one venue that supports every
+    order of the group, else on the primary venue. A post-only limit order routed away from the
+    primary venue is priced at the touch of its venue instead. Sells of a pair stay on the venue
+    the pair was last bought on, so positions are closed where they are held. Later calls for an
+    order (cancel_order, edit_order) go to the venue that placed it.
+
+    Everything else (market data, balances, pair info) comes from the primary venue, the first one
+    of venues. pair_map translates pair names per venue, e.g. {'Coinbase': {'XBTUSD': 'BTC-USD'}}.
+    """
+    def __init__(self, venues: dict={}, pair_map: dict=None, latency_budget_in_sec: float=1.0, latency_percentile: float=95):
+        super().__init__()
+        self.classname = self.__class__.__name__
+        if len(venues) == 0:
+            # Reloading
+            print(f"Reloading {self.classname}...")
+            return
+
+        assert latency_budget_in_sec > 0
+
+        self.venues = venues
+        self.primary_venue = next(iter(venues.keys()))
+        self.pair_map = pair_map if pair_map is not None else {}
+        self.latency_budget_in_sec = latency_budget_in_sec
+        self.latency_percentile = latency_percentile
+        self.position_venues = {}
+        self.order_venues = {}
+
+    def __getattr__(self, name):
+        # Only called for attributes the router lacks: api_key, mode, ... of the primary venue
+        if name.startswith('_') or name in ['venues', 'primary_venue']:
+            raise AttributeError(name)
+
+        return getattr(self.venues[self.primary_venue], name)
+
+    def __repr__(self):
+        return f"{{{self.classname} venues: {list(self.venues.keys())}, primary_venue: {self.primary_venue}, latency_budget_in_sec: {self.latency_budget_in_sec}}}"
+
+    @classmethod
+    def from_json(cls, json_data):
+        venues = {name: getattr(exchanges, venue['classname']).from_json(venue) for name, venue in json_data['venues'].items()}
+        instance = cls(venues, json_data.get('pair_map'), json_data.get('latency_budget_in_sec', 1.0), json_data.get('latency_percentile', 95))
+
+        for key in ['position_venues', 'order_venues']:
+            setattr(instance, key, json_data.get(key, {}))
+
+        return instance
+
+    @property
+    def primary(self) -> Exchange:
+        return self.venues[self.primary_venue]
+
+    @property
+    def pair_registry(self):
+        return self.primary.pair_registry
+
+    def get_quote(self, pair):
+        return self.primary.get_quote(pair)
+
+    def get_latency_tracker(self, venue: str) -> LatencyTracker:
+        if getattr(self, '_latency_trackers', None) is None:
+            self._latency_trackers = {}
+
+        if venue not in self._latency_trackers:
+            self._latency_trackers[venue] = LatencyTracker(self.latency_percentile, min_samples=5, initial_deadline_in_sec=self.latency_budget_in_sec)
+
+        return self._latency_trackers[venue]
+
+    def venue_pair(self, venue: str, pair: str) -> str:
+        return self.pair_map.get(venue, {}).get(pair, pair)
+
+    def warm_up(self):
+        for venue in self.venues.values():
+            venue.warm_up()
+
+    def close(self):
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+        for venue in self.venues.values():
+            venue.close()
+
+    def call(self, method: str, args: tuple, kwargs: dict):
+        return getattr(self.primary, method)(*args, **kwargs)
+
+    def _timed_quote(self, venue: str, pair: str) -> dict:
+        started_at = time.monotonic()
+        quote = self.venues[venue].get_quote(self.venue_pair(venue, pair))
+        self.get_latency_tracker(venue).record(time.monotonic() - started_at)
+        return quote
+
+    def get_quotes(self, pair: str) -> dict:
+        """Quotes pair on every venue within the latency budget concurrently. Returns {venue: quote} for the venues that answered in time."""
+        if getattr(self, '_executor', None) is None:
+            self._executor = ThreadPoolExecutor(max_workers=len(self.venues), thread_name_prefix=self.classname)
+
+        venues = [venue for venue in self.venues.keys() if self.get_latency_tracker(venue).deadline() <= self.latency_budget_in_sec]
+
+        # Slow venues are still quoted without waiting, so their latency is measured again once they recover
+        for venue in self.venues.keys():
+            if venue not in venues:
+                self._executor.submit(self._timed_quote, venue, pair)
+
+        if len(venues) == 0:
+            # Every venue is slow: fall back to the primary venue rather than not trading
+            return {}
+
+        futures = {venue: self._executor.submit(self._timed_quote, venue, pair) for venue in venues}
+        wait(futures.values(), timeout=self.latency_budget_in_sec)
+
+        quotes = {}
+        for venue, future in futures.items():
+            if not future.done():
+                print(f"{self.classname}: {venue} missed the latency budget of {self.latency_budget_in_sec}s")
+            elif future.exception() is not None:
+                if not isinstance(future.exception(), NotImplementedError):
+                    print(f"{self.classname}: quoting {pair} on {venue} failed: {future.exception()}")
+            else:
+                quotes[venue] = future.result()
+
+        return quotes
+
+    def get_fee_rate(self, pair, maker=False, venue: str = None):
+        venue = venue if venue is not None else self.primary_venue
+
+        try:
+            return self.venues[venue].get_fee_rate(self.venue_pair(venue, pair), maker)
+        except NotImplementedError:
+            return 0.0
+
+    def get_order_venues(self, orders: list) -> list:
+        """Returns the venues that can place every order (add_order arguments without pair)."""
+        return [venue for venue, exchange in self.venues.items() if all(exchange.supports_order(**order) for order in orders)]
+
+    def select_venue(self, type: str, volume: float, pair: str, maker: bool = False, venues: list = None) -> str:
+        """Returns the venue for an order: the best fee-adjusted price among the venues showing volume at the touch, else the best price."""
+        return self.route(type, volume, pair, maker, venues)[0]
+
+    def route(self, type: str, volume: float, pair: str, maker: bool = False, venues: list = None) -> tuple:
+        """
+        Returns (venue, its quote) for an order, choosing among venues (every venue by default) like select_venue.
+        The quote is None when the venue was chosen without quoting. Falls back to the primary venue.
+        """
+        volume = float(volume)
+        venues = list(self.venues.keys()) if venues is None else venues
+
+        if type == 'sell' and self.position_venues.get(pair) in venues:
+            return self.position_venues[pair], None
+
+        quotes = {venue: quote for venue, quote in self.get_quotes(pair).items() if venue in venues}
+
+        if len(quotes) == 0:
+            return self.primary_venue, None
+
+        candidates = []
+        for venue, quote in quotes.items():
+            fee = self.get_fee_rate(pair, maker, venue)
+
+            if type == 'buy':
+                price, size = quote['ask'] * (1 + fee), quote['ask_volume']
+            else:
+                # Lower is better, so sells rank by the negated net price
+                price, size = -quote['bid'] * (1 - fee), quote['bid_volume']
+
+            candidates.append((size < volume, price, venue))
+
+        # Venues with enough size first, then by fee-adjusted price
+        venue = min(candidates)[2]
+        return venue, quotes[venue]
+
+    def price_for_venue(self, order: dict, venue: str, quote: dict) -> dict:
+        """Returns order with a post-only limit price from the primary venue's book moved to the touch of venue, where it is placed."""
+        if venue == self.primary_venue or quote is None or order.get('ordertype') != 'limit' or 'post' not in order.get('oflags', ''):
+            return order
+
+        return {**order, 'price': str(quote['bid'] if order['type'] == 'buy' else quote['ask'])}
+
+    def add_order(self, ordertype, type, volume, pair, **kwargs):
+        order = {'ordertype': ordertype, 'type': type, 'volume': volume, **kwargs}
+        venue, quote = self.route(type, volume, pair, maker='post' in kwargs.get('oflags', ''), venues=self.get_order_venues([order]))
+        order = self.price_for_venue(order, venue, quote)
+        print(f"{self.classname}: routing {type} {volume} {pair} to {venue}")
+
+        response = self.venues[venue].add_order(pair=self.venue_pair(venue, pair), **order)
+
+        for txid in response.get('result', {}).get('txid', []):
+            self.order_venues[txid] = venue
+
+        if type == 'buy':
+            self.position_venues[pair] = venue
+
+        return response
+
+    def to_batch_order(self, **order):
+        # The venue is only known once the group is routed, so orders are formatted by add_order_batch
+        return order
+
+    def add_order_batch(self, orders, pair, **kwargs):
+        """Routes the group by its first order and places every order on that venue, as one batch where the venue supports it."""
+        venue, quote = self.route(orders[0]['type'], orders[0]['volume'], pair, maker='post' in orders[0].get('oflags', ''), venues=self.get_order_venues(orders))
+        orders = [self.price_for_venue(orders[0], venue, quote)] + orders[1:]
+        exchange = self.venues[venue]
+        venue_pair = self.venue_pair(venue, pair)
+        print(f"{self.classname}: routing order group of {len(orders)} on {pair} to {venue}")
+
+        try:
+            batch = [exchange.to_batch_order(**order) for order in orders]
+        except NotImplementedError:
+            batch = None
+
+        if batch is not None:
+            response = exchange.add_order_batch(batch, venue_pair, **kwargs)
+        else:
+            # Sequentially, stopping at the first order without a txid like Bot.place_order_group
+            results = []
+            for order in orders:
+                try:
+                    results.append(exchange.add_order(pair=venue_pair, **order).get('result', {}))
+                except Exception as e:
+                    if len(results) == 0:
+                        raise e
+
+                    # The orders before are placed: report the failure with them, so a retry does not place them again
+                    results.append({'error': f"{e.__class__.__name__}: {e}"})
+
+                if len(results[-1].get('txid', [])) == 0:
+                    break
+
+            response = {'error': [], 'result': {'orders': results}}
+
+        for result in response.get('result', {}).get('orders', []):
+            txids = result.get('txid', [])
+            for txid in txids if isinstance(txids, list) else [txids]:
+                self.order_venues[txid] = venue
+
+        if orders[0]['type'] == 'buy':
+            self.position_venues[pair] = venue
+
+        return response
+
+    def get_order_venue(self, txid) -> Exchange:
+        return self.venues[self.order_venues.get(txid, self.primary_venue)]
+
+    def cancel_order(self, txid, *args, **kwargs):
+        return self.get_order_venue(txid).cancel_order(txid, *args, **kwargs)
+
+    def cancel_order_batch(self, orders):
+        venues = {self.order_venues.get(txid, self.primary_venue) for txid in orders}
+
+        if len(venues) > 1:
+            raise NotImplementedError("Orders on several venues are cancelled one at a time.")
+
+        return self.venues[venues.pop()].cancel_order_batch(orders)
+
+    def edit_order(self, txid, *args, **kwargs):
+        return self.get_order_venue(txid).edit_order(txid, *args, **kwargs)
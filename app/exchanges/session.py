@@ -0,0 +1,20 @@
+import requests
+from requests.adapters import HTTPAdapter
+from constants import DEFAULT_POOL_SIZE
+
+def create_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+    Returns a requests.Session backed by a keep-alive connection pool.
+
+    The pool holds up to pool_size connections per host, so repeated calls reuse an open
+    TCP+TLS connection instead of paying the handshake each time. The session is safe to
+    share across threads; when every connection is busy a thread waits for one to be
+    returned to the pool rather than opening a throwaway connection.
+    """
+    assert pool_size >= 1
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
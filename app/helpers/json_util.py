@@ -1,9 +1,23 @@
 import json
 from constants import CLASS_NAMES
 
+# orjson parses large payloads (e.g. 720 OHLC rows) several times faster than the standard library
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def loads(data):
+    """Parses JSON from bytes or str, with orjson if it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+
+    return json.loads(data)
+
 class CustomEncoder(json.JSONEncoder):
     def default(self, obj):
         for class_name in CLASS_NAMES:
             if hasattr(obj, '__class__') and obj.__class__.__name__ == class_name:
-                return vars(obj)
+                # Attributes prefixed with '_' hold runtime-only resources (sessions, locks, threads) and are not exported
+                return {key: value for key, value in vars(obj).items() if not key.startswith('_')}
         return super().default(obj)
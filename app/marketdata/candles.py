@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from app.strategies.ohlc import OHLC
+
+class CandleBatch():
+    """
+    Columnar OHLC candles: time and count are int64 arrays, open/high/low/close/vwap/volume are
+    float64 arrays, all sorted by time.
+
+    The arrays are read-only, so strategies, the bot and the data tools can share one batch (and
+    DataFrames built on it with to_dataframe) without copying. last is the cursor to pass as since
+    to fetch the next candles.
+    """
+    FLOAT_COLUMNS = ['open', 'high', 'low', 'close', 'vwap', 'volume']
+
+    # Column names of the LSTM data files
+    DATAFRAME_COLUMNS = ['UNIX time', 'open', 'high', 'low', 'close', 'vwap', 'volume', 'count']
+
+    def __init__(self, time, open, high, low, close, vwap, volume, count, last: int = 0):
+        self.classname = self.__class__.__name__
+        self.time = self._freeze(time, np.int64)
+        self.open = self._freeze(open, np.float64)
+        self.high = self._freeze(high, np.float64)
+        self.low = self._freeze(low, np.float64)
+        self.close = self._freeze(close, np.float64)
+        self.vwap = self._freeze(vwap, np.float64)
+        self.volume = self._freeze(volume, np.float64)
+        self.count = self._freeze(count, np.int64)
+        self.last = int(last)
+
+    def __repr__(self):
+        return f"{{{self.classname} candles: {len(self)}, first: {self.time[0] if len(self) > 0 else None}, last: {self.last}}}"
+
+    def __len__(self):
+        return len(self.time)
+
+    @classmethod
+    def empty(cls):
+        return cls(*[[] for _ in range(8)])
+
+    @classmethod
+    def from_kraken_rows(cls, rows: list, last: int = 0):
+        """Parses Kraken OHLC rows ([time, "open", "high", "low", "close", "vwap", "volume", count]) in one vectorized pass."""
+        if len(rows) == 0:
+            return cls.empty()
+
+        # One fixed-width string array, converted column-wise by NumPy instead of a float() per value
+        table = np.array(rows, dtype=str)
+        prices = table[:, 1:7].astype(np.float64)
+
+        return cls(table[:, 0].astype(np.int64), *prices.T, table[:, 7].astype(np.int64), last=last)
+
+    @classmethod
+    def from_kraken_response(cls, response: dict):
+        """Parses a KrakenExchange.get_ohlc_data response."""
+        result = response['result']
+
+        for key, rows in result.items():
+            if key != 'last':
+                return cls.from_kraken_rows(rows, result.get('last', 0))
+
+        return cls.empty()
+
+    @classmethod
+    def from_binance_klines(cls, rows: list):
+        """
+        Parses Binance klines ([openTime ms, open, high, low, close, volume, closeTime, quoteVolume, trades, ...]).
+
+        The vwap is quoteVolume / volume (the close for candles without volume).
+        """
+        if len(rows) == 0:
+            return cls.empty()
+
+        table = np.array([row[:9] for row in rows], dtype=str)
+        values = table[:, [1, 2, 3, 4, 5, 7]].astype(np.float64)
+        volume = values[:, 4]
+        quote_volume = values[:, 5]
+        vwap = np.divide(quote_volume, volume, out=values[:, 3].copy(), where=volume > 0)
+        time = table[:, 0].astype(np.int64) // 1000
+
+        return cls(time, values[:, 0], values[:, 1], values[:, 2], values[:, 3], vwap, volume, table[:, 8].astype(np.int64), last=time[-1])
+
+    def merge(self, other):
+        """Returns the candles of both batches sorted by time. Where both have a candle, the one of other (the newer fetch) is kept."""
+        columns = {name: np.concatenate([getattr(self, name), getattr(other, name)]) for name in ['time', 'count'] + self.FLOAT_COLUMNS}
+
+        # np.unique keeps the first occurrence, so search the reversed arrays to keep the latest
+        _, reversed_index = np.unique(columns['time'][::-1], return_index=True)
+        index = len(columns['time']) - 1 - reversed_index
+
+        return CandleBatch(
+            columns['time'][index], columns['open'][index], columns['high'][index], columns['low'][index],
+            columns['close'][index], columns['vwap'][index], columns['volume'][index], columns['count'][index],
+            last=max(self.last, other.last)
+        )
+
+    def slice(self, start: int, stop: int = None):
+        """Returns the candles from index start up to stop, sharing memory with this batch."""
+        return CandleBatch(*[getattr(self, name)[start:stop] for name in ['time'] + self.FLOAT_COLUMNS + ['count']], last=self.last)
+
+    def tail(self, count: int):
+        """Returns the last count candles, sharing memory with this batch."""
+        return self.slice(max(0, len(self) - count))
+
+    def row(self, i: int) -> OHLC:
+        return OHLC([int(self.time[i]), self.open[i], self.high[i], self.low[i], self.close[i], self.vwap[i], self.volume[i], int(self.count[i])])
+
+    def latest(self) -> OHLC:
+        """Returns the most recent (possibly not yet closed) candle."""
+        return self.row(-1)
+
+    def to_rows(self) -> list:
+        """Returns Kraken-style rows, e.g. for exporting to JSON."""
+        columns = [self.time] + [getattr(self, name) for name in self.FLOAT_COLUMNS] + [self.count]
+        return [list(row) for row in zip(*[column.tolist() for column in columns])]
+
+    def to_dataframe(self):
+        """Returns a pandas DataFrame with the columns of the LSTM data files, backed by this batch's arrays where pandas allows it."""
+        columns = [self.time] + [getattr(self, name) for name in self.FLOAT_COLUMNS] + [self.count]
+        return pd.DataFrame(dict(zip(self.DATAFRAME_COLUMNS, columns)), copy=False)
+
+    @staticmethod
+    def _freeze(values, dtype) -> np.ndarray:
+        # A read-only view: shared with every reader, never modified in place
+        array = np.asarray(values, dtype=dtype).view()
+        array.flags.writeable = False
+        return array
@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from app.marketdata.candles import CandleBatch
+from app.marketdata.orderbook import OrderBook
+
+class MarketDataBus():
+    """
+    The latest candles, ticker and order book of each pair, in a block of shared memory that
+    one publisher writes and processes on the same host read (e.g. the shards of a
+    ShardedSupervisor and the API).
+
+    Every pair has a fixed slot: up to max_candles candles, the bid/ask/last ticker and depth
+    levels of each side of the book. A publish overwrites the slot, so a slow reader gets the
+    latest value rather than a backlog, and readers never parse or fetch anything.
+
+    Slots are guarded by a sequence number (a seqlock): the publisher makes it odd while it
+    writes and even again when done. A reader copies the slot with one memcpy and keeps the
+    copy if the number was even and unchanged around it, otherwise it reads again. Views into
+    the slot itself could be overwritten while in use, hence the copy.
+
+    It is a market data source like MarketSnapshotService: get_latest_ohlc and get_latest_ticker
+    return None for pairs without data published within max_age_in_sec.
+    """
+    HEADER_DTYPE = np.dtype([('capacity', np.int64), ('max_candles', np.int64), ('depth', np.int64), ('used', np.int64)])
+    MAX_PAIR_LENGTH = 16
+    MAX_READ_ATTEMPTS = 1000
+
+    def __init__(self, capacity: int = 64, max_candles: int = 720, depth: int = 10, max_age_in_sec: float = 15, name: str = None):
+        self.classname = self.__class__.__name__
+        self.max_age_in_sec = max_age_in_sec
+        self.publish_count = 0
+        self.read_retries = 0
+        self.pairs = set()
+        self._slot_indices = {}
+        self._write_lock = threading.Lock()
+
+        if name is None:
+            assert capacity > 0 and max_candles > 0 and depth > 0
+            size = self.HEADER_DTYPE.itemsize + capacity * self.get_slot_dtype(max_candles, depth).itemsize
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            # Only the creating process unlinks the memory, not the processes forked from it
+            self._owner_pid = os.getpid()
+            header = np.ndarray((1,), self.HEADER_DTYPE, buffer=self._shm.buf)
+            header[0] = (capacity, max_candles, depth, 0)
+        else:
+            self._shm = self._attach(name)
+            self._owner_pid = None
+            header = np.ndarray((1,), self.HEADER_DTYPE, buffer=self._shm.buf)
+
+        self.name = self._shm.name
+        self.capacity = int(header['capacity'][0])
+        self.max_candles = int(header['max_candles'][0])
+        self.depth = int(header['depth'][0])
+        self._header = header
+        self._slots = np.ndarray((self.capacity,), self.get_slot_dtype(self.max_candles, self.depth), buffer=self._shm.buf, offset=self.HEADER_DTYPE.itemsize)
+
+    def __repr__(self):
+        return f"{{{self.classname} name: {self.name}, capacity: {self.capacity}, max_candles: {self.max_candles}, depth: {self.depth}, used: {self.get_used()}, publish_count: {self.publish_count}, read_retries: {self.read_retries}}}"
+
+    @classmethod
+    def attach(cls, name: str, max_age_in_sec: float = 15):
+        """Opens the bus another process created under name."""
+        return cls(max_age_in_sec=max_age_in_sec, name=name)
+
+    @staticmethod
+    def _attach(name: str):
+        try:
+            # Python 3.13+: a reader does not register the memory, so it is not unlinked when the reader exits
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before, attaching registers it with the resource tracker, which unlinks it once its processes exit.
+            # Processes started by the creator share the creator's tracker and registration; others start a
+            # tracker of their own, whose registration is withdrawn.
+            shares_tracker = getattr(resource_tracker._resource_tracker, '_fd', None) is not None
+            shm = shared_memory.SharedMemory(name=name)
+
+            if not shares_tracker:
+                resource_tracker.unregister(shm._name, 'shared_memory')
+
+            return shm
+
+    @classmethod
+    def get_slot_dtype(cls, max_candles: int, depth: int) -> np.dtype:
+        return np.dtype([
+            ('seq', np.uint64),
+            ('pair', f'U{cls.MAX_PAIR_LENGTH}'),
+            ('ticker_at', np.float64),
+            ('bid', np.float64),
+            ('ask', np.float64),
+            ('last', np.float64),
+            ('candles_at', np.float64),
+            ('candle_count', np.int64),
+            ('candle_last', np.int64),
+            # Rows: time, open, high, low, close, vwap, volume, count
+            ('candles', np.float64, (8, max_candles)),
+            ('book_at', np.float64),
+            ('bid_levels', np.int64),
+            ('ask_levels', np.int64),
+            # Levels of [price, volume], best first
+            ('bids', np.float64, (depth, 2)),
+            ('asks', np.float64, (depth, 2)),
+        ], align=True)
+
+    def get_used(self) -> int:
+        return int(self._header['used'][0])
+
+    def _get_slot_index(self, pair: str, create: bool = False):
+        index = self._slot_indices.get(pair)
+
+        if index is not None:
+            return index
+
+        matches = np.flatnonzero(self._slots['pair'][:self.get_used()] == pair)
+
+        if len(matches) > 0:
+            index = int(matches[0])
+        elif create:
+            assert len(pair) <= self.MAX_PAIR_LENGTH
+            index = self.get_used()
+
+            if index >= self.capacity:
+                raise ValueError(f"{self.classname} has no slot left for {pair} (capacity: {self.capacity})")
+
+            self._slots['pair'][index] = pair
+            self._header['used'][0] = index + 1
+        else:
+            return None
+
+        self._slot_indices[pair] = index
+        return index
+
+    def publish(self, pair: str, candles: CandleBatch = None, ticker: dict = None, book: OrderBook = None, published_at: float = None):
+        """Writes the given candles, ticker ({'bid', 'ask', 'last'}) and order book of pair, leaving the others as they were."""
+        published_at = published_at if published_at is not None else time.time()
+
+        with self._write_lock:
+            index = self._get_slot_index(pair, create=True)
+            slot = self._slots[index:index + 1]
+            seq = self._slots['seq']
+            seq[index] += 1
+
+            try:
+                if candles is not None:
+                    candles = candles.tail(self.max_candles)
+                    columns = [candles.time] + [getattr(candles, name) for name in CandleBatch.FLOAT_COLUMNS] + [candles.count]
+                    slot['candles'][0, :, :len(candles)] = np.array(columns, dtype=np.float64).reshape(8, len(candles))
+                    slot['candle_count'] = len(candles)
+                    slot['candle_last'] = candles.last
+                    slot['candles_at'] = published_at
+
+                if ticker is not None:
+                    slot['bid'] = ticker['bid']
+                    slot['ask'] = ticker['ask']
+                    slot['last'] = ticker['last']
+                    slot['ticker_at'] = published_at
+
+                if book is not None:
+                    for side, levels in [('bids', book.bids), ('asks', book.asks)]:
+                        count = min(len(levels), self.depth)
+                        slot[side][0, :count, 0] = levels.prices[:count]
+                        slot[side][0, :count, 1] = levels.volumes[:count]
+                        slot[side[:3] + '_levels'] = count
+
+                    slot['book_at'] = book.updated_at or published_at
+            finally:
+                seq[index] += 1
+
+            self.publish_count += 1
+
+    def publish_snapshot(self, snapshot, pair_keys: dict):
+        """Publishes the candles and ticker of the pairs in pair_keys ({pair: Kraken pair key}) from a MarketSnapshot."""
+        for pair, pair_key in pair_keys.items():
+            ticker = snapshot.get_ticker(pair_key)
+
+            if ticker is not None:
+                ticker = {'bid': float(ticker['b'][0]), 'ask': float(ticker['a'][0]), 'last': float(ticker['c'][0])}
+
+            candles = snapshot.get_candles(pair_key)
+
+            if ticker is not None or candles is not None:
+                self.publish(pair, candles, ticker, published_at=snapshot.time)
+
+    def attach_snapshot_service(self, service):
+        """Publishes every refresh of a MarketSnapshotService."""
+        service.add_refresh_listener(lambda snapshot: self.publish_snapshot(snapshot, dict(service.pair_keys)))
+
+    def attach_feed(self, feed):
+        """Publishes the tickers and order books of a KrakenMarketDataFeed as they arrive."""
+        def on_market_data(channel, pair, data):
+            if channel == 'ticker':
+                self.publish(pair, ticker=data, book=feed.get_order_book(pair))
+
+        feed.add_listener(on_market_data)
+
+    def read(self, pair: str):
+        """Returns a consistent copy of the slot of pair (a NumPy record), or None if nothing was published for it."""
+        index = self._get_slot_index(pair)
+
+        if index is None:
+            return None
+
+        seq = self._slots['seq']
+
+        for _ in range(self.MAX_READ_ATTEMPTS):
+            before = int(seq[index])
+
+            if before % 2 == 0:
+                record = self._slots[index].copy()
+
+                if int(seq[index]) == before:
+                    return record
+
+            self.read_retries += 1
+            time.sleep(0)
+
+        raise TimeoutError(f"{self.classname}: no consistent read of {pair} after {self.MAX_READ_ATTEMPTS} attempts")
+
+    def is_live(self, published_at: float) -> bool:
+        return time.time() - published_at <= self.max_age_in_sec
+
+    def subscribe(self, pair: str):
+        """Records the pairs the process reads. The publisher decides what is published."""
+        self.pairs.add(pair)
+
+    def unsubscribe(self, pair: str):
+        self.pairs.discard(pair)
+
+    def get_candles(self, pair: str) -> CandleBatch:
+        """Returns the published candles of pair, or None if there are no fresh ones."""
+        record = self.read(pair)
+
+        if record is None or record['candle_count'] == 0 or not self.is_live(record['candles_at']):
+            return None
+
+        count = int(record['candle_count'])
+        return CandleBatch(*record['candles'][:, :count], last=int(record['candle_last']))
+
+    def get_latest_ohlc(self, pair: str):
+        """Returns the latest (possibly not yet closed) candle of pair, or None if there are no fresh candles."""
+        candles = self.get_candles(pair)
+        return candles.latest() if candles is not None else None
+
+    def get_latest_ticker(self, pair: str):
+        """Returns {'bid', 'ask', 'last'} of pair, or None if there is no fresh ticker."""
+        record = self.read(pair)
+
+        if record is None or record['ticker_at'] == 0 or not self.is_live(record['ticker_at']):
+            return None
+
+        return {'bid': float(record['bid']), 'ask': float(record['ask']), 'last': float(record['last'])}
+
+    def get_order_book(self, pair: str):
+        """Returns the published order book of pair, or None if there is no fresh one."""
+        record = self.read(pair)
+
+        if record is None or record['book_at'] == 0 or not self.is_live(record['book_at']):
+            return None
+
+        book = OrderBook(pair, self.depth)
+        book.load_snapshot(record['bids'][:int(record['bid_levels'])].tolist(), record['asks'][:int(record['ask_levels'])].tolist(), float(record['book_at']))
+        return book
+
+    def close(self):
+        """Detaches from the shared memory, which the creating process also frees."""
+        # The memory cannot be closed while NumPy views of it exist
+        self._header = None
+        self._slots = None
+        self._shm.close()
+
+        if self._owner_pid == os.getpid():
+            self._shm.unlink()
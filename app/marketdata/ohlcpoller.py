@@ -0,0 +1,159 @@
+import threading
+import numpy as np
+from app.marketdata.candles import CandleBatch
+
+class CandleRing():
+    """
+    Fixed-capacity ring buffer of closed candles, stored in preallocated NumPy columns.
+
+    Appending never reallocates: once full, each new candle overwrites the oldest one.
+    """
+    COLUMNS = ['time'] + CandleBatch.FLOAT_COLUMNS + ['count']
+
+    def __init__(self, capacity: int = 720):
+        assert capacity >= 1
+
+        self.capacity = capacity
+        self.columns = {name: np.empty(capacity, dtype=np.int64 if name in ['time', 'count'] else np.float64) for name in self.COLUMNS}
+        self.start = 0
+        self.size = 0
+
+    def __repr__(self):
+        return f"{{CandleRing capacity: {self.capacity}, size: {self.size}, latest_time: {self.latest_time()}}}"
+
+    def __len__(self):
+        return self.size
+
+    def latest_time(self):
+        if self.size == 0:
+            return None
+
+        return int(self.columns['time'][(self.start + self.size - 1) % self.capacity])
+
+    def extend(self, batch: CandleBatch):
+        """Appends the candles of batch (sorted by time) that are newer than the latest one. A candle with the latest time replaces it."""
+        latest_time = self.latest_time()
+        first = 0
+
+        if latest_time is not None:
+            first = int(np.searchsorted(batch.time, latest_time, side='left'))
+
+            if first < len(batch) and batch.time[first] == latest_time:
+                # Kraken can still revise the most recently closed candle
+                position = (self.start + self.size - 1) % self.capacity
+                for name in self.COLUMNS:
+                    self.columns[name][position] = getattr(batch, name)[first]
+                first += 1
+
+        # Only the newest capacity candles can be kept
+        first = max(first, len(batch) - self.capacity)
+        count = len(batch) - first
+
+        if count <= 0:
+            return
+
+        positions = (self.start + self.size + np.arange(count)) % self.capacity
+        for name in self.COLUMNS:
+            self.columns[name][positions] = getattr(batch, name)[first:]
+
+        overflow = max(0, self.size + count - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.size = min(self.capacity, self.size + count)
+
+    def latest(self):
+        """Returns the newest candle as an OHLC, or None if the ring is empty."""
+        if self.size == 0:
+            return None
+
+        position = (self.start + self.size - 1) % self.capacity
+        return CandleBatch(*[self.columns[name][position:position + 1] for name in self.COLUMNS]).latest()
+
+    def to_batch(self, last: int = 0) -> CandleBatch:
+        """Returns a copy of the candles, oldest first."""
+        positions = (self.start + np.arange(self.size)) % self.capacity
+        return CandleBatch(*[self.columns[name][positions] for name in self.COLUMNS], last=last)
+
+class OHLCPoller():
+    """
+    Polls Kraken OHLC candles incrementally.
+
+    The first poll of a pair fetches its full history (up to 720 candles). Later polls pass the
+    'last' cursor of the previous response as since, so Kraken only returns the candles closed
+    since then and the in-progress one. Closed candles go into a CandleRing of capacity candles
+    per pair; the in-progress candle is kept apart and replaced by every poll until it closes.
+
+    Pairs are polled independently and may be polled from several threads at once.
+    """
+    def __init__(self, exchange, interval: int = 1, capacity: int = 720):
+        self.classname = self.__class__.__name__
+        self.exchange = exchange
+        self.interval = interval
+        self.capacity = capacity
+        self.rows_fetched = 0
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{{{self.classname} interval: {self.interval}, capacity: {self.capacity}, pairs: {list(self._states.keys())}, rows_fetched: {self.rows_fetched}}}"
+
+    def _get_state(self, pair: str) -> dict:
+        with self._lock:
+            if pair not in self._states:
+                self._states[pair] = {'ring': CandleRing(self.capacity), 'last': 0, 'current': None, 'lock': threading.Lock()}
+
+            return self._states[pair]
+
+    def get_cursor(self, pair: str) -> int:
+        """The since to pass for the next poll of pair (0 before the first poll)."""
+        return self._get_state(pair)['last']
+
+    def poll(self, pair: str) -> CandleBatch:
+        """Fetches the candles of pair since the cursor and merges them. Returns the fetched candles."""
+        state = self._get_state(pair)
+        batch = self.exchange.get_ohlc_batch(pair, self.interval, state['last'])
+
+        with self._lock:
+            self.rows_fetched += len(batch)
+
+        with state['lock']:
+            # last is the time of the newest closed candle, so later rows are still in progress
+            if batch.last > 0:
+                split = int(np.searchsorted(batch.time, batch.last, side='right'))
+            else:
+                split = max(0, len(batch) - 1)
+
+            state['ring'].extend(batch.slice(0, split))
+
+            if split < len(batch):
+                state['current'] = batch.slice(len(batch) - 1)
+            elif state['current'] is not None and state['current'].time[0] <= batch.last:
+                # The in-progress candle closed and no new one has started yet
+                state['current'] = None
+
+            state['last'] = max(state['last'], batch.last)
+
+        return batch
+
+    def get_candles(self, pair: str) -> CandleBatch:
+        """Returns the closed candles of pair followed by the in-progress one, without fetching."""
+        state = self._get_state(pair)
+
+        with state['lock']:
+            closed = state['ring'].to_batch(state['last'])
+            current = state['current']
+
+        if current is None:
+            return closed
+
+        return closed.merge(current)
+
+    def get_latest_ohlc(self, pair: str):
+        """Polls pair and returns its latest (possibly not yet closed) candle, or None if it has none."""
+        self.poll(pair)
+        state = self._get_state(pair)
+
+        with state['lock']:
+            if state['current'] is not None:
+                return state['current'].latest()
+
+            return state['ring'].latest()
@@ -0,0 +1,238 @@
+import zlib
+import numpy as np
+
+class BookSide():
+    """
+    One side of an order book, kept as sorted NumPy arrays ordered from the best price outward.
+
+    Bids are stored under their negated price so both sides sort ascending and binary searches
+    (np.searchsorted) work the same way. Cumulative volume and notional are rebuilt lazily after
+    the side changes, so liquidity queries are O(log n).
+    """
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self.sign = -1.0 if is_bid else 1.0
+        self.keys = np.empty(0, dtype=np.float64)
+        self.volumes = np.empty(0, dtype=np.float64)
+        self._cum_volumes = None
+        self._cum_notionals = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def prices(self) -> np.ndarray:
+        return self.keys * self.sign
+
+    def load(self, levels: list):
+        """Replaces the side with levels, a list of (price, volume) pairs in any order."""
+        levels = [(float(price), float(volume)) for price, volume in levels if float(volume) > 0]
+        keys = np.array([price * self.sign for price, _ in levels], dtype=np.float64)
+        volumes = np.array([volume for _, volume in levels], dtype=np.float64)
+        order = np.argsort(keys, kind='stable')
+
+        self.keys = keys[order]
+        self.volumes = volumes[order]
+        self._cum_volumes = None
+
+    def update(self, price: float, volume: float):
+        """Sets the volume at price. A volume of 0 removes the level."""
+        key = price * self.sign
+        i = int(np.searchsorted(self.keys, key))
+        exists = i < len(self.keys) and self.keys[i] == key
+
+        if volume > 0:
+            if exists:
+                self.volumes[i] = volume
+            else:
+                self.keys = np.insert(self.keys, i, key)
+                self.volumes = np.insert(self.volumes, i, volume)
+        elif exists:
+            self.keys = np.delete(self.keys, i)
+            self.volumes = np.delete(self.volumes, i)
+
+        self._cum_volumes = None
+
+    def truncate(self, depth: int):
+        """Drops the levels beyond depth, which the exchange stops reporting updates for."""
+        if len(self.keys) > depth:
+            self.keys = self.keys[:depth]
+            self.volumes = self.volumes[:depth]
+            self._cum_volumes = None
+
+    def best(self):
+        """Returns (price, volume) of the best level, or None if the side is empty."""
+        if len(self.keys) == 0:
+            return None
+
+        return float(self.keys[0] * self.sign), float(self.volumes[0])
+
+    def volume_at(self, price: float) -> float:
+        key = price * self.sign
+        i = int(np.searchsorted(self.keys, key))
+
+        if i < len(self.keys) and self.keys[i] == key:
+            return float(self.volumes[i])
+
+        return 0.0
+
+    def volume_through(self, price: float) -> float:
+        """Total volume at price and every better level."""
+        count = int(np.searchsorted(self.keys, price * self.sign, side='right'))
+
+        if count == 0:
+            return 0.0
+
+        return float(self._cumulative()[0][count - 1])
+
+    def vwap(self, size: float):
+        """Returns (average price, worst price) of taking size from this side, or None if the side holds less than size."""
+        cum_volumes, cum_notionals = self._cumulative()
+
+        if size <= 0 or len(cum_volumes) == 0 or cum_volumes[-1] < size:
+            return None
+
+        # First level at which the cumulative volume covers size
+        i = int(np.searchsorted(cum_volumes, size))
+        price = float(self.keys[i] * self.sign)
+        filled_volume = cum_volumes[i - 1] if i > 0 else 0.0
+        filled_notional = cum_notionals[i - 1] if i > 0 else 0.0
+
+        return float((filled_notional + (size - filled_volume) * price) / size), price
+
+    def copy(self):
+        side = BookSide(self.is_bid)
+        side.keys = self.keys.copy()
+        side.volumes = self.volumes.copy()
+        return side
+
+    def _cumulative(self):
+        if self._cum_volumes is None:
+            self._cum_volumes = np.cumsum(self.volumes)
+            self._cum_notionals = np.cumsum(self.volumes * self.prices)
+
+        return self._cum_volumes, self._cum_notionals
+
+class OrderBook():
+    """
+    Local L2 order book of one pair, seeded from a snapshot (REST /public/Depth or the WebSocket
+    book snapshot) and kept current by applying book updates.
+
+    Kraken publishes a CRC32 checksum of the top 10 levels with every update. verify_checksum
+    compares it against the local book; on a mismatch the book is marked invalid until it is
+    seeded again. Prices and volumes are formatted with price_decimals and volume_decimals for
+    the checksum, matching the precision of the WebSocket feed.
+    """
+    def __init__(self, pair: str, depth: int = 10, price_decimals: int = 1, volume_decimals: int = 8):
+        self.classname = self.__class__.__name__
+        self.pair = pair
+        self.depth = depth
+        self.price_decimals = price_decimals
+        self.volume_decimals = volume_decimals
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.is_valid = False
+        self.updated_at = 0
+
+    def __repr__(self):
+        return f"{{{self.classname} pair: {self.pair}, best_bid: {self.best_bid()}, best_ask: {self.best_ask()}, levels: {len(self.bids)}/{len(self.asks)}, is_valid: {self.is_valid}}}"
+
+    def load_snapshot(self, bids: list, asks: list, timestamp: float = None):
+        """Replaces the book. bids and asks are lists of [price, volume, ...] as sent by Kraken."""
+        self.bids.load([level[:2] for level in bids])
+        self.asks.load([level[:2] for level in asks])
+        self.bids.truncate(self.depth)
+        self.asks.truncate(self.depth)
+        self.is_valid = True
+        self.updated_at = timestamp if timestamp is not None else self._latest_timestamp(bids + asks)
+
+    def copy(self):
+        """Returns an independent copy, e.g. for readers on another thread than the one applying updates."""
+        book = OrderBook(self.pair, self.depth, self.price_decimals, self.volume_decimals)
+        book.bids = self.bids.copy()
+        book.asks = self.asks.copy()
+        book.is_valid = self.is_valid
+        book.updated_at = self.updated_at
+        return book
+
+    def load_depth(self, depth_response: dict):
+        """Seeds the book from a KrakenExchange.get_order_book response."""
+        book = next(iter(depth_response['result'].values()))
+        self.load_snapshot(book['bids'], book['asks'])
+
+    def apply(self, bids: list = None, asks: list = None):
+        """Applies book updates, lists of [price, volume, timestamp, ...]. A volume of 0 removes the level."""
+        for level in bids or []:
+            self.bids.update(float(level[0]), float(level[1]))
+
+        for level in asks or []:
+            self.asks.update(float(level[0]), float(level[1]))
+
+        self.bids.truncate(self.depth)
+        self.asks.truncate(self.depth)
+        self.updated_at = max(self.updated_at, self._latest_timestamp((bids or []) + (asks or [])))
+
+    def checksum(self) -> int:
+        """CRC32 of the top 10 asks then the top 10 bids, each as price and volume without the decimal point and leading zeros."""
+        # https://docs.kraken.com/websockets/#book-checksum
+        text = ''
+
+        for side in [self.asks, self.bids]:
+            for price, volume in zip(side.prices[:10], side.volumes[:10]):
+                text += self._checksum_text(price, self.price_decimals) + self._checksum_text(volume, self.volume_decimals)
+
+        return zlib.crc32(text.encode())
+
+    def verify_checksum(self, checksum) -> bool:
+        """Marks the book invalid if it does not match the exchange's checksum."""
+        self.is_valid = self.checksum() == int(checksum)
+        return self.is_valid
+
+    def best_bid(self):
+        """Returns (price, volume) of the best bid, or None."""
+        return self.bids.best()
+
+    def best_ask(self):
+        """Returns (price, volume) of the best ask, or None."""
+        return self.asks.best()
+
+    def mid_price(self):
+        best_bid, best_ask = self.best_bid(), self.best_ask()
+
+        if best_bid is None or best_ask is None:
+            return None
+
+        return (best_bid[0] + best_ask[0]) / 2
+
+    def spread(self):
+        best_bid, best_ask = self.best_bid(), self.best_ask()
+
+        if best_bid is None or best_ask is None:
+            return None
+
+        return best_ask[0] - best_bid[0]
+
+    def volume_at_price(self, side: str, price: float) -> float:
+        """Volume resting at exactly price on side ('bids' or 'asks')."""
+        return self._side(side).volume_at(price)
+
+    def volume_through_price(self, side: str, price: float) -> float:
+        """Volume resting on side ('bids' or 'asks') at price or better."""
+        return self._side(side).volume_through(price)
+
+    def vwap(self, type: str, size: float):
+        """Returns (average price, worst price) of a market order of type 'buy' or 'sell' for size, or None if the book is too thin."""
+        return (self.asks if type == 'buy' else self.bids).vwap(size)
+
+    def _side(self, side: str) -> BookSide:
+        assert side in ['bids', 'asks']
+        return self.bids if side == 'bids' else self.asks
+
+    @staticmethod
+    def _checksum_text(value: float, decimals: int) -> str:
+        return f"{value:.{decimals}f}".replace('.', '').lstrip('0')
+
+    @staticmethod
+    def _latest_timestamp(levels: list) -> float:
+        timestamps = [float(level[2]) for level in levels if len(level) > 2]
+        return max(timestamps) if len(timestamps) > 0 else 0
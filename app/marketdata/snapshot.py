@@ -0,0 +1,227 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+import numpy as np
+from app.marketdata.candles import CandleBatch
+from app.marketdata.ohlcpoller import OHLCPoller
+from app.shared import get_shared
+
+class MarketSnapshot():
+    """
+    Immutable view of the market taken at one refresh of a MarketSnapshotService.
+
+    Holds the Kraken ticker of every pair and the candles of the subscribed pairs, keyed by the
+    pair's Kraken key (e.g. 'XXBTZUSD'). The tickers are also kept as read-only columns (pair, bid,
+    ask, last, open, volume and vwap over 24 hours), so the whole pair universe can be scanned with
+    a few vectorized operations.
+    """
+    # Ticker fields and the index of the value used: a/b/c are [price, ...], v/p are [today, last 24 hours]
+    TICKER_COLUMNS = {'ask': ('a', 0), 'bid': ('b', 0), 'last': ('c', 0), 'open': ('o', None), 'volume': ('v', 1), 'vwap': ('p', 1)}
+
+    def __init__(self, tickers: dict, candles: dict, time: float):
+        self.classname = self.__class__.__name__
+        self.time = time
+        self.tickers = MappingProxyType(dict(tickers))
+        self.candles = MappingProxyType(dict(candles))
+
+        self.pairs = np.array(list(self.tickers.keys()), dtype=str)
+
+        for column, (field, index) in self.TICKER_COLUMNS.items():
+            values = np.array([ticker[field] if index is None else ticker[field][index] for ticker in self.tickers.values()], dtype=str)
+            values = values.astype(np.float64) if len(values) > 0 else np.empty(0, dtype=np.float64)
+            values.flags.writeable = False
+            setattr(self, column, values)
+
+        self.pairs.flags.writeable = False
+
+    def __repr__(self):
+        return f"{{{self.classname} time: {self.time}, tickers: {len(self.tickers)}, candles: {len(self.candles)}}}"
+
+    def get_ticker(self, pair_key: str):
+        return self.tickers.get(pair_key)
+
+    def get_candles(self, pair_key: str) -> CandleBatch:
+        return self.candles.get(pair_key)
+
+    def get_latest_ohlc(self, pair_key: str):
+        candles = self.candles.get(pair_key)
+
+        if candles is None or len(candles) == 0:
+            return None
+
+        return candles.latest()
+
+    def scan(self, min_quote_volume: float = 0, max_spread_pct: float = None, sort_by: str = 'quote_volume', top: int = None) -> list:
+        """
+        Returns the keys of the pairs with at least min_quote_volume traded over 24 hours (in the quote
+        currency) and a bid-ask spread of at most max_spread_pct percent, best first by sort_by
+        ('quote_volume', 'change' over the day or 'spread').
+        """
+        assert sort_by in ['quote_volume', 'change', 'spread']
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            quote_volume = self.volume * self.vwap
+            mid = (self.ask + self.bid) / 2
+            spread_pct = np.where(mid > 0, (self.ask - self.bid) * 100 / mid, np.inf)
+            change_pct = np.where(self.open > 0, (self.last / self.open - 1) * 100, 0)
+
+        mask = quote_volume >= min_quote_volume
+
+        if max_spread_pct is not None:
+            mask &= spread_pct <= max_spread_pct
+
+        # Spreads rank best when smallest, the other metrics when largest
+        score = {'quote_volume': -quote_volume, 'change': -change_pct, 'spread': spread_pct}[sort_by]
+        indices = np.flatnonzero(mask)
+        indices = indices[np.argsort(score[indices], kind='stable')]
+
+        if top is not None:
+            indices = indices[:top]
+
+        return self.pairs[indices].tolist()
+
+class MarketSnapshotService():
+    """
+    Refreshes the market data of every subscribed pair in bulk and publishes it as MarketSnapshots.
+
+    Each refresh makes one /public/Ticker request for all pairs, and polls the OHLC candles of
+    the subscribed pairs concurrently (incrementally, see OHLCPoller). The new snapshot replaces the old one in a single assignment,
+    so readers on any thread always see a complete, unchanging snapshot without locking.
+
+    One service per exchange and interval is shared by every bot (see shared), so a bot subscribes
+    its pair and hands the service to Bot.set_market_data instead of polling on its own. Like
+    KrakenMarketDataFeed, get_latest_ohlc returns None when the snapshot is older than max_age_in_sec,
+    in which case the bot falls back to REST. Listeners added with add_refresh_listener(callback)
+    are called as callback(snapshot) after every refresh (e.g. to publish it on a MarketDataBus).
+    """
+    def __init__(self, exchange, interval: int = 1, refresh_interval_in_sec: float = 5, max_age_in_sec: float = None, max_workers: int = None):
+        assert refresh_interval_in_sec > 0
+
+        self.classname = self.__class__.__name__
+        self.exchange = exchange
+        self.interval = interval
+        self.refresh_interval_in_sec = refresh_interval_in_sec
+        self.max_age_in_sec = max_age_in_sec if max_age_in_sec is not None else 3 * refresh_interval_in_sec
+        self.pair_keys = {}
+        self.refresh_count = 0
+        self._snapshot = MarketSnapshot({}, {}, 0)
+        self._refresh_listeners = []
+        self._ohlc_poller = OHLCPoller(exchange, interval)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or getattr(exchange, 'pool_size', 4), thread_name_prefix=self.classname)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return f"{{{self.classname} interval: {self.interval}, refresh_interval_in_sec: {self.refresh_interval_in_sec}, pairs: {list(self.pair_keys.keys())}, snapshot: {self._snapshot}}}"
+
+    @classmethod
+    def shared(cls, exchange, interval: int = 1, **kwargs):
+        """Returns the service every bot on this exchange and interval uses, creating it the first time."""
+        return get_shared((exchange.classname, getattr(exchange, 'api_base_url', ''), cls.__name__, interval), lambda: cls(exchange, interval, **kwargs))
+
+    @property
+    def snapshot(self) -> MarketSnapshot:
+        return self._snapshot
+
+    def add_refresh_listener(self, callback):
+        self._refresh_listeners.append(callback)
+
+    def subscribe(self, pair: str):
+        """Adds pair to the pairs whose candles are refreshed."""
+        pair_key = self.exchange.pair_registry.get(pair).key
+
+        with self._lock:
+            self.pair_keys[pair] = pair_key
+
+    def unsubscribe(self, pair: str):
+        with self._lock:
+            self.pair_keys.pop(pair, None)
+
+    def refresh(self) -> MarketSnapshot:
+        """Fetches the tickers of all pairs and the candles of the subscribed pairs, then publishes them as the new snapshot."""
+        with self._lock:
+            pair_keys = dict(self.pair_keys)
+
+        fetched_at = time.time()
+        poll_futures = {pair: self._executor.submit(self._ohlc_poller.poll, pair) for pair in pair_keys.keys()}
+        tickers = self.exchange.get_ticker_info()['result']
+
+        candles = {}
+        for pair, future in poll_futures.items():
+            pair_key = pair_keys[pair]
+
+            try:
+                future.result()
+                candles[pair_key] = self._ohlc_poller.get_candles(pair)
+            except Exception as e:
+                # The pair is left out of the snapshot, so its bots fall back to REST rather than trade on old candles
+                print(f"{self.classname}: OHLC refresh for {pair_key} failed: {e}")
+
+        self._snapshot = MarketSnapshot(tickers, candles, fetched_at)
+        self.refresh_count += 1
+
+        for callback in self._refresh_listeners:
+            try:
+                callback(self._snapshot)
+            except Exception as e:
+                print(f"{self.classname}: refresh listener error: {e}")
+
+        return self._snapshot
+
+    def start(self):
+        """Refreshes in a background thread every refresh_interval_in_sec until stop is called."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.classname, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+        if self._thread is not None:
+            self._thread.join(timeout=self.refresh_interval_in_sec + 1)
+            self._thread = None
+
+        self._executor.shutdown(wait=False)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            started_at = time.monotonic()
+
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"{self.classname}: refresh failed: {e}")
+
+            # Keep to the schedule however long the refresh took
+            self._stop_event.wait(max(0, self.refresh_interval_in_sec - (time.monotonic() - started_at)))
+
+    def is_live(self, snapshot: MarketSnapshot = None) -> bool:
+        """True if the snapshot (the current one by default) is no older than max_age_in_sec."""
+        snapshot = snapshot if snapshot is not None else self._snapshot
+        return time.time() - snapshot.time <= self.max_age_in_sec
+
+    def get_latest_ohlc(self, pair: str):
+        """Returns the latest (possibly not yet closed) candle of pair, or None if the snapshot has no fresh data for it."""
+        pair_key = self.pair_keys.get(pair)
+        snapshot = self._snapshot
+
+        if pair_key is None or not self.is_live(snapshot):
+            return None
+
+        return snapshot.get_latest_ohlc(pair_key)
+
+    def get_latest_ticker(self, pair: str):
+        """Returns {'bid', 'ask', 'last'} of pair, or None if the snapshot has no fresh data for it."""
+        pair_key = self.pair_keys.get(pair)
+        snapshot = self._snapshot
+
+        if pair_key is None or not self.is_live(snapshot) or pair_key not in snapshot.tickers:
+            return None
+
+        ticker = snapshot.tickers[pair_key]
+        return {'bid': float(ticker['b'][0]), 'ask': float(ticker['a'][0]), 'last': float(ticker['c'][0])}
@@ -0,0 +1,197 @@
+import threading
+import numpy as np
+from app.marketdata.candles import CandleBatch
+
+class TradeRing():
+    """
+    Fixed-capacity ring buffer of trades, stored in preallocated NumPy columns.
+
+    time is the UNIX time in seconds (float64), side is 1 for buys and -1 for sells, and trade_id
+    is Kraken's trade ID (-1 where the response has none). Once full, each new trade overwrites
+    the oldest one.
+    """
+    COLUMNS = {'time': np.float64, 'price': np.float64, 'volume': np.float64, 'side': np.int8, 'trade_id': np.int64}
+
+    def __init__(self, capacity: int = 100000):
+        assert capacity >= 1
+
+        self.capacity = capacity
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        self.start = 0
+        self.size = 0
+
+    def __repr__(self):
+        return f"{{TradeRing capacity: {self.capacity}, size: {self.size}}}"
+
+    def __len__(self):
+        return self.size
+
+    def latest(self, name: str):
+        """The newest value of column name, or None if the ring is empty."""
+        if self.size == 0:
+            return None
+
+        return self.columns[name][(self.start + self.size - 1) % self.capacity].item()
+
+    def extend(self, trades: dict):
+        """Appends trades, a dict of equally long column arrays sorted by time."""
+        count = len(trades['time'])
+        first = max(0, count - self.capacity)
+        count -= first
+
+        if count <= 0:
+            return
+
+        positions = (self.start + self.size + np.arange(count)) % self.capacity
+        for name in self.COLUMNS.keys():
+            self.columns[name][positions] = trades[name][first:]
+
+        overflow = max(0, self.size + count - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.size = min(self.capacity, self.size + count)
+
+    def to_columns(self) -> dict:
+        """Returns a copy of the columns, oldest trade first."""
+        positions = (self.start + np.arange(self.size)) % self.capacity
+        return {name: column[positions] for name, column in self.columns.items()}
+
+class TradeTape():
+    """
+    Follows Kraken's public trade feed of one pair (/public/Trades) and builds candles from it locally.
+
+    Every poll passes the 'last' cursor of the previous response as since, so each trade is
+    transferred once. Trades are kept in a TradeRing of capacity trades, from which candles() builds
+    OHLCV/VWAP/count bars of any whole number of seconds, sub-minute ones included. The last bar is
+    the one in progress, so it is as fresh as the last poll rather than Kraken's OHLC endpoint.
+
+    backfill(since) pages through the trade history, so candles are not limited to the 720 that
+    /public/OHLC returns.
+    """
+    def __init__(self, exchange, pair: str, capacity: int = 100000, interval_in_sec: int = 60):
+        self.classname = self.__class__.__name__
+        self.exchange = exchange
+        self.pair = pair
+        self.interval_in_sec = interval_in_sec
+        self.last = 0
+        self.trades_fetched = 0
+        self._ring = TradeRing(capacity)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{{{self.classname} pair: {self.pair}, trades: {len(self._ring)}, last: {self.last}}}"
+
+    def __len__(self):
+        return len(self._ring)
+
+    @staticmethod
+    def parse_trades(rows: list) -> dict:
+        """Parses Kraken trade rows ([price, volume, time, side, ordertype, misc, trade_id]) into column arrays in one pass."""
+        if len(rows) == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in TradeRing.COLUMNS.items()}
+
+        table = np.array([row[:4] for row in rows], dtype=str)
+        trade_ids = [row[6] if len(row) > 6 else -1 for row in rows]
+
+        return {
+            'time': table[:, 2].astype(np.float64),
+            'price': table[:, 0].astype(np.float64),
+            'volume': table[:, 1].astype(np.float64),
+            'side': np.where(table[:, 3] == 'b', 1, -1).astype(np.int8),
+            'trade_id': np.array(trade_ids, dtype=np.int64),
+        }
+
+    def poll(self) -> int:
+        """Fetches the trades since the cursor and appends them. Returns the number of new trades."""
+        response = self.exchange.get_recent_trades(self.pair, since=self.last)
+        result = response['result']
+        rows = next((value for key, value in result.items() if key != 'last'), [])
+        trades = self.parse_trades(rows)
+
+        with self._lock:
+            # Guard against overlapping pages: only trades after the newest one held are new
+            latest_id = self._ring.latest('trade_id')
+            latest_time = self._ring.latest('time')
+
+            if latest_id is not None and latest_id >= 0 and len(trades['trade_id']) > 0 and trades['trade_id'][0] >= 0:
+                keep = trades['trade_id'] > latest_id
+            elif latest_time is not None:
+                keep = trades['time'] > latest_time
+            else:
+                keep = np.ones(len(trades['time']), dtype=bool)
+
+            trades = {name: column[keep] for name, column in trades.items()}
+            self._ring.extend(trades)
+            self.trades_fetched += len(trades['time'])
+            self.last = result.get('last', self.last)
+
+        return len(trades['time'])
+
+    def backfill(self, since, max_pages: int = 100) -> int:
+        """Pages through the trades from since (a UNIX time in seconds or a Kraken cursor) until caught up. Returns the number of trades added."""
+        with self._lock:
+            if len(self._ring) == 0:
+                self.last = since
+
+        added = 0
+        for _ in range(max_pages):
+            count = self.poll()
+            added += count
+
+            # A full page means there are more trades to fetch
+            if count < 1000:
+                break
+
+        return added
+
+    def candles(self, interval_in_sec: int = None, since: float = 0) -> CandleBatch:
+        """
+        Builds candles of interval_in_sec seconds (the tape's interval by default) from the trades
+        since the given UNIX time. The last candle is the one in progress; last is the time of the
+        newest closed candle, as in Kraken's OHLC responses.
+        """
+        interval_in_sec = int(interval_in_sec or self.interval_in_sec)
+        assert interval_in_sec >= 1
+
+        with self._lock:
+            trades = self._ring.to_columns()
+
+        if since > 0:
+            first = int(np.searchsorted(trades['time'], since, side='left'))
+            trades = {name: column[first:] for name, column in trades.items()}
+
+        if len(trades['time']) == 0:
+            return CandleBatch.empty()
+
+        buckets = (trades['time'] // interval_in_sec).astype(np.int64) * interval_in_sec
+
+        # Trades are sorted by time, so each bucket is one run of trades starting at starts[i]
+        times, starts = np.unique(buckets, return_index=True)
+        ends = np.append(starts[1:], len(buckets)) - 1
+        price = trades['price']
+        volume = trades['volume']
+
+        volumes = np.add.reduceat(volume, starts)
+        notionals = np.add.reduceat(price * volume, starts)
+        vwap = np.divide(notionals, volumes, out=price[ends].copy(), where=volumes > 0)
+        last = int(times[-2]) if len(times) > 1 else 0
+
+        return CandleBatch(
+            times, price[starts], np.maximum.reduceat(price, starts), np.minimum.reduceat(price, starts), price[ends],
+            vwap, volumes, ends - starts + 1, last=last
+        )
+
+    def get_latest_ohlc(self, pair: str):
+        """Polls the tape and returns the candle in progress, or None if pair is not this tape's pair or there are no trades."""
+        if pair != self.pair:
+            return None
+
+        self.poll()
+
+        with self._lock:
+            latest_time = self._ring.latest('time')
+
+        if latest_time is None:
+            return None
+
+        # Only the trades of the newest bar are needed
+        return self.candles(since=latest_time // self.interval_in_sec * self.interval_in_sec).latest()
@@ -26,6 +26,9 @@ class Position:
         self.take_profit = take_profit
         self.risk_reward_ratio = risk_reward_ratio
         self.chance_of_success = chance_of_success
+
+        # Quantity confirmed by actual fills (see PositionManager.apply_fill)
+        self.filled_quantity = 0.0
     
     def __repr__(self):
         return f"{{{self.classname} ticker: {self.ticker}, side: {self.side}, entry price: {self.entry_price}, quantity: {self.quantity}, status: {self.status}, stop loss: {self.stop_loss}, take profit: {self.take_profit}}}"
@@ -101,6 +104,22 @@ class PositionManager:
         self.position = None
         return pnl
 
+    def apply_fill(self, price: float, volume: float):
+        """
+        Apply an actual entry fill to the open position.
+
+        The entry price becomes the volume-weighted average of the fills received so far, replacing
+        the price that was assumed when the position was opened.
+        """
+        if self.position is None:
+            return
+
+        filled_quantity = self.position.filled_quantity + volume
+        filled_cost = self.position.entry_price * self.position.filled_quantity + price * volume
+
+        self.position.entry_price = filled_cost / filled_quantity
+        self.position.filled_quantity = filled_quantity
+
     def calculate_pnl(self, current_price: float) -> float:
         """Unrealized PnL"""
         if self.position is None:
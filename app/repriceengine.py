@@ -0,0 +1,139 @@
+import threading
+import time
+
+class RestingOrder():
+    """A post-only limit order resting on the book, as tracked by RepriceEngine."""
+    def __init__(self, txid: str, pair: str, side: str, price: float, volume: float):
+        self.classname = self.__class__.__name__
+        assert side in ['buy', 'sell']
+
+        self.txid = txid
+        self.pair = pair
+        self.side = side
+        self.price = float(price)
+        self.volume = volume
+        self.original_price = float(price)
+        self.amend_count = 0
+        self.amended_at = time.monotonic()
+
+    def __repr__(self):
+        return f"{{{self.classname} txid: {self.txid}, pair: {self.pair}, side: {self.side}, price: {self.price}, original price: {self.original_price}, amend count: {self.amend_count}}}"
+
+class RepriceEngine():
+    """
+    Keeps resting post-only orders at the touch by amending them in place with edit_order.
+
+    A buy is repriced to the best bid once the bid has moved more than tolerance_pct above it, a
+    sell to the best ask once the ask has moved more than tolerance_pct below it. If the touch moves
+    through an order instead, it is about to fill and is left alone. An order is not chased more
+    than max_chase_pct from its original price, nor amended more than once every
+    min_interval_in_sec.
+
+    Amends are throttled against the exchange's rate-limit budget: with a KrakenRateLimiter, an
+    order is only amended while the pair's trading counter keeps at least reserve of headroom after
+    the edit penalty, so entries, exits and cancels are never starved by repricing.
+    """
+    def __init__(self, exchange, tolerance_pct: float = 0.001, max_chase_pct: float = 0.01, min_interval_in_sec: float = 5, reserve: float = 10):
+        assert tolerance_pct >= 0
+        assert max_chase_pct >= 0
+        assert min_interval_in_sec >= 0
+
+        self.classname = self.__class__.__name__
+        self.exchange = exchange
+        self.tolerance_pct = tolerance_pct
+        self.max_chase_pct = max_chase_pct
+        self.min_interval_in_sec = min_interval_in_sec
+        self.reserve = reserve
+        self.amend_count = 0
+        self.throttled_count = 0
+        self.orders = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{{{self.classname} orders: {list(self.orders.keys())}, tolerance pct: {self.tolerance_pct}, amend count: {self.amend_count}, throttled count: {self.throttled_count}}}"
+
+    def __len__(self):
+        return len(self.orders)
+
+    def track(self, txid: str, pair: str, side: str, price: float, volume: float):
+        with self._lock:
+            self.orders[txid] = RestingOrder(txid, pair, side, price, volume)
+
+    def forget(self, txid: str):
+        with self._lock:
+            self.orders.pop(txid, None)
+
+    def get_target_price(self, order: RestingOrder, best_bid: float, best_ask: float):
+        """Returns the price order should be amended to, or None if it should stay where it is."""
+        if order.side == 'buy':
+            if best_bid is None or best_bid <= order.price * (1 + self.tolerance_pct):
+                return None
+
+            target = best_bid
+            within_chase = target <= order.original_price * (1 + self.max_chase_pct)
+        else:
+            if best_ask is None or best_ask >= order.price * (1 - self.tolerance_pct):
+                return None
+
+            target = best_ask
+            within_chase = target >= order.original_price * (1 - self.max_chase_pct)
+
+        if not within_chase:
+            return None
+
+        return target
+
+    def has_budget(self, order: RestingOrder) -> bool:
+        rate_limiter = getattr(self.exchange, 'rate_limiter', None)
+
+        if rate_limiter is None or not hasattr(rate_limiter, 'edit_cost'):
+            # Other exchanges only block in edit_order until their budget allows the call
+            return True
+
+        return rate_limiter.trading_available(order.pair) - rate_limiter.edit_cost(order.txid) >= self.reserve
+
+    def reprice(self, pair: str, best_bid: float, best_ask: float) -> dict:
+        """
+        Amends the orders of pair that the touch has moved away from. Returns {old txid: new txid}
+        of the amended orders; the txid is unchanged where the exchange keeps it.
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            orders = [order for order in self.orders.values() if order.pair == pair and now - order.amended_at >= self.min_interval_in_sec]
+
+        amended = {}
+        for order in orders:
+            target = self.get_target_price(order, best_bid, best_ask)
+
+            if target is None:
+                continue
+
+            if not self.has_budget(order):
+                self.throttled_count += 1
+                continue
+
+            try:
+                response = self.exchange.edit_order(order.txid, order.pair, price=str(target), oflags='post')
+            except Exception as e:
+                # Filled, cancelled or not editable: stop tracking it
+                print(f"{self.classname}: amending {order.txid} to {target} failed, no longer repricing it: {e}")
+                self.forget(order.txid)
+                continue
+
+            old_txid = order.txid
+            new_txid = response.get('result', {}).get('txid') or old_txid
+            print(f"{self.classname}: amended {order.side} {old_txid} from {order.price} to {target}" + (f", now {new_txid}" if new_txid != old_txid else ""))
+
+            with self._lock:
+                self.orders.pop(old_txid, None)
+                order.txid = new_txid
+                order.price = float(target)
+                order.amend_count += 1
+                order.amended_at = time.monotonic()
+                self.orders[new_txid] = order
+                self.amend_count += 1
+
+            amended[old_txid] = new_txid
+
+        return amended
@@ -0,0 +1,20 @@
+import threading
+
+# Objects shared process-wide by key: rate limiters per API key (or per IP for public endpoints),
+# circuits, clocks, nonce counters, snapshot services, models, ...
+# Reentrant because factories may create shared objects of their own.
+_registry = {}
+_registry_lock = threading.RLock()
+
+def get_shared(key, factory):
+    """Returns the object registered under key, creating it with factory() the first time."""
+    with _registry_lock:
+        if key not in _registry:
+            _registry[key] = factory()
+
+        return _registry[key]
+
+def clear_shared():
+    """Forgets every shared object, so the next get_shared creates them anew (e.g. between tests)."""
+    with _registry_lock:
+        _registry.clear()
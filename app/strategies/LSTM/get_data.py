@@ -5,50 +5,46 @@ from app.strategies.LSTM.clean_data import remove_duplicates_and_sort
 from app.strategies.LSTM.model_constants import SINCE, INTERVAL
 from config import ExchangeConfig, CoinMarketCapAPIConfig
 import time
-import json
 import requests
+import urllib.parse
+from app.exchanges.ratelimiter import BinanceRateLimiter
+from app.marketdata.candles import CandleBatch
+from app.helpers.json_util import loads
 from typing import Optional, Dict, Any, List
 
-def fetch_data(pair, interval, since, filename):
+def fetch_candles(pair, interval, since, exchange=None) -> CandleBatch:
+    """Fetches Kraken OHLC candles of pair from since until now into one CandleBatch, sorted and free of duplicates."""
     # Kraken OHLC API's settings
     # intervals is in minutes
     intervals = [1, 5, 15, 30, 60, 240, 1440, 10080, 21600]
-    max_data_points_per_response = 720
 
     assert interval in intervals
 
+    if exchange is None:
+        exchange = KrakenExchange(ExchangeConfig())
+
     current_time = since
     end_time = int(time.time())
 
-    exchange_config = ExchangeConfig()
-    kraken_exchange = KrakenExchange(exchange_config)
-
-    data = {}
+    # The exchange paces its requests with its rate limiter, so no fixed pauses are needed
+    candles = CandleBatch.empty()
     while current_time <= end_time:
-        time.sleep(5)
-        response = kraken_exchange.get_ohlc_data(
-            pair=pair,
-            interval=interval,
-            since=current_time
-        )
+        batch = exchange.get_ohlc_batch(pair, interval=interval, since=current_time)
 
-        if data.get(0, None) != None:
-            assert data[0].get("result", None) != None, "Error occured in response"
+        # Newer rows win, e.g. the not-yet-committed last frame of the previous response
+        candles = candles.merge(batch)
 
-            for key, val in data[0]["result"].items():
-                if key != "last":
-                    # key is pair
-                    for i in range(len(response["result"][key])):
-                        data[0]["result"][key] += [response["result"][key][i]]
-        else:
-            data[0] = response
-
-        try:
-            current_time = response['result'][pair][-2][0]
-        except:
+        # Kraken returns at most 720 candles, ending with the current frame: continue from the last committed one
+        if len(batch) < 2 or batch.time[-2] <= current_time:
             break
-        time.sleep(5)
-    export_data_to_json(data[0], filename)
+
+        current_time = int(batch.time[-2])
+
+    return candles
+
+def fetch_data(pair, interval, since, filename):
+    candles = fetch_candles(pair, interval, since)
+    export_data_to_json({"error": [], "result": {pair: candles.to_rows(), "last": candles.last}}, filename)
 
 
 def fetch_historical_data_http(
@@ -104,15 +100,20 @@ def fetch_historical_data_http(
     all_rows: List[list] = []
     current_start = start_time_ms
 
+    # Pace requests by the provider's request weight instead of fixed pauses
+    base_url_parts = urllib.parse.urlsplit(base_url)
+    rate_limiter = BinanceRateLimiter(f"{base_url_parts.scheme}://{base_url_parts.netloc}")
+
     request_num = 1
     while True:
         if current_start is not None:
             params["startTime"] = current_start
 
         print(f"Fetching Historical Data: Request #{request_num}")
+        rate_limiter.acquire_endpoint(base_url_parts.path)
         response = requests.get(base_url, params=params, timeout=10)
         response.raise_for_status()
-        batch = response.json()
+        batch = loads(response.content)
 
         # Expecting a list of klines; break if nothing returned
         if not isinstance(batch, list) or len(batch) == 0:
@@ -131,8 +132,6 @@ def fetch_historical_data_http(
             break
 
         current_start = next_start
-        # Be gentle to the remote API
-        time.sleep(0.2)
         request_num += 1
 
     # Persist raw rows as JSON for later processing
@@ -178,7 +177,6 @@ def fetch_fear_and_greed_data(start: int = -1, filename: str = 'fear_and_greed_d
             
             # Set start to the next position after the last fetched record
             current_start += api_limit
-            time.sleep(2)  # Rate limiting between API calls
         
         # Create response object with all collected data
         combined_response = {
@@ -237,40 +235,14 @@ def clean_training_data(
 
     try:
         with open(raw_path, "r") as f:
-            raw_rows = json.load(f)
+            raw_rows = loads(f.read())
     except Exception as e:
         print(f"Error loading raw training data from {raw_path}: {e}")
         raise e
 
-    cleaned_rows: List[list] = []
-    for row in raw_rows:
-        if not isinstance(row, list) or len(row) < 6:
-            continue
-
-        open_time = int(row[0]) // 1000  # convert ms → seconds
-        open_price = float(row[1])
-        high = float(row[2])
-        low = float(row[3])
-        close = float(row[4])
-        volume = float(row[5])
-        count = int(row[8]) if len(row) > 8 else 0
-
-        # Simple vwap approximation using OHLC
-        # TODO: Improve
-        vwap = (open_price + high + low + close) / 4.0
-
-        cleaned_rows.append(
-            [
-                open_time,
-                open_price,
-                high,
-                low,
-                close,
-                vwap,
-                volume,
-                count,
-            ]
-        )
+    # Binance sends 12 columns per kline, see the docstring
+    candles = CandleBatch.from_binance_klines([row for row in raw_rows if isinstance(row, list) and len(row) >= 9])
+    cleaned_rows = candles.to_rows()
 
     cleaned_payload = {
         "result": {
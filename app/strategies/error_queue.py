@@ -1,4 +1,5 @@
 import time
+from collections import deque
 
 class ErrorQueueLimitExceededError(Exception):
     def __init__(self, message):
@@ -14,15 +15,15 @@ class ErrorQueue():
         assert type(limit) == int
         assert limit > 0
         
-        self.queue = []
+        self.queue = deque()
         self.latency = latency
         self.limit = limit
     
     def __repr__(self):
-        return '{queue: ' + repr(self.queue) + ', latency: ' + str(self.latency) + ', limit: ' + str(self.limit) + '}'
+        return '{queue: ' + repr(list(self.queue)) + ', latency: ' + str(self.latency) + ', limit: ' + str(self.limit) + '}'
     
     def __str__(self):
-        return repr(self.queue)
+        return repr(list(self.queue))
     
     def __len__(self):
         return len(self.queue)
@@ -32,17 +33,9 @@ class ErrorQueue():
         # Get the current time
         current_time = time.time()
         
-        # Find the index for the first error to keep
-        remove_before = 0
-        for i in range(len(self.queue)):
-            if current_time - self.queue[i] >= self.latency:
-                remove_before = i+1
-            else:
-                break
-        
-        # Update the queue if any errors are to be dropped
-        if remove_before != 0:
-            self.queue = self.queue[remove_before:]
+        # Errors are appended in time order, so the expired ones are at the front
+        while len(self.queue) > 0 and current_time - self.queue[0] >= self.latency:
+            self.queue.popleft()
     
     def append(self, time: float):
         if not self.is_full():
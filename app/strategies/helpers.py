@@ -1,4 +1,5 @@
 import math
+from functools import lru_cache
 
 def round_down_to_cents(value):
     """
@@ -14,6 +15,7 @@ def round_down_to_cents(value):
     else:
         return math.floor(value * 100)/100.0
 
+@lru_cache(maxsize=None)
 def get_precision(text):
     """
     Returns the number of decimal places the number has
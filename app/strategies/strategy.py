@@ -7,13 +7,17 @@ import inspect
 import time
 from constants import CLASS_NAMES
 import pandas as pd
-from app.strategies.LSTM.get_data import fetch_data
-from app.strategies.LSTM.json_helper import export_json_to_csv
-from app.strategies.LSTM.clean_data import remove_duplicates_and_sort
+from app.strategies.LSTM.get_data import fetch_candles
+from app.marketdata.ohlcpoller import OHLCPoller
+from app.shared import get_shared
 from sklearn.preprocessing import StandardScaler
 from app.strategies.LSTM.train_model import calculate_rsi
 import numpy as np
 
+def load_shared_model(model_uuid: str):
+    """Loads an LSTM model once per process: every strategy using the same model shares it."""
+    return get_shared(('LSTMModel', model_uuid), lambda: load_model(f'app/strategies/LSTM/models/model_{model_uuid}.h5'))
+
 class Strategy():
     # TODO: Finish implementing (along with StrategyConfig in config.py)
     def __init__(self):
@@ -35,6 +39,31 @@ class Strategy():
         """Override to reload non-serialized state (e.g. Keras model). No-op by default."""
         raise NotImplementedError
     
+    def set_market_data(self, market_data) -> None:
+        """Attach a streaming market data source implementing get_latest_ohlc(pair)."""
+        self._market_data = market_data
+
+    def get_signal_interval_in_sec(self):
+        """Length of the candles the signal is computed from, if it only changes when one closes. None to generate it on every tick."""
+        return None
+
+    def get_signal_data_fetchers(self) -> dict:
+        """
+        The independent requests generate_signal makes, as {name: function}, so the bot can send them alongside its
+        own (see Bot.prefetch). Their results are handed back with set_signal_data. None by default.
+        """
+        return {}
+
+    def set_signal_data(self, signal_data: dict) -> None:
+        """Hands the next generate_signal the results of get_signal_data_fetchers by name, along with the bot's 'latest_ohlc'."""
+        self._signal_data = signal_data
+
+    def pop_signal_data(self) -> dict:
+        """Returns the data set for this signal (empty if none was), which later signals fetch again."""
+        signal_data = getattr(self, '_signal_data', None) or {}
+        self._signal_data = None
+        return signal_data
+    
     @classmethod
     def from_json(cls, json_data):
         # Get the parameters of the __init__ method
@@ -104,28 +133,30 @@ class LSTMStrategy(Strategy):
         self.model_metrics = self.get_model_metrics()
     
     def load_model(self):
-        # Load the trained model
         try:
-            self.model = load_model(f'app/strategies/LSTM/models/model_{self.model_uuid}.h5')
+            self.model = load_shared_model(self.model_uuid)
         except FileNotFoundError:
             raise FileNotFoundError(f"Error: Model file not found for UUID {self.model_uuid}")
     
-    def get_prediction_data(self):
-        # TODO: Improve [fetch_data -> export_data_to_json -> remove_duplicates_and_sort] pipeline by removing unnecessary files and optimizing for speed
-        fetch_data(
+    def get_signal_data_fetchers(self) -> dict:
+        # The latest OHLC is the bot's, handed over with the candles
+        return {'candles': self.fetch_prediction_candles}
+
+    def fetch_prediction_candles(self):
+        # Candles are decoded straight into a CandleBatch and framed in memory, without intermediate JSON/CSV files
+        return fetch_candles(
             pair=self.pair,
             interval=int(self.model_metrics['interval']),
             since=self.get_lookback_unix(int(self.model_metrics['interval']) * 60 * 2),
-            filename='prediction_data.json'
+            exchange=self.exchange
         )
 
-        export_json_to_csv('prediction_data.json', 'prediction_data.csv')
-
-        remove_duplicates_and_sort('prediction_data.csv')
+    def get_prediction_data(self, candles=None):
+        if candles is None:
+            candles = self.fetch_prediction_candles()
 
-        # Load in the prediction data
-        # Assumes the dataset has columns 'UNIX time', 'open', 'high', 'low', 'close', 'vwap', 'volume', 'count'
-        data = pd.read_csv('app/strategies/LSTM/data/prediction_data.csv')
+        # Columns 'UNIX time', 'open', 'high', 'low', 'close', 'vwap', 'volume', 'count'
+        data = candles.to_dataframe()
 
         # Calculate volatility for each data point
         # Volatility = (high - low) / close (intrabar volatility)
@@ -156,8 +187,7 @@ class LSTMStrategy(Strategy):
         data.to_csv(f'app/strategies/LSTM/data/model_{self.model_uuid}_prediction_data.csv', index=False)
         print(f"Prediction data saved: app/strategies/LSTM/data/model_{self.model_uuid}_prediction_data.csv")
 
-        prediction_data = pd.read_csv(f'app/strategies/LSTM/data/model_{self.model_uuid}_prediction_data.csv')
-        prediction_data = data # FIX ME
+        prediction_data = data
 
         # Feature scaling
         sc = StandardScaler()
@@ -172,8 +202,8 @@ class LSTMStrategy(Strategy):
 
         return X_prediction, prediction_data
     
-    def get_price_prediction(self):
-        X_prediction, prediction_data = self.get_prediction_data()
+    def get_price_prediction(self, candles=None):
+        X_prediction, prediction_data = self.get_prediction_data(candles)
 
         predictions = self.model.predict(X_prediction)
 
@@ -189,14 +219,20 @@ class LSTMStrategy(Strategy):
         print(f"Price Predictions: {predictions_actual}")
         return predictions_actual
     
+    def get_signal_interval_in_sec(self) -> int:
+        # The model's inputs are interval-minute candles
+        return int(self.model_metrics['interval']) * 60
+    
     def get_lookback_unix(self, buffer_in_seconds: int = 5) -> int:
         # Interval is in minutes
         lookback_seconds = int(self.model_metrics['interval']) * int(self.model_metrics['sequence_length']) * 60 + buffer_in_seconds
         return int(time.time() - lookback_seconds)
     
     def generate_signal(self) -> str:
-        price_predictions = self.get_price_prediction()
-        latest_ohlc = self.get_latest_ohlc()
+        # Data the bot prefetched for this signal, or fetched now
+        signal_data = self.pop_signal_data()
+        price_predictions = self.get_price_prediction(signal_data.get('candles'))
+        latest_ohlc = signal_data.get('latest_ohlc') or self.get_latest_ohlc()
         
         # TODO: Edit buffer
         buffer = 0.0005 # 0.05%
@@ -211,25 +247,16 @@ class LSTMStrategy(Strategy):
     
     def get_latest_ohlc(self):
         """Get latest OHLC data."""
-        # TODO: Add changeable number of attempts and error latency
-        for attempt in range(5):
-            try:
-                ohlc_response = self.exchange.get_ohlc_data(self.pair)
-                break
-            except Exception as e:
-                print(f"Error making API request (attempt {attempt + 1}/{5}): {e}")
-
-                if attempt == 5 - 1:
-                    print(f"Failed to make API request after {5} attempts")
-                    raise e
-                else:
-                    time.sleep(5)
-        
-        ohlc = ohlc_response.get('result')
+        # Prefer the streaming market data source and fall back to REST if it has no fresh data
+        if getattr(self, "_market_data", None) is not None:
+            latest_ohlc = self._market_data.get_latest_ohlc(self.pair)
 
-        for key in ohlc.keys():
-            if key != 'last':
-                self.ohlc_asset_key = key
-                break
+            if latest_ohlc is not None:
+                return latest_ohlc
+        
+        # Only the candles since the previous poll are fetched
+        if getattr(self, "_ohlc_poller", None) is None:
+            self._ohlc_poller = OHLCPoller(self.exchange)
         
-        return OHLC(ohlc[self.ohlc_asset_key][-1])
\ No newline at end of file
+        # TODO: Add changeable number of attempts and error latency
+        return self.exchange.retry_executor('public', max_attempts=5, base_delay_in_sec=5).call(self._ohlc_poller.get_latest_ohlc, self.pair, description='OHLC request')
\ No newline at end of file
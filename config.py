@@ -1,6 +1,7 @@
 from dotenv import dotenv_values
 import inspect
-from constants import CLASS_NAMES
+import json
+from constants import CLASS_NAMES, DEFAULT_POOL_SIZE, DEFAULT_REQUEST_TIMEOUT_IN_SEC, DEFAULT_HEDGE_PERCENTILE
 
 class RequestConfig():
     def __init__(self, filepath='.env'):
@@ -47,6 +48,22 @@ class BotConfig():
         self.max_error_count = int(env_config['MAX_ERROR_COUNT'])
         self.error_latency_in_sec = float(env_config['ERROR_LATENCY_IN_SEC'])
         self.cancel_orders_upon_exit = env_config['CANCEL_ORDERS_UPON_EXIT']
+
+        # Source of market data: 'rest' (polling), 'websocket' (streaming, falls back to REST),
+        # 'snapshot' (bulk refresh shared by every bot on the exchange, falls back to REST) or
+        # 'trades' (candles built locally from the trade feed)
+        self.market_data = (env_config.get('MARKET_DATA') or 'rest').lower()
+
+        # Order entry: 'rest' or 'websocket' (authenticated order socket, falls back to REST)
+        self.order_entry = (env_config.get('ORDER_ENTRY') or 'rest').lower()
+
+        # Runtime: 'sync' (polls every LATENCY_IN_SEC) or 'async' (BotRuntime, woken by market data events)
+        self.runtime = (env_config.get('RUNTIME') or 'sync').lower()
+
+        # Repricing of resting post-only entries (see RepriceEngine): disabled unless a tolerance is set
+        self.reprice_tolerance_pct = float(env_config['REPRICE_TOLERANCE_PCT']) if env_config.get('REPRICE_TOLERANCE_PCT') else None
+        self.reprice_max_chase_pct = float(env_config.get('REPRICE_MAX_CHASE_PCT') or 0.01)
+        self.reprice_min_interval_in_sec = float(env_config.get('REPRICE_MIN_INTERVAL_IN_SEC') or 5)
     
     @classmethod
     def from_json(cls, json_data):
@@ -128,6 +145,30 @@ class ExchangeConfig():
 
         if self.mode is None or self.mode == '':
             self.mode = 'test'
+        
+        # Kraken verification tier of the API key: starter, intermediate or pro (sets the rate limits)
+        self.api_tier = (env_config.get('API_TIER') or 'starter').lower()
+
+        # Connection pool settings (optional)
+        self.pool_size = int(env_config.get('POOL_SIZE') or DEFAULT_POOL_SIZE)
+        self.request_timeout_in_sec = float(env_config.get('REQUEST_TIMEOUT_IN_SEC') or DEFAULT_REQUEST_TIMEOUT_IN_SEC)
+
+        # Worker processes the served bots are sharded across by pair (optional, see ShardedSupervisor).
+        # Shards share the API key, which then needs a nonce window as their requests may arrive out of order.
+        self.shards = int(env_config.get('SHARDS') or 1)
+
+        # Hedged public requests (optional): slow market data requests are sent a second time
+        self.hedge_public_requests = (env_config.get('HEDGE_PUBLIC_REQUESTS') or 'false').lower() == 'true'
+        self.hedge_percentile = float(env_config.get('HEDGE_PERCENTILE') or DEFAULT_HEDGE_PERCENTILE)
+
+        # Smart order routing (optional): further venues orders may be routed to, e.g. 'Coinbase'
+        self.router_venues = [venue.strip() for venue in (env_config.get('ROUTER_VENUES') or '').split(',') if venue.strip() != '']
+        self.router_latency_budget_in_sec = float(env_config.get('ROUTER_LATENCY_BUDGET_IN_SEC') or 1.0)
+        # JSON of the pair names per venue, e.g. {"Coinbase": {"XBTUSD": "BTC-USD"}}
+        self.router_pair_map = json.loads(env_config.get('ROUTER_PAIR_MAP') or '{}')
+        self.coinbase_api_key = env_config.get('COINBASE_API_KEY') or ''
+        self.coinbase_api_sec = env_config.get('COINBASE_API_SEC') or ''
+        self.coinbase_api_passphrase = env_config.get('COINBASE_API_PASSPHRASE') or ''
     
     @classmethod
     def from_json(cls, json_data):
@@ -27,4 +27,14 @@ CLASS_NAMES = [
     'TestStrategy',
     'BinanceExchange',
     'BinanceUSExchange',
-]
\ No newline at end of file
+    'RecordingExchange',
+    'SmartOrderRouter',
+    'ReplayExchange',
+]
+
+# Connection pool defaults used by the exchange clients (see app/exchanges/session.py)
+DEFAULT_POOL_SIZE = 10
+DEFAULT_REQUEST_TIMEOUT_IN_SEC = 10
+
+# Latency percentile after which a hedged public request is sent a second time (see app/exchanges/hedging.py)
+DEFAULT_HEDGE_PERCENTILE = 95
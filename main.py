@@ -1,7 +1,14 @@
 from config import RequestConfig, ExchangeConfig, StrategyConfig, RiskManagerConfig, BotConfig
 from app.exchanges.exchange import KrakenExchange, BinanceExchange, BinanceUSExchange, CoinbaseExchange, RobinhoodCryptoExchange
 from app.exchanges.futuresexchange import KrakenFuturesExchange
+from app.exchanges.router import SmartOrderRouter
+from app.exchanges.krakenwebsocket import KrakenMarketDataFeed, KrakenOrderSocket
+from app.marketdata.snapshot import MarketSnapshotService
+from app.marketdata.tradetape import TradeTape
 from app.bots.bot import Bot
+from app.bots.runtime import BotRuntime
+from app.bots.shardedsupervisor import create_supervisor
+from app import create_app
 from app.enums import RequestType, BotMode, StrategyType, ExchangeType, ExitAction
 from app.riskmanager import RiskManager
 from app.strategies.strategy import Strategy, LSTMStrategy
@@ -35,13 +42,48 @@ if __name__ == '__main__':
         else:
             raise ValueError(f"Exchange name {exchange_config.exchange_name} not found")
         
+        # Route orders across venues when further ones are configured
+        if len(exchange_config.router_venues) > 0:
+            venues = {exchange_config.exchange_name: exchange}
+
+            for venue in exchange_config.router_venues:
+                if venue == 'Coinbase':
+                    venues[venue] = CoinbaseExchange(exchange_config.coinbase_api_key, exchange_config.coinbase_api_sec, exchange_config.coinbase_api_passphrase)
+                else:
+                    raise NotImplementedError(f"Routing orders to {venue} is not implemented")
+            
+            exchange = SmartOrderRouter(venues, exchange_config.router_pair_map, exchange_config.router_latency_budget_in_sec)
+        
         # Set strategy and bot
         if strategy_config.strategy == "LSTM":
             lstm_strategy = LSTMStrategy(strategy_config, exchange)
 
             lstm_bot = Bot(bot_config, exchange, lstm_strategy, risk_manager)
 
-            lstm_bot.run()
+            if bot_config.market_data == 'websocket':
+                market_data_feed = KrakenMarketDataFeed(exchange)
+                market_data_feed.subscribe_book(bot_config.pair)
+                market_data_feed.start()
+                lstm_bot.set_market_data(market_data_feed)
+            elif bot_config.market_data == 'snapshot':
+                snapshot_service = MarketSnapshotService.shared(exchange, refresh_interval_in_sec=bot_config.latency_in_sec)
+                snapshot_service.subscribe(bot_config.pair)
+                snapshot_service.start()
+                lstm_bot.set_market_data(snapshot_service)
+            elif bot_config.market_data == 'trades':
+                trade_tape = TradeTape(exchange, bot_config.pair)
+                trade_tape.poll()
+                lstm_bot.set_market_data(trade_tape)
+
+            if bot_config.order_entry == 'websocket':
+                order_socket = KrakenOrderSocket(exchange)
+                order_socket.start()
+                lstm_bot.set_order_socket(order_socket)
+
+            if bot_config.runtime == 'async':
+                BotRuntime(lstm_bot).run()
+            else:
+                lstm_bot.run()
         else:
             raise ValueError(f"Strategy {strategy_config.strategy} not valid")
     elif request_config.request == "BOT_LOAD":
@@ -52,6 +94,12 @@ if __name__ == '__main__':
 
             # Restart trading
             bot.restart()
+    elif request_config.request == "SERVE":
+        # Serves the API, whose /api/bots endpoints run any number of bots in this process (or in SHARDS processes)
+        app = create_app()
+        # Created before the server starts its threads, as shards are forked
+        app.config['BOT_SUPERVISOR'] = create_supervisor()
+        app.run()
     elif request_config.request == "LSTM_TRAIN":
         train_model()
     elif request_config.request == "LSTM_TRAIN_FETCH":
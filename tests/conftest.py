@@ -0,0 +1,11 @@
+import pytest
+
+from app.shared import clear_shared
+
+
+@pytest.fixture(autouse=True)
+def shared_objects():
+    # Rate limiters, circuits and clocks are process-wide: start every test without those of the others
+    clear_shared()
+    yield
+    clear_shared()
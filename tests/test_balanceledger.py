@@ -0,0 +1,134 @@
+import pytest
+
+from app.balanceledger import BalanceLedger
+from app.bots.bot import Bot
+from app.riskmanager import RiskManager
+from config import BotConfig, RiskManagerConfig
+from tests import test_bot
+
+
+class ExtendedBalances:
+    """Stands in for get_extended_balance, counting the requests."""
+
+    def __init__(self, usd=1000.0, xbt=0.0, usd_hold=0.0):
+        self.calls = 0
+        self.balances = {
+            "ZUSD": {"balance": str(usd), "credit": "0", "credit_used": "0", "hold_trade": str(usd_hold)},
+            "XXBT": {"balance": str(xbt), "hold_trade": "0"},
+        }
+
+    def __call__(self):
+        self.calls += 1
+        return self.balances
+
+
+def test_fills_and_fees_are_applied_locally():
+    fetch = ExtendedBalances(usd_hold=50.0)
+    ledger = BalanceLedger("XXBT", "ZUSD", fetch)
+
+    assert ledger.refresh()
+    assert ledger.get_available("ZUSD") == 950.0
+
+    # A buy holds its cost until it fills or is cancelled
+    ledger.place("OBUY", "buy", 100.0, 4.0)
+    assert ledger.get_available("ZUSD") == 550.0
+
+    ledger.apply_fill({"order_txid": "OBUY", "side": "buy", "price": 99.0, "volume": 1.0, "fee": 0.25})
+    assert ledger.get_balances() == {"ZUSD": pytest.approx(900.75), "XXBT": 1.0}
+    assert ledger.get_available("ZUSD") == pytest.approx(900.75 - 50.0 - 300.0)
+
+    # Amending the rest to 101 holds 3 * 101
+    ledger.replace("OBUY", "OBUY2", 101.0)
+    assert ledger.get_available("ZUSD") == pytest.approx(900.75 - 50.0 - 303.0)
+
+    ledger.cancel("OBUY2")
+    assert ledger.get_available_balances() == {"ZUSD": pytest.approx(850.75), "XXBT": 1.0}
+
+    # A sell holds its volume
+    ledger.place("OSELL", "sell", 110.0, 1.0)
+    assert ledger.get_available("XXBT") == 0.0
+
+    # None of it sent a request
+    assert not ledger.refresh()
+    assert fetch.calls == 1
+
+
+def test_ledger_reconciles_on_schedule_or_when_it_drifts():
+    fetch = ExtendedBalances()
+    ledger = BalanceLedger("XXBT", "ZUSD", fetch, reconcile_interval_in_sec=60)
+    ledger.refresh()
+
+    ledger.reconciled_at -= 61
+    assert ledger.refresh()
+    assert (fetch.calls, ledger.drift_count) == (2, 0)
+
+    # A fill of an order the ledger does not know of, e.g. one placed by hand
+    ledger.apply_fill({"order_txid": "OHAND", "side": "sell", "price": 100.0, "volume": 1.0, "fee": 0.0})
+    assert ledger.get_available("XXBT") == -1.0
+    assert ledger.is_due()
+
+    # The exchange's balances win
+    fetch.balances["XXBT"]["balance"] = "2.0"
+    assert ledger.refresh()
+    assert ledger.drift_count == 1
+    assert ledger.get_available_balances() == {"ZUSD": 1000.0, "XXBT": 2.0}
+
+
+def test_bot_without_keys_sizes_from_its_stated_balance(tmp_path):
+    bot_config = BotConfig("tests/test.env")
+    bot_config.mode = "test"
+    exchange = test_bot.TestExchange(str(tmp_path / "asset_pairs.json"))
+    exchange.api_key = exchange.api_sec = ""
+    risk_manager = RiskManager(RiskManagerConfig("tests/test.env"))
+    risk_manager.peak_balance = 500.0
+    strategy = test_bot.TestStrategy()
+    strategy.set_signal("BUY")
+
+    bot = Bot(bot_config, exchange, strategy, risk_manager)
+    assert bot.account_trade_balances == {"ZUSD": 500.0}
+
+    bot.tick()
+
+    # The entry is assumed to fill at its price, paying the maker fee
+    position = bot.position_manager.position
+    cost = position.entry_price * position.quantity
+    assert bot.get_balance_ledger().get_available("ZUSD") == pytest.approx(500.0 - cost * (1 + bot.fee_maker / 100))
+    assert bot.get_balance_ledger().reconcile_count == 0
+
+
+class FillSocket:
+    """Order socket that only reports fills, like KrakenOrderSocket does for every order of the API key."""
+
+    def __init__(self):
+        self.listeners = []
+
+    def add_fill_listener(self, listener):
+        self.listeners.append(listener)
+
+    def is_connected(self):
+        return False
+
+    def fill(self, **fill):
+        for listener in self.listeners:
+            listener(fill)
+
+
+def test_bot_ledger_ignores_fills_of_other_pairs(tmp_path):
+    bot = test_bot.make_bot(tmp_path)
+    socket = FillSocket()
+    bot.set_order_socket(socket)
+    ledger = bot.get_balance_ledger()
+    ledger.place("OBUY", "buy", 100.0, 1.0)
+    balances = ledger.get_balances()
+
+    # Another bot's fill on another pair of the same account
+    socket.fill(order_txid="OOTHER", pair="ETH/USD", side="buy", price=2000.0, volume=1.0, fee=2.0)
+    assert ledger.get_balances() == balances
+    assert not ledger.is_due()
+
+    # Fills of the bot's own orders and pair are applied
+    socket.fill(order_txid="OBUY", pair="ETH/USD", side="buy", price=100.0, volume=0.5, fee=0.1)
+    socket.fill(order_txid="OMANUAL", pair="MOONUSD", side="sell", price=100.0, volume=0.5, fee=0.1)
+    assert ledger.get_balances()["ZUSD"] == pytest.approx(balances["ZUSD"] - 50.1 + 49.9)
+    assert ledger.fill_count == 2
+    assert [fill["order_txid"] for fill in bot._unapplied_fills] == ["OBUY", "OMANUAL"]
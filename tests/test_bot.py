@@ -1,16 +1,23 @@
+import asyncio
+import time
+
 import pytest
 
 from app.bots.bot import Bot
+from app.bots.runtime import BotRuntime
 from app.riskmanager import RiskManager
 from app.positionmanager import PositionManager
 from app.strategies.strategy import Strategy
 from app.strategies.ohlc import OHLC
 from app.exchanges.exchange import Exchange
+from app.exchanges.replayexchange import RecordingExchange, ReplayExchange
+from app.exchanges.pairregistry import PairRegistry
+from app.marketdata.orderbook import OrderBook
 from config import BotConfig, ExchangeConfig, RiskManagerConfig, StrategyConfig
 
 
 class TestExchange(Exchange):
-    def __init__(self):
+    def __init__(self, pair_cache_path: str = ""):
         # Use non-empty keys so Bot.fetch_balances() is exercised,
         # but all calls stay inside this test class.
         super().__init__()
@@ -19,6 +26,8 @@ class TestExchange(Exchange):
         self.api_sec = "xxxxx"
         self.mode = "test"
         self.add_order_calls = []
+        # Never read or write the pair cache in the source tree
+        self._pair_registry = PairRegistry(self, cache_path=pair_cache_path)
 
     # Minimal surface used by Bot.__init__
     def get_tradable_asset_pairs(self, pair):
@@ -60,7 +69,7 @@ class TestExchange(Exchange):
             }
         }
 
-    def get_ohlc_data(self, pair):
+    def get_ohlc_data(self, pair, interval=1, since=0):
         # Return a single OHLC candle
         return {
             "result": {
@@ -120,14 +129,14 @@ class TestStrategy(Strategy):
         pass
 
 
-def make_bot(signal: str = "HOLD") -> Bot:
+def make_bot(tmp_path, signal: str = "HOLD") -> Bot:
     bot_config = BotConfig("tests/test.env")
     risk_config = RiskManagerConfig("tests/test.env")
 
     # Force test mode to avoid real-trading assertions.
     bot_config.mode = "test"
 
-    exchange = TestExchange()
+    exchange = TestExchange(str(tmp_path / "asset_pairs.json"))
     strategy = TestStrategy()
     strategy.set_signal(signal)
     risk_manager = RiskManager(risk_config)
@@ -138,16 +147,18 @@ def make_bot(signal: str = "HOLD") -> Bot:
     return bot
 
 
-def test_run_hold_does_not_open_position():
-    bot = make_bot("HOLD")
+def test_run_hold_does_not_open_position(tmp_path):
+    bot = make_bot(tmp_path, "HOLD")
 
     bot.run(max_iterations=1)
 
     assert bot.position_manager.position is None
 
 
-def test_run_buy_opens_position_and_places_order():
-    bot = make_bot("BUY")
+def test_run_buy_opens_position_and_places_order(tmp_path):
+    bot = make_bot(tmp_path, "BUY")
+    # The test account holds 1000 ZUSD, so a 10000 peak would be a drawdown
+    bot.risk_manager.peak_balance = 1000.0
 
     bot.run(max_iterations=1)
 
@@ -159,3 +170,408 @@ def test_run_buy_opens_position_and_places_order():
     assert len(bot.exchange.add_order_calls) >= 1
 
 
+
+
+class BatchTestExchange(TestExchange):
+    """TestExchange that accepts batched orders like KrakenExchange.add_order_batch."""
+
+    def __init__(self):
+        super().__init__()
+        self.batch_calls = []
+        self.cancel_batch_calls = []
+
+    def to_batch_order(self, **order):
+        return order
+
+    def add_order_batch(self, orders, pair):
+        self.batch_calls.append((orders, pair))
+        return {"result": {"orders": [{"txid": f"TX{i}"} for i in range(len(orders))]}}
+
+    def cancel_order_batch(self, orders):
+        self.cancel_batch_calls.append(orders)
+        return {"result": {"count": len(orders)}}
+
+
+def test_order_group_is_sent_as_one_batch_and_cancelled_together(tmp_path):
+    bot = make_bot(tmp_path)
+    bot.exchange = BatchTestExchange()
+
+    results = bot.place_order_group([
+        {"ordertype": "limit", "type": "buy", "volume": 1, "price": 100},
+        {"ordertype": "take-profit-limit", "type": "sell", "volume": 1, "price": 100, "price2": 110},
+    ])
+
+    assert [bot.get_txids(result) for result in results] == [["TX0"], ["TX1"]]
+    assert len(bot.exchange.batch_calls) == 1
+    assert bot.exchange.add_order_calls == []
+
+    bot.cancel_order_group(["TX0", "TX1"])
+    assert bot.exchange.cancel_batch_calls == [["TX0", "TX1"]]
+
+
+def test_order_group_falls_back_to_single_orders(tmp_path):
+    bot = make_bot(tmp_path)
+
+    results = bot.place_order_group([
+        {"ordertype": "limit", "type": "buy", "volume": 1, "price": 100},
+        {"ordertype": "take-profit-limit", "type": "sell", "volume": 1, "price": 100, "price2": 110},
+    ])
+
+    assert len(results) == 2
+    assert [call["ordertype"] for call in bot.exchange.add_order_calls] == ["limit", "take-profit-limit"]
+
+
+class FlakyTakeProfitExchange(TestExchange):
+    """Accepts the entry order but times out on the first take-profit order."""
+
+    def __init__(self):
+        super().__init__()
+        self.take_profit_failures = 0
+
+    def add_order(self, ordertype, **kwargs):
+        if ordertype == "take-profit-limit" and self.take_profit_failures == 0:
+            self.take_profit_failures += 1
+            raise TimeoutError("read timed out")
+        return super().add_order(ordertype=ordertype, **kwargs)
+
+
+def test_order_group_retry_does_not_place_the_entry_twice(tmp_path):
+    bot = make_bot(tmp_path)
+    bot.exchange = FlakyTakeProfitExchange()
+    orders = [
+        {"ordertype": "limit", "type": "buy", "volume": 1, "price": 100},
+        {"ordertype": "take-profit-limit", "type": "sell", "volume": 1, "price": 100, "price2": 110},
+    ]
+    order_results = []
+
+    with pytest.raises(TimeoutError):
+        bot.place_order_group(orders, order_results)
+    bot.place_order_group(orders, order_results)
+
+    assert [call["ordertype"] for call in bot.exchange.add_order_calls] == ["limit", "take-profit-limit"]
+    assert len(order_results) == 2
+
+
+class CancelTestExchange(TestExchange):
+    """Knows one open take-profit order and the stop-loss close created by a filled entry."""
+
+    def __init__(self):
+        super().__init__()
+        self.cancelled = []
+
+    def get_open_orders(self):
+        return {"result": {"open": {
+            "OTP": {"refid": None},
+            "OSTOP": {"refid": "OENTRY"},
+            "OOTHER": {"refid": "OSOMETHINGELSE"},
+        }}}
+
+    def cancel_order(self, txid):
+        if txid not in ["OTP", "OSTOP"]:
+            raise AssertionError(f"EOrder:Unknown order {txid}")
+        self.cancelled.append(txid)
+        return {"result": {"count": 1}}
+
+
+def test_exit_cancels_only_protective_orders_one_at_a_time(tmp_path):
+    bot = make_bot(tmp_path)
+    bot.exchange = CancelTestExchange()
+    bot.position_entry_txids = ["OENTRY"]
+    bot.position_order_txids = ["OFILLED", "OTP"]
+
+    bot.cancel_protective_orders()
+
+    # The already filled order fails on its own, the others are still cancelled
+    assert bot.exchange.cancelled == ["OTP", "OSTOP"]
+    assert bot.position_order_txids == []
+
+class BookSource:
+    """Market data source with a live order book but no streamed candles."""
+
+    def __init__(self, book):
+        self.book = book
+
+    def get_latest_ohlc(self, pair):
+        return None
+
+    def get_order_book(self, pair):
+        return self.book
+
+
+def test_entry_is_priced_and_sized_from_the_order_book(tmp_path):
+    bot = make_bot(tmp_path, "BUY")
+    bot.latest_ohlc = OHLC([0, "100.0", "105.0", "95.0", "102.0", "101.0", "10.0", 1])
+    book = OrderBook("MOONUSD")
+    book.load_snapshot(bids=[["100.0", "0.5"], ["99.5", "0.3"], ["98.0", "5.0"]], asks=[["100.5", "1.0"]])
+    bot.set_market_data(BookSource(book))
+
+    entry_price, position_size, stop_loss, take_profit = bot.size_entry_order("long", 1000.0)
+
+    # Priced at the best bid instead of the 102.0 close; the stop is 1% below the entry
+    assert (entry_price, stop_loss, take_profit) == (100.0, 99.0, 102.0)
+    # 2.0 by the risk limits, capped to the 0.8 bid volume at or above the stop
+    assert position_size == 0.8
+
+class EditTestExchange(TestExchange):
+    """TestExchange whose orders can be edited like with Kraken's EditOrder, which assigns a new txid."""
+
+    def __init__(self):
+        super().__init__()
+        self.edit_calls = []
+
+    def edit_order(self, txid, pair, price='', oflags=''):
+        self.edit_calls.append((txid, price, oflags))
+        return {"result": {"txid": f"{txid}-E", "originaltxid": txid}}
+
+
+def test_resting_entry_is_repriced_to_the_touch(tmp_path):
+    bot = make_bot(tmp_path)
+    bot.exchange = EditTestExchange()
+    bot.reprice_tolerance_pct = 0.001
+    bot.reprice_min_interval_in_sec = 0
+    book = OrderBook("MOONUSD")
+    book.load_snapshot(bids=[["99.0", "1.0"]], asks=[["100.0", "1.0"]])
+    bot.set_market_data(BookSource(book))
+
+    bot.get_repricer().track("ABC123", bot.pair, "sell", 100.5, 1.0)
+    bot.position_entry_txids = ["ABC123"]
+    bot.open_order_txids = ["ABC123"]
+    bot.position_manager.open_position(ticker=bot.pair, side="short", entry_price=100.5, quantity=1.0)
+
+    bot.reprice_entry_orders()
+
+    # The ask moved down away from the resting sell, which follows it under its new txid
+    assert bot.exchange.edit_calls == [("ABC123", "100.0", "post")]
+    assert bot.position_entry_txids == ["ABC123-E"]
+    assert bot.open_order_txids == ["ABC123-E"]
+    assert bot.position_manager.position.entry_price == 100.0
+
+    # Once the position is closed the entry is no longer repriced
+    bot.cancel_protective_orders()
+    assert len(bot.get_repricer()) == 0
+
+
+def test_bot_starts_from_a_replayed_recording(tmp_path):
+    log_path = str(tmp_path / "bot.jsonl")
+    bot_config = BotConfig("tests/test.env")
+    bot_config.mode = "test"
+    risk_manager = RiskManager(RiskManagerConfig("tests/test.env"))
+
+    recorded = Bot(bot_config, RecordingExchange(TestExchange(), log_path), TestStrategy(), risk_manager)
+    recorded.exchange.close()
+
+    replayed = Bot(bot_config, ReplayExchange(log_path), TestStrategy(), risk_manager)
+
+    assert replayed.account_balances == recorded.account_balances
+    assert replayed.exchange.call_count > 0
+
+
+class PushSource:
+    """Market data source that pushes candle updates to its listeners, like KrakenMarketDataFeed."""
+
+    def __init__(self, ohlc):
+        self.ohlc = ohlc
+        self.listeners = []
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def get_latest_ohlc(self, pair):
+        return self.ohlc
+
+    def push(self, pair, ohlc):
+        self.ohlc = ohlc
+        for callback in self.listeners:
+            callback("ohlc", pair, ohlc)
+
+
+class CountingStrategy(TestStrategy):
+    def __init__(self):
+        super().__init__()
+        self.signal_calls = 0
+
+    def generate_signal(self):
+        self.signal_calls += 1
+        return super().generate_signal()
+
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_runtime_wakes_on_market_data_events(tmp_path):
+    bot = make_bot(tmp_path)
+    bot.risk_manager.peak_balance = 1000.0
+    bot.strategy = CountingStrategy()
+    bot.strategy.set_signal("BUY")
+    source = PushSource(OHLC([60, "100.0", "105.0", "95.0", "102.0", "101.0", "10.0", 1]))
+    bot.set_market_data(source)
+    runtime = BotRuntime(bot, heartbeat_in_sec=3600)
+
+    async def scenario():
+        task = asyncio.create_task(runtime.main())
+
+        # The first run opens a position
+        await wait_until(lambda: runtime.runs == 1)
+        assert bot.position_manager.position.side == "long"
+        bot.strategy.set_signal("HOLD")
+
+        # A price through the stop closes it without asking the strategy
+        source.push(bot.pair, OHLC([60, "100.0", "105.0", "80.0", "90.0", "95.0", "12.0", 2]))
+        await wait_until(lambda: runtime.runs == 2)
+        assert bot.position_manager.position is None
+        assert bot.exchange.add_order_calls[-1]["ordertype"] == "market"
+        assert bot.strategy.signal_calls == 1
+
+        # A new candle runs the strategy again
+        source.push(bot.pair, OHLC([120, "90.0", "91.0", "89.0", "90.5", "90.0", "1.0", 1]))
+        await wait_until(lambda: runtime.runs == 3)
+        assert bot.strategy.signal_calls == 2
+
+        runtime.send("stop")
+        await task
+
+    asyncio.run(scenario())
+    assert runtime.event_counts == {"tick": 1, "price": 1, "candle": 1, "stop": 1}
+
+
+def test_runtime_heartbeat_pauses_and_resumes(tmp_path):
+    bot = make_bot(tmp_path, "HOLD")
+    bot.strategy = CountingStrategy()
+    runtime = BotRuntime(bot, heartbeat_in_sec=0.02)
+
+    async def scenario():
+        task = asyncio.create_task(runtime.main())
+        await wait_until(lambda: runtime.runs >= 3)
+
+        # The REST candle does not change, so heartbeats only fetch the price
+        assert bot.strategy.signal_calls == 1
+
+        runtime.send("pause")
+        await asyncio.sleep(0.05)
+        runs = runtime.runs
+        await asyncio.sleep(0.1)
+        assert runtime.runs == runs
+
+        runtime.send("resume")
+        await wait_until(lambda: runtime.runs > runs)
+        runtime.send("stop")
+        await task
+
+    asyncio.run(scenario())
+
+
+class CandleStrategy(CountingStrategy):
+    """Strategy working on 5-minute candles."""
+
+    def get_signal_interval_in_sec(self):
+        return 300
+
+
+class ManualClock:
+    """Exchange clock that only moves when told to, without a measured round trip."""
+
+    def __init__(self, time):
+        self.time = time
+        self.rtt = None
+
+    def now(self):
+        return self.time
+
+
+def test_signal_is_generated_once_per_closed_candle(tmp_path):
+    bot = make_bot(tmp_path, "HOLD")
+    bot.strategy = CandleStrategy()
+    clock = ManualClock(1000.0)
+    bot.exchange._clock = clock
+    bot.latency = 60
+
+    bot.tick()
+    bot.tick()
+    assert bot.strategy.signal_calls == 1
+
+    # Between closes the bot only checks the stop/TP and wakes up for the next close
+    clock.time = 1180.0
+    bot.tick()
+    assert bot.strategy.signal_calls == 1
+    assert bot.get_sleep_in_sec() == 21.0
+
+    clock.time = 1201.0
+    bot.tick()
+    assert bot.strategy.signal_calls == 2
+
+
+
+class SlowExchange(TestExchange):
+    """TestExchange whose market data and balance requests each take delay seconds."""
+
+    def __init__(self, pair_cache_path="", delay=0.2):
+        super().__init__(pair_cache_path)
+        self.delay = delay
+        self.balance_calls = 0
+
+    def get_ohlc_data(self, pair, interval=1, since=0):
+        time.sleep(self.delay)
+        return super().get_ohlc_data(pair, interval, since)
+
+    def get_extended_balance(self):
+        self.balance_calls += 1
+        time.sleep(self.delay)
+        return super().get_extended_balance()
+
+
+class PrefetchingStrategy(CountingStrategy):
+    """Strategy whose signal needs candles that take delay seconds to fetch."""
+
+    def __init__(self, delay=0.2):
+        super().__init__()
+        self.delay = delay
+        self.signal_data = None
+
+    def get_signal_data_fetchers(self):
+        return {"candles": self.fetch_candles}
+
+    def fetch_candles(self):
+        time.sleep(self.delay)
+        return "candles"
+
+    def generate_signal(self):
+        self.signal_data = self.pop_signal_data()
+        return super().generate_signal()
+
+
+def test_tick_fetches_independent_data_concurrently(tmp_path):
+    bot = make_bot(tmp_path, "BUY")
+    bot.risk_manager.peak_balance = 1000.0
+    bot.exchange = SlowExchange(str(tmp_path / "asset_pairs.json"))
+    bot.strategy = PrefetchingStrategy()
+    bot.strategy.set_signal("BUY")
+    # Have the balance ledger reconcile during the tick
+    bot.get_balance_ledger().mark_stale()
+
+    started_at = time.monotonic()
+    bot.tick()
+    elapsed = time.monotonic() - started_at
+
+    # OHLC, candles and the balances would take 0.6s one after the other
+    assert elapsed < 0.4
+    # The strategy gets the bot's price rather than fetching it again
+    assert bot.strategy.signal_data == {"candles": "candles", "latest_ohlc": bot.latest_ohlc}
+    # The entry is sized with the balances fetched at the start of the tick
+    assert bot.exchange.balance_calls == 1
+    assert bot.position_manager.position is not None
+
+
+def test_tick_fails_when_a_request_misses_its_deadline(tmp_path):
+    bot = make_bot(tmp_path, "BUY")
+    bot.strategy = PrefetchingStrategy(delay=0.5)
+    bot.STAGE_DEADLINES_IN_SEC = {"ohlc": 1, "balances": 1, "signal_data": 0.1}
+
+    with pytest.raises(TimeoutError):
+        bot.tick()
+
+    assert bot.strategy.signal_calls == 0
+    assert bot.position_manager.position is None
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from app.marketdata.candles import CandleBatch
+
+
+def kraken_response(rows, last):
+    return {"error": [], "result": {"XXBTZUSD": rows, "last": last}}
+
+
+def test_kraken_rows_decode_into_typed_read_only_columns():
+    candles = CandleBatch.from_kraken_response(kraken_response([
+        [1700000000, "100.0", "105.0", "95.0", "102.0", "101.0", "10.5", 7],
+        [1700000060, "102.0", "103.0", "101.5", "102.5", "102.2", "0.25", 2],
+    ], 1700000000))
+
+    assert len(candles) == 2
+    assert candles.last == 1700000000
+    assert candles.time.dtype == np.int64 and candles.count.dtype == np.int64
+    assert candles.close.dtype == np.float64
+    assert list(candles.close) == [102.0, 102.5]
+    assert list(candles.count) == [7, 2]
+
+    latest = candles.latest()
+    assert (latest.time, latest.close, latest.volume, latest.count) == (1700000060, 102.5, 0.25, 2)
+
+    # Shared between readers, so nobody may write into the arrays
+    with pytest.raises(ValueError):
+        candles.close[0] = 0
+
+
+def test_binance_klines_decode_with_quote_volume_vwap():
+    candles = CandleBatch.from_binance_klines([
+        [1700000000000, "100.0", "105.0", "95.0", "102.0", "2.0", 1700000059999, "203.0", 5, "1.0", "101.0", "0"],
+        [1700000060000, "102.0", "103.0", "101.0", "102.5", "0.0", 1700000119999, "0.0", 0, "0.0", "0.0", "0"],
+    ])
+
+    assert list(candles.time) == [1700000000, 1700000060]
+    # quote volume / volume, or the close for a candle without volume
+    assert list(candles.vwap) == [101.5, 102.5]
+    assert list(candles.count) == [5, 0]
+    assert candles.last == 1700000060
+
+
+def test_merge_keeps_newer_candles_sorted_and_tail_shares_memory():
+    older = CandleBatch.from_kraken_rows([
+        [60, "1", "1", "1", "1.0", "1", "1", 1],
+        [120, "2", "2", "2", "2.0", "2", "2", 2],
+    ], last=60)
+    newer = CandleBatch.from_kraken_rows([
+        [180, "3", "3", "3", "3.0", "3", "3", 3],
+        [120, "2", "2", "2", "2.5", "2", "4", 5],
+    ], last=120)
+
+    merged = older.merge(newer)
+
+    assert list(merged.time) == [60, 120, 180]
+    assert list(merged.close) == [1.0, 2.5, 3.0]
+    assert list(merged.count) == [1, 5, 3]
+    assert merged.last == 120
+
+    tail = merged.tail(2)
+    assert list(tail.time) == [120, 180]
+    assert np.shares_memory(tail.close, merged.close)
+    assert tail.to_rows() == [[120, 2.0, 2.0, 2.0, 2.5, 2.0, 4.0, 5], [180, 3.0, 3.0, 3.0, 3.0, 3.0, 3.0, 3]]
+
+    frame = merged.to_dataframe()
+    assert list(frame.columns) == CandleBatch.DATAFRAME_COLUMNS
+    assert list(frame["close"]) == [1.0, 2.5, 3.0]
@@ -0,0 +1,445 @@
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.exchanges.exchange import KrakenExchange
+from app.exchanges.asyncexchange import AsyncKrakenExchange
+from app.exchanges.ratelimiter import KrakenRateLimiter, RateLimiter, TokenBucket
+from app.exchanges.pairregistry import PairRegistry, Quantizer
+from app.exchanges.clocksync import ClockSync
+from app.exchanges.retry import CircuitBreaker, CircuitOpenError, RetryExecutor
+from app.exchanges.hedging import HedgedRequester, LatencyTracker
+from config import ExchangeConfig
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    @property
+    def content(self):
+        return json.dumps(self.payload).encode()
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """Answers every request with an empty Kraken result and records the URLs."""
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        return FakeResponse({"error": [], "result": {}})
+
+    def post(self, url, **kwargs):
+        self.urls.append(url)
+        return FakeResponse({"error": [], "result": {}})
+
+
+class SlowKrakenExchange(KrakenExchange):
+    """KrakenExchange whose public requests take 0.2s and never leave the process."""
+
+    def public_request(self, uri_path, query_parameters=None):
+        time.sleep(0.2)
+        return FakeResponse({"error": [], "result": {"uri_path": uri_path}})
+
+
+def make_exchange(cls=KrakenExchange):
+    return cls(ExchangeConfig("tests/test.env"))
+
+
+def test_nonce_is_strictly_increasing_across_threads():
+    exchange = make_exchange()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        nonces = list(executor.map(lambda _: int(exchange.get_nonce()), range(1000)))
+
+    assert len(set(nonces)) == len(nonces)
+
+
+def test_clients_of_an_api_key_never_share_a_nonce():
+    exchanges = [make_exchange(), make_exchange()]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        nonces = list(executor.map(lambda i: int(exchanges[i % 2].get_nonce()), range(1000)))
+
+    assert len(set(nonces)) == len(nonces)
+
+
+def test_async_exchange_runs_requests_concurrently():
+    exchange = AsyncKrakenExchange(exchange=make_exchange(SlowKrakenExchange))
+
+    start = time.time()
+    time_result, ticker_result, ohlc_result = exchange.run(
+        exchange.get_exchange_time(),
+        exchange.get_ticker_info("XBTUSD"),
+        exchange.get_ohlc_data("XBTUSD"),
+    )
+    elapsed = time.time() - start
+
+    assert time_result["result"]["uri_path"] == "/public/Time"
+    assert ticker_result["result"]["uri_path"] == "/public/Ticker"
+    assert ohlc_result["result"]["uri_path"] == "/public/OHLC"
+    assert elapsed < 0.5
+
+
+def test_token_bucket_paces_calls_at_the_decay_rate():
+    bucket = TokenBucket(capacity=2, refill_rate=20)
+
+    start = time.monotonic()
+    for _ in range(4):
+        assert bucket.acquire()
+    elapsed = time.monotonic() - start
+
+    # Two calls fit in the bucket, the other two wait for 1/20s each
+    assert 0.08 <= elapsed < 0.3
+    assert not bucket.try_acquire()
+    assert not bucket.acquire(timeout=0.01)
+
+
+def test_kraken_requests_wait_on_the_shared_rate_limiter():
+    exchange = make_exchange()
+    exchange._session = FakeSession()
+
+    # Run in a thread so a deadlock while creating the limiter fails the test instead of hanging it
+    thread = threading.Thread(target=lambda: (exchange.get_exchange_time(), exchange.get_account_balance()), daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert [url.split("/0")[-1] for url in exchange._session.urls] == ["/public/Time", "/private/Balance"]
+    assert exchange.rate_limiter.buckets["public"].available() < exchange.rate_limiter.buckets["public"].capacity
+    assert exchange.rate_limiter.buckets["private"].available() < exchange.rate_limiter.buckets["private"].capacity
+
+class RateLimitedSession(FakeSession):
+    def post(self, url, **kwargs):
+        self.urls.append(url)
+        return FakeResponse({"error": ["EAPI:Rate limit exceeded"]})
+
+
+def test_server_rate_limit_errors_drain_the_limiter():
+    exchange = make_exchange()
+    # A key of its own, so the drained bucket is not shared with other tests
+    exchange.api_key = "rate-limited"
+    exchange._session = RateLimitedSession()
+
+    with pytest.raises(AssertionError):
+        exchange.get_account_balance()
+
+    assert exchange.rate_limiter.buckets["private"].available() < 0.1
+
+def test_kraken_rate_limiter_charges_cancel_penalties_by_order_age():
+    rate_limiter = KrakenRateLimiter("starter")
+    rate_limiter.record_orders(["OYOUNG"], "XBTUSD")
+    rate_limiter.order_times["OOLD"] = ("XBTUSD", time.time() - 600)
+
+    rate_limiter.acquire_private("AddOrder", pair="XBTUSD")
+    rate_limiter.acquire_private("CancelOrder", txids=["OYOUNG"])
+    rate_limiter.acquire_private("CancelOrder", txids=["OOLD"])
+
+    # 60 - 1 (add) - 8 (cancel within 5s) - 0 (cancel after 300s)
+    assert rate_limiter.buckets["trading:XBTUSD"].available() == pytest.approx(51, abs=0.1)
+    assert rate_limiter.buckets["private"].available() == pytest.approx(15)
+
+
+class CountingPairsExchange(KrakenExchange):
+    """KrakenExchange serving a fixed AssetPairs/TradeVolume response and counting the calls."""
+
+    def get_tradable_asset_pairs(self, pair="", info="info"):
+        self.pair_calls = getattr(self, "pair_calls", 0) + 1
+        return {"error": [], "result": {"XXBTZUSD": {
+            "altname": "XBTUSD", "wsname": "XBT/USD", "base": "XXBT", "quote": "ZUSD",
+            "pair_decimals": 1, "lot_decimals": 8, "cost_decimals": 5,
+            "ordermin": "0.0001", "costmin": "0.5", "tick_size": "0.1", "status": "online",
+        }}}
+
+    def get_trade_volume(self, pair=""):
+        self.volume_calls = getattr(self, "volume_calls", 0) + 1
+        return {"error": [], "result": {
+            "volume": "1000.0",
+            "fees": {"XXBTZUSD": {"fee": "0.40"}},
+            "fees_maker": {"XXBTZUSD": {"fee": "0.25"}},
+        }}
+
+
+def test_pair_registry_resolves_every_name_and_reloads_from_disk(tmp_path):
+    cache_path = str(tmp_path / "asset_pairs.json")
+    exchange = make_exchange(CountingPairsExchange)
+
+    registry = PairRegistry(exchange, cache_path=cache_path)
+    assert registry.get("XBTUSD") is registry.get("XBT/USD") is registry.get("XXBTZUSD")
+    assert registry.get_fees("XBTUSD")["maker"] == 0.25
+    assert exchange.pair_calls == 1
+
+    # Fees are served from the cache until they expire
+    assert registry.get_fees("XBTUSD")["taker"] == 0.40
+    assert exchange.volume_calls == 1
+
+    # A second registry (e.g. another process) starts from the cache without calling the exchange
+    other_exchange = make_exchange(CountingPairsExchange)
+    pair_info = PairRegistry(other_exchange, cache_path=cache_path).get("XBT/USD")
+    assert pair_info.key == "XXBTZUSD"
+    assert pair_info.ordermin == 0.0001
+    assert getattr(other_exchange, "pair_calls", 0) == 0
+    assert getattr(other_exchange, "volume_calls", 0) == 0
+
+    # Fee schedules belong to an account: another API key fetches its own
+    other_account = make_exchange(CountingPairsExchange)
+    other_account.api_key = "another-key"
+    PairRegistry(other_account, cache_path=cache_path).get_fees("XBTUSD")
+    assert other_account.volume_calls == 1
+
+
+def test_quantizer_rounds_to_tick_and_floors_lots():
+    assert Quantizer(1, "0.5").round(101.26) == 101.5
+    assert Quantizer(2).floor(0.29) == 0.29
+    assert Quantizer(2).floor(0.2999) == 0.29
+    assert Quantizer(1, "0.1").format(3) == "3.0"
+
+
+def test_clock_sync_uses_the_sample_with_the_smallest_round_trip():
+    # The server clock is 5s ahead. Slow samples see the server time late in their round trip.
+    delays = iter([(0.0, 0.15), (0.01, 0.01), (0.12, 0.0)])
+
+    def fetch_server_time():
+        before, after = next(delays)
+        time.sleep(before)
+        server_time = time.time() + 5
+        time.sleep(after)
+        return server_time
+
+    clock = ClockSync(fetch_server_time)
+    for _ in range(3):
+        assert clock.sample()
+
+    assert clock.rtt < 0.05
+    assert clock.offset == pytest.approx(5, abs=0.02)
+    assert clock.now() - time.time() == pytest.approx(5, abs=0.02)
+
+
+def test_kraken_nonce_follows_a_server_clock_ahead_of_the_local_clock():
+    exchange = make_exchange()
+    exchange._clock = ClockSync(lambda: time.time() + 60)
+    exchange.clock.sample()
+
+    assert int(exchange.get_nonce()) >= int(1000 * (time.time() + 59))
+
+
+def test_every_exchange_instance_warms_its_own_pool_while_sharing_the_clock():
+    clock = ClockSync(time.time, sample_interval_in_sec=3600)
+    exchanges = [make_exchange(), make_exchange()]
+
+    for exchange in exchanges:
+        exchange._session = FakeSession()
+        exchange._clock = clock
+        exchange.warm_up()
+
+    try:
+        assert [exchange._session.urls for exchange in exchanges] == [["https://api.kraken.com/0/public/Time"]] * 2
+        assert len(clock.samples) == 1
+    finally:
+        clock.stop()
+
+def test_add_order_batch_signs_a_json_body():
+    exchange = make_exchange()
+    exchange.api_sec = base64.b64encode(b"secret").decode()
+    sent = {}
+
+    def post(url, headers, data, timeout):
+        sent.update(url=url, headers=headers, data=data)
+        return FakeResponse({"error": [], "result": {"orders": []}})
+
+    exchange.session.post = post
+    exchange.add_order_batch([exchange.to_batch_order("limit", "buy", 1, price=100, closeordertype="stop-loss-limit", closeprice=95)], "XBTUSD")
+
+    body = json.loads(sent["data"])
+    assert sent["headers"]["Content-Type"] == "application/json"
+    assert body["orders"][0]["close"] == {"ordertype": "stop-loss-limit", "price": "95"}
+
+    message = b"/0/private/AddOrderBatch" + hashlib.sha256((body["nonce"] + sent["data"]).encode()).digest()
+    expected = base64.b64encode(hmac.new(b"secret", message, hashlib.sha512).digest()).decode()
+    assert sent["headers"]["API-Sign"] == expected
+
+
+def test_kraken_rate_limiter_forgets_orders_past_the_penalty_window():
+    rate_limiter = KrakenRateLimiter("starter")
+    rate_limiter.order_times["OFILLED"] = ("XBTUSD", time.time() - 301)
+
+    rate_limiter.record_orders(["ONEW"], "XBTUSD")
+
+    assert list(rate_limiter.order_times.keys()) == ["ONEW"]
+
+
+def test_retry_executor_backs_off_with_jitter_until_the_call_succeeds():
+    executor = RetryExecutor(CircuitBreaker(), max_attempts=3, base_delay_in_sec=0.01)
+    calls = []
+
+    def flaky(value):
+        calls.append(value)
+        if len(calls) < 3:
+            raise TimeoutError("read timed out")
+        return value
+
+    assert executor.call(flaky, "ok") == "ok"
+    assert calls == ["ok", "ok", "ok"]
+    assert all(0 <= executor.get_delay(attempt) <= 0.01 * 2 ** attempt for attempt in range(3) for _ in range(100))
+    assert executor.get_delay(10) <= executor.max_delay_in_sec
+
+    # Out of attempts: the last error is raised
+    calls.clear()
+    with pytest.raises(TimeoutError):
+        RetryExecutor(CircuitBreaker(), max_attempts=2, base_delay_in_sec=0.01).call(flaky, "again")
+    assert calls == ["again", "again"]
+
+
+def test_circuit_opens_on_a_high_error_rate_and_fails_fast_until_a_trial_call_succeeds():
+    breaker = CircuitBreaker(failure_threshold=0.5, window_size=4, min_calls=4, reset_timeout_in_sec=0.05)
+    executor = RetryExecutor(breaker, max_attempts=1, base_delay_in_sec=0.01)
+    calls = []
+
+    def down():
+        calls.append(time.monotonic())
+        raise ConnectionError("exchange unavailable")
+
+    executor.call(lambda: "ok")
+    executor.call(lambda: "ok")
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            executor.call(down)
+
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Fails fast without calling the exchange while open
+    with pytest.raises(CircuitOpenError):
+        executor.call(down)
+    assert len(calls) == 2
+
+    # A failed trial call keeps the circuit open
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(ConnectionError):
+        executor.call(down)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # A successful one closes it with a clean window
+    time.sleep(0.06)
+    assert executor.call(lambda: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_circuit_window_forgets_old_failures():
+    breaker = CircuitBreaker(failure_threshold=0.5, window_size=4, min_calls=4)
+
+    breaker.record_failure()
+    for _ in range(4):
+        breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.failures == 1
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_exchange_clients_share_a_circuit_per_endpoint_class():
+    first = KrakenExchange(ExchangeConfig("tests/test.env"))
+    second = KrakenExchange(ExchangeConfig("tests/test.env"))
+
+    assert first.circuit_breaker("public") is second.circuit_breaker("public")
+    assert first.circuit_breaker("public") is not first.circuit_breaker("trading")
+    assert first.retry_executor("trading", max_attempts=3).circuit_breaker is second.circuit_breaker("trading")
+
+    # Another account has circuits of its own for its private requests
+    other_account = KrakenExchange(ExchangeConfig("tests/test.env"))
+    other_account.api_key = "another-key"
+    assert other_account.circuit_breaker("public") is first.circuit_breaker("public")
+    assert other_account.circuit_breaker("private") is not first.circuit_breaker("private")
+
+
+def test_latency_tracker_deadline_is_the_percentile_of_recent_latencies():
+    tracker = LatencyTracker(percentile=90, window_size=10, min_samples=5, initial_deadline_in_sec=2.0)
+
+    assert tracker.deadline() == 2.0
+
+    for latency in [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 5.0]:
+        tracker.record(latency)
+    assert tracker.deadline() == 5.0
+
+    # Only the last window_size latencies count
+    for _ in range(10):
+        tracker.record(0.05)
+    assert tracker.deadline() == 0.05
+
+
+class SlowFirstSend:
+    """The first request hangs for a while, later ones answer at once."""
+
+    def __init__(self, delay=0.5):
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        if call == 1:
+            time.sleep(self.delay)
+            return "slow"
+        return "fast"
+
+
+def test_hedged_request_returns_the_backup_when_the_first_is_slow():
+    hedger = HedgedRequester(RateLimiter({"public": TokenBucket(5, 5)}), "public")
+    hedger.get_tracker("/public/Depth").initial_deadline_in_sec = 0.05
+    send = SlowFirstSend()
+
+    start = time.monotonic()
+    assert hedger.call("/public/Depth", send) == "fast"
+    assert time.monotonic() - start < 0.4
+    assert send.calls == 2
+    assert hedger.hedged_count == 1
+    hedger.close()
+
+
+def test_hedged_request_waits_instead_of_exceeding_the_rate_limit():
+    bucket = TokenBucket(1, 0.01)
+    bucket.drain()
+    hedger = HedgedRequester(RateLimiter({"public": bucket}), "public")
+    hedger.get_tracker("/public/Depth").initial_deadline_in_sec = 0.05
+    send = SlowFirstSend(0.2)
+
+    assert hedger.call("/public/Depth", send) == "slow"
+    assert send.calls == 1
+    assert hedger.skipped_count == 1
+    hedger.close()
+
+
+class RecordingHedger:
+    def __init__(self):
+        self.keys = []
+
+    def call(self, key, send):
+        self.keys.append(key)
+        return send()
+
+
+def test_kraken_public_requests_are_hedged_only_when_enabled():
+    exchange = KrakenExchange(ExchangeConfig("tests/test.env"))
+    exchange._session = FakeSession()
+    exchange._hedger = RecordingHedger()
+
+    exchange.get_exchange_time()
+    assert exchange._hedger.keys == []
+
+    exchange.hedge_public_requests = True
+    exchange.get_exchange_time()
+    assert exchange._hedger.keys == ["/public/Time"]
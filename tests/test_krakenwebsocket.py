@@ -0,0 +1,304 @@
+import json
+import threading
+import time
+
+import pytest
+from websockets.sync.server import serve
+
+from app.exchanges.exchange import Exchange
+from app.exchanges.krakenwebsocket import KrakenMarketDataFeed, KrakenOrderSocket
+from app.exchanges.pairregistry import PairRegistry
+from app.marketdata.orderbook import OrderBook
+from app.positionmanager import PositionManager
+
+
+class BackfillExchange(Exchange):
+    """Serves the REST backfill the feed requests after every (re)connect."""
+
+    def __init__(self):
+        super().__init__()
+        self.ohlc_calls = []
+
+    def get_ohlc_data(self, pair, interval=1, since=0):
+        self.ohlc_calls.append(since)
+        return {
+            "result": {
+                "XXBTZUSD": [[1700000000, "90.0", "95.0", "85.0", "91.0", "90.5", "1.0", 3]],
+                "last": 1700000000,
+            }
+        }
+
+
+class TokenExchange(Exchange):
+    def __init__(self):
+        super().__init__()
+        self.mode = "live"
+
+    def get_websockets_token(self):
+        return {"error": [], "result": {"token": "TOKEN", "expires": 900}}
+
+
+class StandInServer:
+    """Local stand-in for wss://ws.kraken.com that answers subscriptions with one ohlc and one ticker update."""
+
+    def __init__(self, handler=None):
+        self.connections = []
+        self.subscriptions = []
+        self.server = serve(handler or self.handler, "localhost", 0)
+        self.url = f"ws://localhost:{self.server.socket.getsockname()[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def handler(self, websocket):
+        self.connections.append(websocket)
+        websocket.send(json.dumps({"event": "systemStatus", "status": "online"}))
+
+        for raw_message in websocket:
+            message = json.loads(raw_message)
+            self.subscriptions.append(message)
+            name = message["subscription"]["name"]
+
+            if name == "ohlc":
+                websocket.send(json.dumps(
+                    [42, ["1700000100.5", "1700000160.0", "100.0", "105.0", "95.0", "102.0", "101.0", "10.0", 7], "ohlc-1", "XBT/USD"]
+                ))
+            elif name == "ticker":
+                websocket.send(json.dumps(
+                    [43, {"a": ["102.5", 1, "1.0"], "b": ["101.5", 1, "1.0"], "c": ["102.0", "0.1"]}, "ticker", "XBT/USD"]
+                ))
+
+    def drop_connections(self):
+        for websocket in self.connections:
+            websocket.close()
+
+    def shutdown(self):
+        self.server.shutdown()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def feed(server):
+    feed = KrakenMarketDataFeed(BackfillExchange(), url=server.url, reconnect_delay_in_sec=0.05)
+    feed.subscribe("XBTUSD", wsname="XBT/USD")
+    feed.start()
+    yield feed
+    feed.stop()
+
+
+def test_feed_keeps_latest_candle_and_ticker(feed):
+    assert wait_for(lambda: feed.get_latest_ticker("XBTUSD") is not None)
+    assert wait_for(lambda: feed.get_latest_ohlc("XBTUSD").close == 102.0)
+
+    ohlc = feed.get_latest_ohlc("XBTUSD")
+    assert ohlc.time == 1700000100
+    assert ohlc.count == 7
+    assert feed.get_latest_ticker("XBTUSD") == {"bid": 101.5, "ask": 102.5, "last": 102.0}
+
+
+def test_feed_reconnects_resubscribes_and_backfills(server, feed):
+    assert wait_for(lambda: feed.get_latest_ohlc("XBTUSD") is not None)
+    assert len(feed.exchange.ohlc_calls) == 1
+
+    server.drop_connections()
+
+    assert wait_for(lambda: feed.reconnect_count == 1 and feed.is_connected())
+    assert wait_for(lambda: len(feed.exchange.ohlc_calls) == 2)
+    assert wait_for(lambda: len(server.subscriptions) == 4)
+    # The second backfill resumes from the last known candle
+    assert feed.exchange.ohlc_calls[1] > 0
+
+
+class MalformedMessageServer(StandInServer):
+    """Sends a message that is not JSON and one the feed cannot make sense of before the regular updates."""
+
+    def handler(self, websocket):
+        websocket.send("not json")
+        websocket.send(json.dumps([1]))
+        super().handler(websocket)
+
+
+def test_feed_skips_malformed_messages_without_reconnecting():
+    server = MalformedMessageServer()
+    feed = KrakenMarketDataFeed(BackfillExchange(), url=server.url, reconnect_delay_in_sec=0.05)
+    feed.subscribe("XBTUSD", wsname="XBT/USD")
+    feed.start()
+
+    try:
+        assert wait_for(lambda: feed.get_latest_ticker("XBTUSD") is not None)
+        assert feed.reconnect_count == 0
+        assert feed._thread.is_alive()
+    finally:
+        feed.stop()
+        server.shutdown()
+
+def test_feed_returns_none_when_disconnected():
+    feed = KrakenMarketDataFeed(BackfillExchange(), url="ws://localhost:1")
+
+    assert feed.get_latest_ohlc("XBTUSD") is None
+
+
+def order_handler(websocket):
+    """Stand-in for wss://ws-auth.kraken.com: acknowledges addOrder, then reports two partial fills."""
+    for raw_message in websocket:
+        message = json.loads(raw_message)
+
+        if message["event"] == "subscribe":
+            assert message["subscription"] == {"name": "ownTrades", "token": "TOKEN", "snapshot": False}
+        elif message["event"] == "addOrder":
+            assert message["token"] == "TOKEN"
+            if message["volume"] == "0":
+                websocket.send(json.dumps({"event": "addOrderStatus", "reqid": message["reqid"], "status": "error", "errorMessage": "EOrder:Invalid volume"}))
+                continue
+
+            websocket.send(json.dumps({"event": "addOrderStatus", "reqid": message["reqid"], "status": "ok", "txid": "OABC-123", "descr": "buy 2 XBTUSD @ limit 100"}))
+            trades = [
+                {"T1": {"ordertxid": "OABC-123", "pair": "XBT/USD", "type": "buy", "price": "99.0", "vol": "1.0", "fee": "0.1", "time": "1700000000.1"}},
+                {"T2": {"ordertxid": "OABC-123", "pair": "XBT/USD", "type": "buy", "price": "101.0", "vol": "3.0", "fee": "0.3", "time": "1700000000.2"}},
+            ]
+            websocket.send(json.dumps([trades, "ownTrades", {"sequence": 1}]))
+
+
+def test_order_socket_acknowledges_orders_and_streams_fills():
+    server = StandInServer(order_handler)
+    order_socket = KrakenOrderSocket(TokenExchange(), url=server.url)
+    order_socket.wsnames["XBTUSD"] = "XBT/USD"
+    fills = []
+    order_socket.add_fill_listener(fills.append)
+    order_socket.start()
+
+    try:
+        assert order_socket.wait_until_connected(timeout=5)
+
+        response = order_socket.add_order(ordertype="limit", type="buy", volume=4.0, pair="XBTUSD", price=100.0, oflags="post")
+        assert response["result"]["txid"] == ["OABC-123"]
+
+        with pytest.raises(Exception, match="Invalid volume"):
+            order_socket.add_order(ordertype="limit", type="buy", volume=0, pair="XBTUSD", price=100.0)
+
+        assert wait_for(lambda: len(fills) == 2)
+    finally:
+        order_socket.stop()
+        server.shutdown()
+
+    position_manager = PositionManager()
+    position_manager.open_position(ticker="XBTUSD", side="long", entry_price=100.0, quantity=4.0)
+    for fill in fills:
+        position_manager.apply_fill(fill["price"], fill["volume"])
+
+    assert position_manager.position.entry_price == pytest.approx(100.5)
+    assert position_manager.position.filled_quantity == 4.0
+
+
+class FlakyTokenExchange(TokenExchange):
+    """Fails the first token request the way handle_response_errors does."""
+
+    def __init__(self):
+        super().__init__()
+        self.token_calls = 0
+
+    def get_websockets_token(self):
+        self.token_calls += 1
+        if self.token_calls == 1:
+            raise AssertionError("EGeneral:Temporary lockout")
+        return super().get_websockets_token()
+
+
+def test_order_socket_reconnects_when_the_token_request_fails():
+    server = StandInServer(order_handler)
+    order_socket = KrakenOrderSocket(FlakyTokenExchange(), url=server.url, reconnect_delay_in_sec=0.05)
+    order_socket.wsnames["XBTUSD"] = "XBT/USD"
+
+    # Nothing is sent without a connection and token
+    with pytest.raises(ConnectionError):
+        order_socket.add_order(ordertype="limit", type="buy", volume=4.0, pair="XBTUSD", price=100.0)
+
+    order_socket.start()
+
+    try:
+        assert order_socket.wait_until_connected(timeout=5)
+        assert order_socket.exchange.token_calls == 2
+        assert order_socket.reconnect_count == 1
+
+        response = order_socket.add_order(ordertype="limit", type="buy", volume=4.0, pair="XBTUSD", price=100.0)
+        assert response["result"]["txid"] == ["OABC-123"]
+    finally:
+        order_socket.stop()
+        server.shutdown()
+
+class BookExchange(BackfillExchange):
+    """Serves pair metadata and the REST order book the feed seeds its local book from."""
+
+    def __init__(self):
+        super().__init__()
+        self._pair_registry = PairRegistry(self, cache_path="")
+        self.depth_calls = 0
+
+    def get_tradable_asset_pairs(self, pair="", info="info"):
+        return {"result": {"XXBTZUSD": {
+            "altname": "XBTUSD", "wsname": "XBT/USD", "pair_decimals": 1, "lot_decimals": 8,
+            "cost_decimals": 5, "ordermin": "0.0001", "costmin": "0.5",
+        }}}
+
+    def get_order_book(self, pair, count=100):
+        self.depth_calls += 1
+        return {"result": {"XXBTZUSD": {"bids": [["99.0", "1.0", 1]], "asks": [["101.0", "1.0", 1]]}}}
+
+
+def book_handler(websocket):
+    """Answers a book subscription with a snapshot, a valid update, then (first time only) an update with a bad checksum."""
+    book = OrderBook("XBTUSD", depth=10, price_decimals=1)
+    book.load_snapshot([["100.0", "1.0", "1.0"]], [["102.0", "2.0", "1.0"]])
+    book_subscriptions = 0
+
+    for raw_message in websocket:
+        message = json.loads(raw_message)
+
+        if message["subscription"]["name"] != "book" or message["event"] != "subscribe":
+            continue
+
+        book_subscriptions += 1
+        websocket.send(json.dumps([10, {"as": [["102.0", "2.0", "1.0"]], "bs": [["100.0", "1.0", "1.0"]]}, "book-10", "XBT/USD"]))
+
+        update = OrderBook("XBTUSD", depth=10, price_decimals=1)
+        update.load_snapshot([["100.0", "1.0", "1.0"], ["100.5", "0.5", "2.0"]], [["102.0", "2.0", "1.0"]])
+        websocket.send(json.dumps([10, {"b": [["100.5", "0.5", "2.0"]], "c": str(update.checksum())}, "book-10", "XBT/USD"]))
+
+        if book_subscriptions == 1:
+            websocket.send(json.dumps([10, {"a": [["101.5", "1.0", "3.0"]], "c": "1"}, "book-10", "XBT/USD"]))
+
+
+def test_feed_keeps_order_book_and_resyncs_on_checksum_failure():
+    server = StandInServer(book_handler)
+    feed = KrakenMarketDataFeed(BookExchange(), url=server.url)
+    feed.subscribe_book("XBTUSD")
+
+    # Seeded over REST before the stream starts
+    assert feed.exchange.depth_calls == 1
+
+    feed.start()
+
+    try:
+        assert wait_for(lambda: feed.checksum_failures == 1)
+        assert wait_for(lambda: feed.get_order_book("XBTUSD") is not None and feed.get_order_book("XBTUSD").best_bid() == (100.5, 0.5))
+
+        book = feed.get_order_book("XBTUSD")
+        assert book.best_ask() == (102.0, 2.0)
+        assert feed.exchange.depth_calls == 2
+    finally:
+        feed.stop()
+        server.shutdown()
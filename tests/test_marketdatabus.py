@@ -0,0 +1,109 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from app.marketdata.candles import CandleBatch
+from app.marketdata.marketdatabus import MarketDataBus
+from app.marketdata.orderbook import OrderBook
+from app.marketdata.snapshot import MarketSnapshot
+from tests.test_snapshot import TICKERS
+
+ROWS = [
+    [60, "100.0", "105.0", "95.0", "102.0", "101.0", "10.0", 5],
+    [120, "102.0", "106.0", "101.0", "104.0", "103.0", "12.0", 7],
+    [180, "104.0", "108.0", "103.0", "107.0", "106.0", "9.0", 4],
+]
+
+
+@pytest.fixture
+def bus():
+    bus = MarketDataBus(capacity=4, max_candles=2, depth=2)
+    yield bus
+    bus.close()
+
+
+def test_bus_keeps_the_latest_value_of_each_pair(bus):
+    book = OrderBook("XBTUSD")
+    book.load_snapshot([["99.5", "1.0"], ["99.0", "2.0"], ["98.5", "3.0"]], [["100.5", "1.5"]], timestamp=time.time())
+
+    bus.publish("XBTUSD", candles=CandleBatch.from_kraken_rows(ROWS, last=180), book=book)
+    bus.publish("XBTUSD", ticker={"bid": 99.0, "ask": 101.0, "last": 100.0})
+    bus.publish("XBTUSD", ticker={"bid": 99.5, "ask": 100.5, "last": 100.2})
+
+    # Only the newest max_candles candles are kept, and only the newest ticker
+    candles = bus.get_candles("XBTUSD")
+    assert candles.time.tolist() == [120, 180]
+    assert candles.last == 180
+    assert bus.get_latest_ohlc("XBTUSD").close == 107.0
+    assert bus.get_latest_ticker("XBTUSD") == {"bid": 99.5, "ask": 100.5, "last": 100.2}
+
+    book = bus.get_order_book("XBTUSD")
+    assert (book.best_bid(), book.best_ask(), len(book.bids)) == ((99.5, 1.0), (100.5, 1.5), 2)
+
+    assert bus.get_latest_ticker("ETHUSD") is None
+    bus.publish("ETHUSD", ticker={"bid": 49.0, "ask": 51.0, "last": 50.0}, published_at=time.time() - 60)
+    assert bus.get_latest_ticker("ETHUSD") is None
+    assert bus.get_latest_ohlc("ETHUSD") is None
+
+    bus.publish("MOONUSD", ticker={"bid": 1.0, "ask": 1.1, "last": 1.0})
+    bus.publish("DOGEUSD", ticker={"bid": 1.0, "ask": 1.1, "last": 1.0})
+    with pytest.raises(ValueError):
+        bus.publish("SOLUSD", ticker={"bid": 1.0, "ask": 1.1, "last": 1.0})
+
+
+def test_bus_publishes_snapshots(bus):
+    candles = CandleBatch.from_kraken_rows(ROWS[:2], last=120)
+    snapshot = MarketSnapshot(TICKERS, {"XXBTZUSD": candles}, time.time())
+
+    bus.publish_snapshot(snapshot, {"XBTUSD": "XXBTZUSD", "ETHUSD": "XETHZUSD"})
+
+    assert bus.get_latest_ticker("XBTUSD") == {"bid": 99.9, "ask": 100.1, "last": 100.0}
+    assert bus.get_latest_ohlc("XBTUSD").time == 120
+    assert bus.get_latest_ticker("ETHUSD")["last"] == 50.0
+    assert bus.get_latest_ohlc("ETHUSD") is None
+
+
+def test_readers_never_see_a_half_written_slot(bus):
+    stop = threading.Event()
+
+    def publish():
+        price = 0
+        while not stop.is_set():
+            price += 1
+            bus.publish("XBTUSD", ticker={"bid": price, "ask": price, "last": price})
+
+    bus.publish("XBTUSD", ticker={"bid": 0, "ask": 0, "last": 0})
+    publisher = threading.Thread(target=publish)
+    publisher.start()
+
+    try:
+        for _ in range(2000):
+            ticker = bus.get_latest_ticker("XBTUSD")
+            assert ticker["bid"] == ticker["ask"] == ticker["last"]
+    finally:
+        stop.set()
+        publisher.join()
+
+
+def read_ticker(name, queue):
+    bus = MarketDataBus.attach(name)
+    queue.put(bus.get_latest_ticker("XBTUSD"))
+    bus.close()
+
+
+def test_other_processes_read_the_bus(bus):
+    bus.publish("XBTUSD", ticker={"bid": 99.5, "ask": 100.5, "last": 100.2})
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    reader = context.Process(target=read_ticker, args=(bus.name, queue))
+    reader.start()
+
+    assert queue.get(timeout=30) == {"bid": 99.5, "ask": 100.5, "last": 100.2}
+    reader.join()
+
+    # The reader leaves the memory to its creator
+    reader_bus = MarketDataBus.attach(bus.name)
+    assert reader_bus.get_latest_ticker("XBTUSD")["last"] == 100.2
+    reader_bus.close()
@@ -0,0 +1,73 @@
+from app.marketdata.candles import CandleBatch
+from app.marketdata.ohlcpoller import CandleRing, OHLCPoller
+
+
+def candle(time, close, volume="1.0"):
+    return [time, str(close), str(close), str(close), str(close), str(close), volume, 1]
+
+
+class CursorExchange:
+    """Serves Kraken-style OHLC responses: rows from since on, with the last closed candle as the cursor."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.since_calls = []
+
+    def get_ohlc_batch(self, pair, interval=1, since=0):
+        self.since_calls.append(since)
+        rows = [row for row in self.rows if row[0] >= since][-720:]
+        # The last row is the candle in progress
+        last = self.rows[-2][0] if len(self.rows) > 1 else 0
+        return CandleBatch.from_kraken_rows(rows, last)
+
+
+def test_poller_fetches_only_new_candles_and_updates_the_candle_in_progress():
+    exchange = CursorExchange([candle(60 * i, 100 + i) for i in range(720)])
+    poller = OHLCPoller(exchange, capacity=720)
+
+    assert poller.get_latest_ohlc("XBTUSD").close == 819
+    assert poller.rows_fetched == 720
+    assert poller.get_cursor("XBTUSD") == 60 * 718
+
+    # The candle in progress trades higher, then closes and a new one starts
+    exchange.rows[-1] = candle(60 * 719, 850, "3.0")
+    assert poller.get_latest_ohlc("XBTUSD").close == 850
+    exchange.rows.append(candle(60 * 720, 860))
+    assert poller.get_latest_ohlc("XBTUSD").close == 860
+
+    # Each incremental poll transfers a couple of rows instead of the whole history
+    assert exchange.since_calls == [0, 60 * 718, 60 * 718]
+    assert poller.rows_fetched == 720 + 2 + 3
+
+    candles = poller.get_candles("XBTUSD")
+    # 720 closed candles and the one in progress
+    assert len(candles) == 721
+    assert list(candles.time[-3:]) == [60 * 718, 60 * 719, 60 * 720]
+    assert list(candles.close[-2:]) == [850, 860]
+    assert candles.volume[-2] == 3.0
+
+
+def test_candle_ring_keeps_the_newest_closed_candles_in_order():
+    ring = CandleRing(capacity=3)
+
+    ring.extend(CandleBatch.from_kraken_rows([candle(60, 1), candle(120, 2)]))
+    ring.extend(CandleBatch.from_kraken_rows([candle(120, 2.5), candle(180, 3), candle(240, 4)]))
+    ring.extend(CandleBatch.from_kraken_rows([candle(300, 5)]))
+
+    batch = ring.to_batch()
+    assert list(batch.time) == [180, 240, 300]
+    assert list(batch.close) == [3, 4, 5]
+    assert ring.latest().close == 5
+
+    # A fetch longer than the ring keeps its newest candles
+    ring.extend(CandleBatch.from_kraken_rows([candle(60 * i, i) for i in range(6, 12)]))
+    assert list(ring.to_batch().time) == [540, 600, 660]
+
+
+def test_candle_ring_replaces_a_revised_closed_candle():
+    ring = CandleRing(capacity=3)
+
+    ring.extend(CandleBatch.from_kraken_rows([candle(60, 1), candle(120, 2)]))
+    ring.extend(CandleBatch.from_kraken_rows([candle(120, 2.5)]))
+
+    assert list(ring.to_batch().close) == [1, 2.5]
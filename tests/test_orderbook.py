@@ -0,0 +1,62 @@
+import zlib
+
+import pytest
+
+from app.marketdata.orderbook import OrderBook
+
+
+def make_book():
+    book = OrderBook("XBTUSD", depth=3, price_decimals=1, volume_decimals=8)
+    book.load_snapshot(
+        bids=[["99.0", "2.0", "1700000000.1"], ["100.0", "1.0", "1700000000.2"], ["98.0", "3.0", "1700000000.3"]],
+        asks=[["102.0", "2.0", "1700000000.4"], ["101.0", "1.0", "1700000000.5"], ["103.0", "4.0", "1700000000.6"]],
+    )
+    return book
+
+
+def test_snapshot_is_sorted_best_first():
+    book = make_book()
+
+    assert book.best_bid() == (100.0, 1.0)
+    assert book.best_ask() == (101.0, 1.0)
+    assert book.mid_price() == 100.5
+    assert list(book.bids.prices) == [100.0, 99.0, 98.0]
+    assert book.updated_at == pytest.approx(1700000000.6)
+
+
+def test_updates_insert_replace_remove_and_truncate():
+    book = make_book()
+
+    book.apply(bids=[["100.5", "0.5", "1700000001.0"], ["99.0", "0.00000000", "1700000001.1"]], asks=[["101.0", "1.5", "1700000001.2"]])
+
+    assert list(book.bids.prices) == [100.5, 100.0, 98.0]
+    assert book.volume_at_price("asks", 101.0) == 1.5
+    assert book.volume_at_price("bids", 99.0) == 0.0
+
+    # Depth is 3, so the worst ask is dropped when a better one arrives
+    book.apply(asks=[["100.8", "1.0", "1700000001.3"]])
+    assert list(book.asks.prices) == [100.8, 101.0, 102.0]
+
+
+def test_liquidity_queries():
+    book = make_book()
+
+    assert book.volume_through_price("asks", 102.0) == 3.0
+    assert book.volume_through_price("bids", 99.5) == 1.0
+    # Buying 2 takes 1 @ 101 and 1 @ 102
+    assert book.vwap("buy", 2.0) == (101.5, 102.0)
+    assert book.vwap("sell", 1.0) == (100.0, 100.0)
+    assert book.vwap("buy", 100.0) is None
+
+
+def test_checksum_matches_krakens_definition():
+    book = make_book()
+
+    # Asks from best to worst, then bids from best to worst: price and volume without '.' and leading zeros
+    text = "1010" + "100000000" + "1020" + "200000000" + "1030" + "400000000"
+    text += "1000" + "100000000" + "990" + "200000000" + "980" + "300000000"
+
+    assert book.checksum() == zlib.crc32(text.encode())
+    assert book.verify_checksum(str(zlib.crc32(text.encode())))
+    assert not book.verify_checksum("123")
+    assert not book.is_valid
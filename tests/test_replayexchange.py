@@ -0,0 +1,159 @@
+import json
+import time
+
+import pytest
+
+from app.exchanges.exchange import Exchange, KrakenExchange
+from app.exchanges.replayexchange import RecordingExchange, ReplayExchange, ReplayError
+from app.repriceengine import RepriceEngine
+from config import ExchangeConfig
+
+
+class ScriptedExchange(Exchange):
+    """Returns a new candle on every get_ohlc_data call and rejects orders without a price."""
+
+    def __init__(self):
+        super().__init__()
+        self.api_key = "key"
+        self.mode = "test"
+        self.ohlc_calls = 0
+
+    def get_ohlc_data(self, pair, interval=1, since=0):
+        self.ohlc_calls += 1
+        time.sleep(0.02)
+        return {"error": [], "result": {"XXBTZUSD": [[self.ohlc_calls, "1", "1", "1", "1", "1", "1", 1]], "last": self.ohlc_calls}}
+
+    def add_order(self, ordertype, type, volume, pair, price=''):
+        if price == '':
+            raise ValueError("EOrder:Invalid price")
+        return {"error": [], "result": {"txid": ["OTX"]}}
+
+
+def record(log_path):
+    exchange = RecordingExchange(ScriptedExchange(), str(log_path))
+    exchange.get_ohlc_data("XBTUSD")
+    exchange.get_ohlc_data("XBTUSD")
+    exchange.add_order("limit", "buy", 1, "XBTUSD", price=100)
+    with pytest.raises(ValueError):
+        exchange.add_order("limit", "buy", 1, "XBTUSD")
+    exchange.close()
+    return exchange
+
+
+@pytest.mark.parametrize("name", ["calls.jsonl", "calls.jsonl.gz"])
+def test_replay_serves_recorded_responses_in_order(tmp_path, name):
+    recording = record(tmp_path / name)
+    assert recording.api_key == "key"
+
+    replay = ReplayExchange(str(tmp_path / name))
+
+    assert replay.get_ohlc_data("XBTUSD")["result"]["last"] == 1
+    assert replay.get_ohlc_data("XBTUSD")["result"]["last"] == 2
+    # Once the recording runs out, the last response repeats
+    assert replay.get_ohlc_data("XBTUSD")["result"]["last"] == 2
+    assert replay.add_order("limit", "buy", 1, "XBTUSD", price=100)["result"]["txid"] == ["OTX"]
+
+    with pytest.raises(ReplayError, match="Invalid price"):
+        replay.add_order("limit", "buy", 1, "XBTUSD")
+
+    with pytest.raises(ReplayError, match="no recorded response"):
+        replay.get_ticker_info("XBTUSD")
+
+
+def test_replay_latency_and_injected_failures_are_reproducible(tmp_path):
+    record(tmp_path / "calls.jsonl")
+    lines = [json.loads(line) for line in open(tmp_path / "calls.jsonl")]
+    assert lines[0]["header"]["mode"] == "test"
+    assert lines[1]["elapsed"] >= 0.02
+
+    replay = ReplayExchange(str(tmp_path / "calls.jsonl"), replay_latency=True)
+    start = time.time()
+    replay.get_ohlc_data("XBTUSD")
+    assert time.time() - start >= 0.02
+
+    def outcomes(seed):
+        replay = ReplayExchange(str(tmp_path / "calls.jsonl"), timeout_rate=0.2, error_rate=0.3, seed=seed)
+        results = []
+        for _ in range(20):
+            try:
+                replay.get_ohlc_data("XBTUSD")
+                results.append("ok")
+            except TimeoutError:
+                results.append("timeout")
+            except ReplayError:
+                results.append("error")
+        return results
+
+    assert outcomes(7) == outcomes(7)
+    assert {"ok", "timeout", "error"} == set(outcomes(7))
+
+
+def test_replay_serves_each_recorded_response_once_across_indexes(tmp_path):
+    recording = RecordingExchange(ScriptedExchange(), str(tmp_path / "calls.jsonl"))
+    recording.add_order("limit", "buy", 1, "XBTUSD", price=100)
+    recording.add_order("limit", "buy", 2, "XBTUSD", price=100)
+    recording.close()
+    lines = [json.loads(line) for line in open(tmp_path / "calls.jsonl")]
+    lines[2]["response"]["result"]["txid"] = ["OTX2"]
+    with open(tmp_path / "calls.jsonl", "w") as f:
+        f.write("\n".join(json.dumps(line) for line in lines) + "\n")
+
+    replay = ReplayExchange(str(tmp_path / "calls.jsonl"))
+
+    assert replay.add_order("limit", "buy", 1, "XBTUSD", price=100)["result"]["txid"] == ["OTX"]
+    # Arguments that were never recorded fall back to the next unserved add_order response
+    assert replay.add_order("limit", "buy", 3, "XBTUSD", price=100)["result"]["txid"] == ["OTX2"]
+
+
+def test_recorded_and_replayed_exchanges_batch_orders_like_the_wrapped_exchange(tmp_path):
+    order = {"ordertype": "limit", "type": "buy", "volume": 1, "price": 100, "oflags": "post"}
+    kraken = KrakenExchange(ExchangeConfig("tests/test.env"))
+    recording = RecordingExchange(kraken, str(tmp_path / "calls.jsonl"))
+
+    assert recording.to_batch_order(**order) == kraken.to_batch_order(**order)
+
+    with open(tmp_path / "calls.jsonl", "w") as f:
+        f.write(json.dumps({"header": {"exchange": "KrakenExchange", "mode": "test"}}) + "\n")
+
+    assert ReplayExchange(str(tmp_path / "calls.jsonl")).to_batch_order(**order) == kraken.to_batch_order(**order)
+
+    # A recording of an exchange that cannot batch replays its single orders
+    record(tmp_path / "single.jsonl")
+    with pytest.raises(NotImplementedError):
+        ReplayExchange(str(tmp_path / "single.jsonl")).to_batch_order(**order)
+
+
+class QuotingExchange(ScriptedExchange):
+    """ScriptedExchange with a top of the book, fee rates and editable orders."""
+
+    def get_quote(self, pair):
+        return {"bid": 99.0, "bid_volume": 1.0, "ask": 100.0, "ask_volume": 1.0}
+
+    def get_fee_rate(self, pair, maker=False):
+        return 0.0016 if maker else 0.0026
+
+    def edit_order(self, txid, pair, price='', oflags=''):
+        return {"error": [], "result": {"txid": f"{txid}-E", "originaltxid": txid}}
+
+
+def reprice(exchange):
+    repricer = RepriceEngine(exchange, tolerance_pct=0.001, min_interval_in_sec=0)
+    repricer.track("OSELL", "XBTUSD", "sell", 100.5, 1.0)
+    quote = exchange.get_quote("XBTUSD")
+    return repricer.reprice("XBTUSD", quote["bid"], quote["ask"])
+
+
+def test_quotes_fees_and_reprices_are_recorded_and_replayed(tmp_path):
+    log_path = str(tmp_path / "calls.jsonl")
+    recording = RecordingExchange(QuotingExchange(), log_path)
+
+    assert reprice(recording) == {"OSELL": "OSELL-E"}
+    assert recording.get_fee_rate("XBTUSD", maker=True) == 0.0016
+    recording.close()
+
+    lines = [json.loads(line) for line in open(log_path)]
+    assert [line.get("method") for line in lines[1:]] == ["get_quote", "edit_order", "get_fee_rate"]
+
+    replay = ReplayExchange(log_path)
+    assert reprice(replay) == {"OSELL": "OSELL-E"}
+    assert replay.get_fee_rate("XBTUSD", maker=True) == 0.0016
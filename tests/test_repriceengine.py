@@ -0,0 +1,79 @@
+import pytest
+
+from app.exchanges.exchange import Exchange
+from app.exchanges.ratelimiter import KrakenRateLimiter
+from app.repriceengine import RepriceEngine
+
+
+class EditingExchange(Exchange):
+    """Edits orders like Kraken's EditOrder: each edit replaces the order with a new txid."""
+
+    def __init__(self, rate_limiter=None):
+        super().__init__()
+        self.edits = []
+        self.closed = set()
+        if rate_limiter is not None:
+            self._rate_limiter = rate_limiter
+
+    def edit_order(self, txid, pair, price='', oflags=''):
+        if txid in self.closed:
+            raise Exception("EOrder:Unknown order")
+        self.edits.append((txid, pair, price, oflags))
+        return {'error': [], 'result': {'txid': f"{txid}-E", 'originaltxid': txid, 'status': 'ok'}}
+
+
+def test_engine_follows_the_touch_away_from_resting_orders():
+    exchange = EditingExchange()
+    engine = RepriceEngine(exchange, tolerance_pct=0.001, max_chase_pct=0.01, min_interval_in_sec=0)
+    engine.track('BUY1', 'XBTUSD', 'buy', 100.0, 1.0)
+    engine.track('SELL1', 'XBTUSD', 'sell', 110.0, 1.0)
+
+    # Within the tolerance, or moving through the orders: nothing to amend
+    assert engine.reprice('XBTUSD', 100.05, 109.95) == {}
+    assert engine.reprice('XBTUSD', 99.0, 111.0) == {}
+
+    assert engine.reprice('XBTUSD', 100.5, 109.5) == {'BUY1': 'BUY1-E', 'SELL1': 'SELL1-E'}
+    assert exchange.edits == [('BUY1', 'XBTUSD', '100.5', 'post'), ('SELL1', 'XBTUSD', '109.5', 'post')]
+    assert engine.orders['BUY1-E'].price == 100.5
+    assert engine.amend_count == 2
+
+    # Orders of other pairs are left alone, and a buy is not chased beyond max_chase_pct
+    assert engine.reprice('ETHUSD', 200.0, 201.0) == {}
+    assert engine.reprice('XBTUSD', 101.5, 112.0) == {}
+    assert len(exchange.edits) == 2
+
+
+def test_engine_stops_repricing_orders_it_cannot_edit():
+    exchange = EditingExchange()
+    engine = RepriceEngine(exchange, min_interval_in_sec=0)
+    engine.track('BUY1', 'XBTUSD', 'buy', 100.0, 1.0)
+    exchange.closed.add('BUY1')
+
+    assert engine.reprice('XBTUSD', 100.5, 101.0) == {}
+    assert len(engine) == 0
+
+
+def test_engine_waits_between_amends_of_an_order():
+    exchange = EditingExchange()
+    engine = RepriceEngine(exchange, min_interval_in_sec=60)
+    engine.track('BUY1', 'XBTUSD', 'buy', 100.0, 1.0)
+
+    assert engine.reprice('XBTUSD', 100.5, 101.0) == {}
+    engine.orders['BUY1'].amended_at -= 60
+    assert engine.reprice('XBTUSD', 100.5, 101.0) == {'BUY1': 'BUY1-E'}
+
+
+@pytest.mark.parametrize("spent, amended", [(0, True), (46, False)])
+def test_engine_keeps_a_reserve_of_the_trading_budget(spent, amended):
+    rate_limiter = KrakenRateLimiter('starter')
+    rate_limiter.record_orders(['BUY1'], 'XBTUSD')
+    for _ in range(spent):
+        rate_limiter.acquire_private('AddOrder', 'XBTUSD')
+    exchange = EditingExchange(rate_limiter)
+    engine = RepriceEngine(exchange, min_interval_in_sec=0, reserve=10)
+    engine.track('BUY1', 'XBTUSD', 'buy', 100.0, 1.0)
+
+    # Editing an order younger than 5 seconds costs 6 on top of the reserve
+    assert rate_limiter.edit_cost('BUY1') == 6
+    assert (engine.reprice('XBTUSD', 100.5, 101.0) != {}) == amended
+    assert engine.throttled_count == (0 if amended else 1)
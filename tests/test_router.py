@@ -0,0 +1,192 @@
+import time
+
+import pytest
+
+from app.exchanges.exchange import CoinbaseExchange, Exchange
+from app.exchanges.router import SmartOrderRouter
+
+
+class QuotingVenue(Exchange):
+    """Quotes a fixed top of book, optionally slowly, and records the orders it receives."""
+
+    def __init__(self, name, bid, ask, size=10.0, fee=0.0, delay=0.0, batching=False):
+        super().__init__()
+        self.name = name
+        self.bid = bid
+        self.ask = ask
+        self.size = size
+        self.fee = fee
+        self.delay = delay
+        self.batching = batching
+        self.orders = []
+        self.cancelled = []
+        self.quote_calls = 0
+
+    def get_quote(self, pair):
+        self.quote_calls += 1
+        time.sleep(self.delay)
+        return {'bid': self.bid, 'bid_volume': self.size, 'ask': self.ask, 'ask_volume': self.size}
+
+    def get_fee_rate(self, pair, maker=False):
+        return self.fee
+
+    def add_order(self, ordertype, type, volume, pair, **kwargs):
+        self.orders.append((type, volume, pair))
+        return {'error': [], 'result': {'txid': [f"{self.name}-{len(self.orders)}"]}}
+
+    def to_batch_order(self, **order):
+        if not self.batching:
+            raise NotImplementedError("Not Implemented.")
+        return order
+
+    def add_order_batch(self, orders, pair):
+        self.orders.extend((order['type'], order['volume'], pair) for order in orders)
+        return {'error': [], 'result': {'orders': [{'txid': f"{self.name}-B{i}"} for i in range(len(orders))]}}
+
+    def cancel_order(self, txid):
+        self.cancelled.append(txid)
+        return {'error': [], 'result': {'count': 1}}
+
+
+class UnquotedVenue(Exchange):
+    """A venue without a quote implementation, like the Binance stubs."""
+
+
+def test_router_picks_the_best_fee_adjusted_price_and_translates_pairs():
+    kraken = QuotingVenue('kraken', bid=99.0, ask=100.0, fee=0.004)
+    coinbase = QuotingVenue('coinbase', bid=99.1, ask=100.1, fee=0.001)
+    router = SmartOrderRouter({'Kraken': kraken, 'Coinbase': coinbase, 'Binance': UnquotedVenue()}, {'Coinbase': {'XBTUSD': 'BTC-USD'}})
+
+    # 100 * 1.004 > 100.1 * 1.001, so the higher ask is cheaper after fees
+    response = router.add_order('limit', 'buy', 1.0, 'XBTUSD', price='100.1')
+    assert coinbase.orders == [('buy', 1.0, 'BTC-USD')]
+    assert router.get_order_venue(response['result']['txid'][0]) is coinbase
+
+    # Sells close the position on the venue that holds it, without quoting
+    kraken.bid = 120.0
+    router.add_order('limit', 'sell', 1.0, 'XBTUSD', price='99')
+    assert coinbase.orders[-1] == ('sell', 1.0, 'BTC-USD')
+    assert kraken.orders == []
+
+    router.cancel_order(response['result']['txid'][0])
+    assert coinbase.cancelled == ['coinbase-1']
+
+
+def test_router_prefers_venues_showing_enough_size():
+    kraken = QuotingVenue('kraken', bid=99.0, ask=100.0, size=0.5)
+    coinbase = QuotingVenue('coinbase', bid=99.0, ask=100.5, size=5.0)
+    router = SmartOrderRouter({'Kraken': kraken, 'Coinbase': coinbase})
+
+    assert router.select_venue('buy', 1.0, 'XBTUSD') == 'Coinbase'
+    assert router.select_venue('buy', 0.1, 'XBTUSD') == 'Kraken'
+
+
+def test_router_skips_venues_outside_the_latency_budget():
+    kraken = QuotingVenue('kraken', bid=99.0, ask=101.0)
+    coinbase = QuotingVenue('coinbase', bid=99.0, ask=100.0, delay=0.3)
+    router = SmartOrderRouter({'Kraken': kraken, 'Coinbase': coinbase}, latency_budget_in_sec=0.1)
+
+    try:
+        # The slow venue misses the budget of each order, then drops out by its percentile latency
+        for _ in range(6):
+            assert router.select_venue('buy', 1.0, 'XBTUSD') == 'Kraken'
+
+        time.sleep(0.4)
+        assert router.get_latency_tracker('Coinbase').deadline() > router.latency_budget_in_sec
+        assert router.get_latency_tracker('Kraken').deadline() <= router.latency_budget_in_sec
+
+        # Once quoting every venue is too slow, orders fall back to the primary venue
+        kraken.delay = 0.3
+        router.latency_budget_in_sec = 0.01
+        router.get_latency_tracker('Kraken').latencies.extend([0.3] * 5)
+        assert router.select_venue('buy', 1.0, 'XBTUSD') == 'Kraken'
+    finally:
+        router.close()
+
+
+def test_router_places_an_order_group_on_one_venue():
+    kraken = QuotingVenue('kraken', bid=99.0, ask=100.0, batching=True)
+    coinbase = QuotingVenue('coinbase', bid=99.0, ask=99.5)
+    router = SmartOrderRouter({'Kraken': kraken, 'Coinbase': coinbase})
+    orders = [router.to_batch_order(ordertype='limit', type='buy', volume=1.0, price='99.5'),
+              router.to_batch_order(ordertype='limit', type='sell', volume=1.0, price='105')]
+
+    # Coinbase cannot batch, so the group is sent order by order
+    response = router.add_order_batch(orders, 'XBTUSD')
+    assert coinbase.orders == [('buy', 1.0, 'XBTUSD'), ('sell', 1.0, 'XBTUSD')]
+    assert [result['txid'] for result in response['result']['orders']] == [['coinbase-1'], ['coinbase-2']]
+    assert router.order_venues == {'coinbase-1': 'Coinbase', 'coinbase-2': 'Coinbase'}
+    assert router.position_venues == {'XBTUSD': 'Coinbase'}
+
+    # Kraken batches the group in one request
+    coinbase.ask = 101.0
+    router.position_venues = {}
+    response = router.add_order_batch(orders, 'XBTUSD')
+    assert kraken.orders == [('buy', 1.0, 'XBTUSD'), ('sell', 1.0, 'XBTUSD')]
+    assert router.order_venues['kraken-B1'] == 'Kraken'
+
+
+class CoinbaseVenue(CoinbaseExchange):
+    """CoinbaseExchange quoting a fixed top of book and recording the orders it creates."""
+
+    def __init__(self, bid, ask):
+        super().__init__()
+        self.bid = bid
+        self.ask = ask
+        self.created = []
+
+    def get_quote(self, pair):
+        return {'bid': self.bid, 'bid_volume': 10.0, 'ask': self.ask, 'ask_volume': 10.0}
+
+    def get_fee_rate(self, pair, maker=False):
+        return 0.0
+
+    def create_order(self, **order):
+        self.created.append(order)
+        return {'id': f"coinbase-{len(self.created)}"}
+
+
+class RejectingVenue(QuotingVenue):
+    """QuotingVenue that rejects every order but limit orders."""
+
+    def add_order(self, ordertype, type, volume, pair, **kwargs):
+        if ordertype != 'limit':
+            raise ValueError(f"EOrder:Invalid order type {ordertype}")
+        return super().add_order(ordertype, type, volume, pair, **kwargs)
+
+
+def test_router_only_sends_orders_to_venues_that_can_place_every_leg():
+    kraken = QuotingVenue('kraken', bid=99.0, ask=100.0, batching=True)
+    coinbase = CoinbaseVenue(bid=98.0, ask=98.5)
+    router = SmartOrderRouter({'Kraken': kraken, 'Coinbase': coinbase}, {'Coinbase': {'XBTUSD': 'BTC-USD'}})
+    entry = {'ordertype': 'limit', 'type': 'buy', 'volume': 1.0, 'price': '99.0', 'oflags': 'post',
+             'closeordertype': 'stop-loss-limit', 'closeprice': '99.0', 'closeprice2': '98.0'}
+    take_profit = {'ordertype': 'take-profit-limit', 'type': 'sell', 'volume': 1.0, 'price': '99.0', 'price2': '102.0', 'oflags': 'post'}
+
+    # Coinbase has no conditional close, so it refuses the entry rather than placing it without one
+    with pytest.raises(NotImplementedError):
+        coinbase.add_order(pair='BTC-USD', **entry)
+
+    # Cheaper on Coinbase, but only Kraken can place the entry and the group
+    router.add_order(pair='XBTUSD', **entry)
+    router.add_order_batch([entry, take_profit], 'XBTUSD')
+    assert kraken.orders == [('buy', 1.0, 'XBTUSD'), ('buy', 1.0, 'XBTUSD'), ('sell', 1.0, 'XBTUSD')]
+    assert coinbase.created == []
+
+    # A plain post-only entry goes to Coinbase, priced at its own bid instead of the primary venue's
+    router.add_order('limit', 'buy', 1.0, 'XBTUSD', price='99.0', oflags='post')
+    assert [(order['product_id'], order['price'], order['post_only']) for order in coinbase.created] == [('BTC-USD', '98.0', True)]
+
+
+def test_router_reports_a_leg_failing_after_the_entry_instead_of_raising():
+    venue = RejectingVenue('venue', bid=99.0, ask=100.0)
+    router = SmartOrderRouter({'Venue': venue})
+    orders = [{'ordertype': 'limit', 'type': 'buy', 'volume': 1.0, 'price': '99.0'},
+              {'ordertype': 'take-profit-limit', 'type': 'sell', 'volume': 1.0, 'price': '99.0', 'price2': '102.0'}]
+
+    results = router.add_order_batch(orders, 'XBTUSD')['result']['orders']
+
+    # The entry is placed once; a retry only places the missing take profit
+    assert venue.orders == [('buy', 1.0, 'XBTUSD')]
+    assert results[0]['txid'] == ['venue-1']
+    assert 'Invalid order type' in results[1]['error']
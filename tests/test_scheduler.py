@@ -0,0 +1,43 @@
+import pytest
+
+from app.bots.scheduler import CandleCloseScheduler
+
+
+class FakeClock:
+    def __init__(self, now, rtt=None):
+        self.time = now
+        self.rtt = rtt
+
+    def now(self):
+        return self.time
+
+
+def test_signal_is_due_once_per_closed_candle():
+    clock = FakeClock(1000.0)
+    scheduler = CandleCloseScheduler(300, clock, settle_in_sec=1.0)
+
+    # The newest closed candle is due right away on start, then not again until the next close
+    assert scheduler.seconds_until_due() == 0
+    assert scheduler.claim()
+    assert not scheduler.claim()
+    assert scheduler.last_close == 900
+    assert scheduler.seconds_until_due() == 201.0
+
+    clock.time = 1200.5
+    assert not scheduler.claim()
+    clock.time = 1201.0
+    assert scheduler.claim()
+    assert scheduler.last_close == 1200
+    assert scheduler.next_due_close() == 1500
+
+
+def test_schedule_leads_the_close_by_half_the_round_trip():
+    clock = FakeClock(1000.0, rtt=0.4)
+    scheduler = CandleCloseScheduler(300, clock, settle_in_sec=1.0)
+    scheduler.claim()
+
+    # A request sent 0.8s after the close reaches the exchange 1s after it
+    assert scheduler.get_lead_in_sec() == pytest.approx(0.8)
+    assert scheduler.seconds_until(1200) == pytest.approx(200.8)
+    assert not scheduler.claim(now=1200.7)
+    assert scheduler.claim(now=1200.8)
@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import shutil
+
+import pytest
+
+from app.bots.shardedsupervisor import ShardedSupervisor
+from app.bots.supervisor import BotNotFoundError, BotSupervisor
+from app.exchanges.exchange import KrakenExchange
+from app.helpers import json_util
+from config import ExchangeConfig
+from tests.test_supervisor import make_supervised_bot, wait_until
+
+
+class ShardTestSupervisor(BotSupervisor):
+    """Creates test bots, named and paired by the settings, instead of bots on Kraken."""
+
+    def __init__(self, tmp_path):
+        super().__init__(exchange=None, max_workers=2)
+        self.tmp_path = tmp_path
+
+    def create_bot(self, filepath=".env", settings=None):
+        bot = make_supervised_bot(self.tmp_path, settings["name"])
+        bot.pair = settings["pair"]
+        return self.add(bot)
+
+
+@pytest.fixture
+def sharded(tmp_path, monkeypatch):
+    # Shards inherit the working directory: test bots read tests/test.env and are exported under it
+    shutil.copytree("tests", tmp_path / "tests", ignore=shutil.ignore_patterns("__pycache__", "*.py"))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(json_util, "CLASS_NAMES", json_util.CLASS_NAMES + ["CountingStrategy"])
+    sharded = ShardedSupervisor(lambda: ShardTestSupervisor(tmp_path), shard_count=2)
+    yield sharded
+    sharded.close()
+
+
+def test_bots_are_sharded_across_processes_by_pair(sharded):
+    xbt = sharded.create_bot(settings={"name": "xbt", "pair": "XBTUSD"})
+    eth = sharded.create_bot(settings={"name": "eth", "pair": "ETHUSD"})
+    xbt2 = sharded.create_bot(settings={"name": "xbt2", "pair": "XBTUSD"})
+
+    for bot_id in [xbt, eth, xbt2]:
+        assert sharded.start(bot_id)["state"] == "running"
+
+    wait_until(lambda: all(status["ticks"] >= 2 for status in sharded.list()))
+
+    statuses = {status["name"]: status for status in sharded.list()}
+    assert statuses["xbt"]["shard"] == statuses["xbt2"]["shard"] != statuses["eth"]["shard"]
+    assert len({status["pid"] for status in statuses.values()} | {os.getpid()}) == 3
+    assert [status["bot_id"] for status in sharded.list()] == [xbt, eth, xbt2]
+
+    # Errors of a shard are raised by the coordinator
+    with pytest.raises(ValueError):
+        sharded.update(eth, {"pair": "XBTUSD"})
+    with pytest.raises(BotNotFoundError):
+        sharded.get(99)
+
+    # A pair without bots may move to another shard
+    assert sharded.remove(eth)["state"] == "stopped"
+    assert "ETHUSD" not in sharded.pair_shards
+    assert (sharded.get(xbt)["name"], sharded.get(xbt2)["name"]) == ("xbt", "xbt2")
+
+
+def test_new_pairs_go_to_the_least_loaded_shard(sharded, monkeypatch):
+    monkeypatch.setattr(sharded, "get_shard_loads", lambda: [0.5, 0.1])
+    assert sharded.get_shard("XBTUSD") == 1
+
+    # Bots of a known pair stay in its shard, whatever the load
+    monkeypatch.setattr(sharded, "get_shard_loads", lambda: [0.0, 0.9])
+    assert sharded.get_shard("XBTUSD") == 1
+    assert sharded.get_shard("ETHUSD") == 0
+
+
+def draw_nonces(queue):
+    exchange = KrakenExchange(ExchangeConfig("tests/test.env"))
+    queue.put([int(exchange.get_nonce()) for _ in range(500)])
+
+
+def test_forked_shards_sign_with_the_nonces_of_the_coordinator():
+    exchange = KrakenExchange(ExchangeConfig("tests/test.env"))
+    exchange.nonce_counter
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    shards = [context.Process(target=draw_nonces, args=(queue,)) for _ in range(2)]
+
+    for shard in shards:
+        shard.start()
+
+    nonces = [int(exchange.get_nonce()) for _ in range(500)]
+    nonces += queue.get(timeout=30) + queue.get(timeout=30)
+
+    for shard in shards:
+        shard.join()
+
+    assert len(set(nonces)) == len(nonces) == 1500
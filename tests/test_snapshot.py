@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+
+from app.marketdata.candles import CandleBatch
+from app.marketdata.snapshot import MarketSnapshot, MarketSnapshotService
+
+
+def ticker(bid, ask, last, open, volume, vwap):
+    return {
+        "a": [str(ask), "1", "1.000"],
+        "b": [str(bid), "1", "1.000"],
+        "c": [str(last), "0.1"],
+        "v": ["1.0", str(volume)],
+        "p": [str(vwap), str(vwap)],
+        "t": [10, 100],
+        "l": [str(bid), str(bid)],
+        "h": [str(ask), str(ask)],
+        "o": str(open),
+    }
+
+
+TICKERS = {
+    "XXBTZUSD": ticker(99.9, 100.1, 100.0, 95.0, 1000, 100.0),
+    "XETHZUSD": ticker(49.0, 51.0, 50.0, 50.0, 5000, 50.0),
+    "MOONUSD": ticker(0.9, 1.1, 1.2, 1.0, 10, 1.0),
+}
+
+
+def test_snapshot_scans_the_pair_universe():
+    snapshot = MarketSnapshot(TICKERS, {}, time.time())
+
+    assert snapshot.scan() == ["XETHZUSD", "XXBTZUSD", "MOONUSD"]
+    assert snapshot.scan(min_quote_volume=1000) == ["XETHZUSD", "XXBTZUSD"]
+    assert snapshot.scan(max_spread_pct=1) == ["XXBTZUSD"]
+    assert snapshot.scan(sort_by="change", top=2) == ["MOONUSD", "XXBTZUSD"]
+    assert snapshot.scan(sort_by="spread")[0] == "XXBTZUSD"
+
+    # Shared by every bot, so it cannot be changed
+    with pytest.raises(TypeError):
+        snapshot.tickers["XXBTZUSD"] = {}
+    with pytest.raises(ValueError):
+        snapshot.last[0] = 0
+
+
+class PairInfo:
+    def __init__(self, key):
+        self.key = key
+
+
+class PairKeys:
+    KEYS = {"XBTUSD": "XXBTZUSD", "ETHUSD": "XETHZUSD", "MOONUSD": "MOONUSD"}
+
+    def get(self, pair):
+        return PairInfo(self.KEYS[pair])
+
+
+class BulkExchange:
+    """Counts the requests made for a refresh. OHLC requests for failing_pairs raise."""
+
+    classname = "BulkExchange"
+    pool_size = 4
+
+    def __init__(self, failing_pairs=()):
+        self.pair_registry = PairKeys()
+        self.failing_pairs = failing_pairs
+        self.ticker_calls = 0
+        self.ohlc_calls = []
+        self.lock = threading.Lock()
+
+    def get_ticker_info(self, pair=""):
+        assert pair == ""
+        self.ticker_calls += 1
+        return {"error": [], "result": TICKERS}
+
+    def get_ohlc_batch(self, pair, interval=1, since=0):
+        with self.lock:
+            self.ohlc_calls.append(pair)
+        if pair in self.failing_pairs:
+            raise TimeoutError("read timed out")
+        close = float(TICKERS[PairKeys.KEYS[pair]]["c"][0])
+        return CandleBatch.from_kraken_rows([[1700000000, close, close, close, close, close, "1.0", 1]])
+
+
+def test_service_refreshes_every_subscribed_pair_with_one_ticker_request():
+    exchange = BulkExchange()
+    service = MarketSnapshotService(exchange, refresh_interval_in_sec=1)
+
+    for pair in ["XBTUSD", "ETHUSD", "XBTUSD"]:
+        service.subscribe(pair)
+
+    # Nothing fetched yet: readers fall back to REST
+    assert service.get_latest_ohlc("XBTUSD") is None
+
+    before = service.snapshot
+    service.refresh()
+
+    assert exchange.ticker_calls == 1
+    assert sorted(exchange.ohlc_calls) == ["ETHUSD", "XBTUSD"]
+    assert service.snapshot is not before
+    assert service.get_latest_ohlc("XBTUSD").close == 100.0
+    assert service.get_latest_ticker("ETHUSD") == {"bid": 49.0, "ask": 51.0, "last": 50.0}
+    assert service.get_latest_ohlc("MOONUSD") is None
+
+    # A stale snapshot is not served
+    service.max_age_in_sec = 0
+    time.sleep(0.01)
+    assert service.get_latest_ohlc("XBTUSD") is None
+    service.stop()
+
+
+def test_service_leaves_out_pairs_whose_candles_failed():
+    exchange = BulkExchange(failing_pairs=("ETHUSD",))
+    service = MarketSnapshotService(exchange)
+    service.subscribe("XBTUSD")
+    service.subscribe("ETHUSD")
+
+    service.refresh()
+
+    assert service.get_latest_ohlc("XBTUSD") is not None
+    assert service.get_latest_ohlc("ETHUSD") is None
+    assert "XETHZUSD" in service.snapshot.tickers
+    service.stop()
+
+
+def test_service_is_shared_per_exchange_and_interval():
+    exchange = BulkExchange()
+
+    assert MarketSnapshotService.shared(exchange) is MarketSnapshotService.shared(exchange)
+    assert MarketSnapshotService.shared(exchange) is not MarketSnapshotService.shared(exchange, interval=5)
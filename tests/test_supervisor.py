@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from app import create_app
+from app.helpers import json_util
+from app.bots.supervisor import BotNotFoundError, BotSupervisor
+from tests.test_bot import CountingStrategy, make_bot
+
+
+class FailingStrategy(CountingStrategy):
+    def generate_signal(self):
+        super().generate_signal()
+        raise RuntimeError("model unavailable")
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def make_supervised_bot(tmp_path, name, strategy=None):
+    bot = make_bot(tmp_path, "HOLD")
+    bot.name = name
+    bot.latency = 0.01
+    bot.strategy = strategy or CountingStrategy()
+    return bot
+
+
+@pytest.fixture
+def supervisor(monkeypatch):
+    # Stopped bots are exported, test strategies included
+    monkeypatch.setattr(json_util, "CLASS_NAMES", json_util.CLASS_NAMES + ["CountingStrategy", "FailingStrategy"])
+    supervisor = BotSupervisor(exchange=None, max_workers=2)
+    yield supervisor
+    supervisor.close()
+
+
+def test_supervisor_runs_many_bots_on_a_shared_pool(tmp_path, monkeypatch, supervisor):
+    bot_ids = [supervisor.add(make_supervised_bot(tmp_path, f"bot{i}")) for i in range(5)]
+    # Stopped bots are exported to app/bots/local under the working directory
+    monkeypatch.chdir(tmp_path)
+    bots = [supervisor.bots[bot_id]["bot"] for bot_id in bot_ids]
+
+    for bot_id in bot_ids:
+        supervisor.start(bot_id)
+
+    wait_until(lambda: all(bot.strategy.signal_calls >= 3 for bot in bots))
+    assert [status["state"] for status in supervisor.list()] == ["running"] * 5
+    # The bots fetch on the supervisor's I/O pool rather than pools of their own
+    assert all(getattr(bot, "_prefetch_executor", None) is None for bot in bots)
+
+    # A paused bot keeps its state but is not ticked
+    supervisor.pause(bot_ids[0])
+    time.sleep(0.05)
+    calls = bots[0].strategy.signal_calls
+    time.sleep(0.1)
+    assert bots[0].strategy.signal_calls == calls
+    assert bots[1].strategy.signal_calls > calls
+
+    supervisor.update(bot_ids[0], {"latency": 30.0})
+    assert bots[0].latency == 30.0
+    with pytest.raises(ValueError):
+        supervisor.update(bot_ids[0], {"pair": "ETHUSD"})
+    with pytest.raises(ValueError):
+        supervisor.update(bot_ids[0], {"latency": -1})
+    assert bots[0].latency == 30.0
+
+    # Stopping exports the bot; removing forgets it
+    assert supervisor.stop(bot_ids[1])["state"] == "stopped"
+    assert (tmp_path / "app" / "bots" / "local" / "bot1.json").exists()
+    supervisor.remove(bot_ids[2])
+    with pytest.raises(BotNotFoundError):
+        supervisor.get(bot_ids[2])
+
+
+def test_supervisor_stops_a_bot_that_keeps_failing(tmp_path, monkeypatch, supervisor):
+    bot = make_supervised_bot(tmp_path, "failing", FailingStrategy())
+    monkeypatch.chdir(tmp_path)
+    bot.max_error_count = 2
+    bot.error_latency = 0.01
+    bot_id = supervisor.add(bot)
+
+    supervisor.start(bot_id)
+    wait_until(lambda: supervisor.get(bot_id)["state"] == "failed")
+
+    status = supervisor.get(bot_id)
+    assert status["errors"] == 2
+    assert status["last_error"] == "model unavailable"
+    assert bot.strategy.signal_calls == 2
+
+
+def test_bot_endpoints_drive_the_supervisor(tmp_path, monkeypatch, supervisor):
+    bot_id = supervisor.add(make_supervised_bot(tmp_path, "api"))
+    monkeypatch.chdir(tmp_path)
+    app = create_app()
+    app.config["BOT_SUPERVISOR"] = supervisor
+    client = app.test_client()
+
+    response = client.post("/api/bots/start", json={"bot_id": bot_id})
+    assert response.status_code == 200
+    assert response.get_json()["data"]["state"] == "running"
+
+    assert client.post("/api/bots/pause", json={"bot_id": bot_id}).get_json()["data"]["state"] == "paused"
+    assert client.put("/api/bots/update", json={"bot_id": bot_id, "settings": {"latency": 2.0}}).status_code == 200
+    assert client.get(f"/api/bots/{bot_id}").get_json()["data"]["name"] == "api"
+    assert [bot["bot_id"] for bot in client.get("/api/bots").get_json()["data"]["bots"]] == [bot_id]
+
+    assert client.post("/api/bots/start", json={}).status_code == 400
+    assert client.get("/api/bots/99").status_code == 404
+
+    assert client.delete("/api/bots/remove", json={"bot_id": bot_id}).get_json()["data"]["state"] == "stopped"
+    assert client.get(f"/api/bots/{bot_id}").status_code == 404
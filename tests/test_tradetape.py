@@ -0,0 +1,82 @@
+import numpy as np
+
+from app.marketdata.tradetape import TradeRing, TradeTape
+
+
+def trade(price, volume, time, side="b", trade_id=None):
+    row = [str(price), str(volume), time, side, "l", ""]
+    if trade_id is not None:
+        row.append(trade_id)
+    return row
+
+
+class TradesExchange:
+    """Serves Kraken-style /public/Trades pages of page_size trades after since, with the last trade's time as the cursor."""
+
+    def __init__(self, trades, page_size=1000):
+        self.trades = trades
+        self.page_size = page_size
+        self.since_calls = []
+
+    def get_recent_trades(self, pair, since=0, count=1000):
+        self.since_calls.append(since)
+        rows = [row for row in self.trades if row[2] > float(since)][:self.page_size]
+        last = str(rows[-1][2]) if rows else str(since)
+        return {"error": [], "result": {"XXBTZUSD": rows, "last": last}}
+
+
+def test_tape_follows_the_cursor_and_builds_sub_minute_candles():
+    exchange = TradesExchange([
+        trade(100, 1, 1700000000.5, "b", 1),
+        trade(102, 1, 1700000010.0, "s", 2),
+        trade(101, 2, 1700000014.9, "b", 3),
+        trade(99, 1, 1700000026.0, "s", 4),
+    ])
+    tape = TradeTape(exchange, "XBTUSD", interval_in_sec=15)
+
+    assert tape.poll() == 4
+    # Nothing new: the cursor skips the trades already held
+    assert tape.poll() == 0
+    assert exchange.since_calls == [0, "1700000026.0"]
+
+    candles = tape.candles()
+    assert list(candles.time) == [1699999995, 1700000010, 1700000025]
+    assert list(candles.open) == [100, 102, 99]
+    assert list(candles.high) == [100, 102, 99]
+    assert list(candles.low) == [100, 101, 99]
+    assert list(candles.close) == [100, 101, 99]
+    assert list(candles.volume) == [1, 3, 1]
+    assert list(candles.count) == [1, 2, 1]
+    assert np.isclose(candles.vwap[1], (102 + 2 * 101) / 3)
+    assert candles.last == 1700000010
+
+    # The bar in progress updates as trades arrive
+    exchange.trades.append(trade(104, 1, 1700000030.0, "b", 5))
+    latest = tape.get_latest_ohlc("XBTUSD")
+    assert (latest.time, latest.open, latest.high, latest.close, latest.count) == (1700000025, 99, 104, 104, 2)
+    assert tape.get_latest_ohlc("ETHUSD") is None
+
+
+def test_tape_backfills_beyond_one_page_and_aggregates_any_interval():
+    exchange = TradesExchange([trade(100 + i % 7, 1, 1700000000 + 30 * i, "b", i) for i in range(2500)], page_size=1000)
+    tape = TradeTape(exchange, "XBTUSD")
+
+    assert tape.backfill(since=0) == 2500
+    assert len(exchange.since_calls) == 3
+
+    hourly = tape.candles(3600)
+    assert hourly.volume.sum() == 2500
+    assert hourly.count.sum() == 2500
+    assert len(tape.candles(60)) == 1250
+
+
+def test_trade_ring_keeps_the_newest_trades():
+    ring = TradeRing(capacity=3)
+    ring.extend(TradeTape.parse_trades([trade(1, 1, 1.0), trade(2, 1, 2.0)]))
+    ring.extend(TradeTape.parse_trades([trade(3, 1, 3.0), trade(4, 1, 4.0, "s")]))
+
+    columns = ring.to_columns()
+    assert list(columns["price"]) == [2, 3, 4]
+    assert list(columns["side"]) == [1, 1, -1]
+    assert list(columns["trade_id"]) == [-1, -1, -1]
+    assert ring.latest("time") == 4.0